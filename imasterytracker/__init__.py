@@ -1,3 +1,15 @@
-from .app import app
+from __future__ import annotations
+
+from typing import Any
 
 __all__ = ["app"]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing the Reflex app builds the whole UI tree, so defer it until
+    # someone asks for it; headless submodules (cli, generate) stay light.
+    if name == "app":
+        from .app import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
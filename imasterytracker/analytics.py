@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, inspect, insert, select, update
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.orm.base import NO_VALUE
+
+from .models import ArchivedJournalEntry, JournalEntry, JournalRollup
+from .schemas import JournalAnalytics, JournalAnalyticsPeriod
+
+# Journal analytics from day-by-mood rollups.
+#
+# ``journalrollup`` holds, per UTC day and mood, how many live entries there
+# are (both tiers) and the total length of their reflections. Reads group a
+# few thousand rollup rows instead of scanning the journal.
+#
+# The rollups follow every write in the same transaction, from the same
+# session events ``changes`` uses: entries the ORM flushes (created, edited,
+# soft- or hard-deleted) are turned into per-bucket deltas, applied just
+# before commit. Bulk statements on the journal tables can't be turned into
+# deltas, so they rebuild the rollups from scratch instead, unless they only
+# move rows without changing the live set (archiving, purging tombstones) and
+# say so with the ``UNCHANGED`` execution option. ``rebuild`` is also what the
+# ``analytics --rebuild`` CLI command and the synthetic data generator run.
+
+# Also honoured by the search index, which the same moves leave as it is.
+UNCHANGED = "live_set_unchanged"
+BUCKETS = ("day", "week", "month")
+
+_ROLLUP = JournalRollup.__table__
+_DELTAS = "rollup_deltas"
+_REBUILD = "rollup_rebuild"
+_BATCH_SIZE = 1000
+
+Buckets = Dict[Tuple[dt.date, str], List[int]]
+
+
+def day_of(value: Any) -> dt.date:
+    """The UTC day of a stored ``created_at`` (naive values are UTC)."""
+
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value)
+    if isinstance(value, dt.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(dt.timezone.utc)
+        return value.date()
+    return value
+
+
+def bucket_start(day: dt.date, bucket: str) -> dt.date:
+    if bucket == "week":
+        return day - dt.timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+# -- maintaining the rollups -------------------------------------------------
+
+
+def apply(executor: Any, deltas: Buckets) -> None:
+    """Add ``deltas`` (``[entries, reflection_chars]`` per bucket) to the rollups."""
+
+    for (day, mood), (entries, chars) in sorted(deltas.items()):
+        if not entries and not chars:
+            continue
+        key = (_ROLLUP.c.day == day) & (_ROLLUP.c.mood == mood)
+        updated = executor.execute(
+            update(_ROLLUP)
+            .where(key)
+            .values(entries=_ROLLUP.c.entries + entries, reflection_chars=_ROLLUP.c.reflection_chars + chars)
+        )
+        if not updated.rowcount:
+            executor.execute(insert(_ROLLUP).values(day=day, mood=mood, entries=entries, reflection_chars=chars))
+        elif entries < 0:
+            executor.execute(delete(_ROLLUP).where(key, _ROLLUP.c.entries <= 0))
+
+
+def rebuild(executor: Any) -> int:
+    """Recompute every rollup row from the journal; returns the number of rows."""
+
+    from .archive import decompress_text
+
+    totals: Buckets = defaultdict(lambda: [0, 0])
+    day = func.date(JournalEntry.created_at)
+    hot = (
+        select(day, JournalEntry.mood, func.count(), func.sum(func.length(JournalEntry.reflection)))
+        .where(JournalEntry.deleted_at.is_(None))
+        .group_by(day, JournalEntry.mood)
+    )
+    for bucket, mood, entries, chars in executor.execute(hot):
+        total = totals[(dt.date.fromisoformat(str(bucket)), mood)]
+        total[0] += entries
+        total[1] += chars or 0
+    cold = (
+        select(ArchivedJournalEntry.created_at, ArchivedJournalEntry.mood, ArchivedJournalEntry.reflection_z)
+        .where(ArchivedJournalEntry.deleted_at.is_(None))
+        .execution_options(yield_per=_BATCH_SIZE)
+    )
+    for created_at, mood, blob in executor.execute(cold):
+        total = totals[(day_of(created_at), mood)]
+        total[0] += 1
+        total[1] += len(decompress_text(blob))
+
+    executor.execute(delete(_ROLLUP))
+    rows = [
+        {"day": day, "mood": mood, "entries": entries, "reflection_chars": chars}
+        for (day, mood), (entries, chars) in sorted(totals.items())
+    ]
+    for start in range(0, len(rows), _BATCH_SIZE):
+        executor.execute(insert(_ROLLUP), rows[start : start + _BATCH_SIZE])
+    return len(rows)
+
+
+def _contribution(values: Dict[str, Any]) -> Optional[Tuple[Tuple[dt.date, str], int]]:
+    if values["deleted_at"] is not None:
+        return None
+    if "reflection" in values:
+        length = len(values["reflection"] or "")
+    else:
+        from .archive import decompress_text
+
+        length = len(decompress_text(values["reflection_z"]))
+    return (day_of(values["created_at"]), values["mood"]), length
+
+
+def _text_column(model: Any) -> str:
+    return "reflection" if model is JournalEntry else "reflection_z"
+
+
+def _add(deltas: Buckets, contribution: Optional[Tuple[Tuple[dt.date, str], int]], sign: int) -> None:
+    if contribution is not None:
+        bucket = deltas.setdefault(contribution[0], [0, 0])
+        bucket[0] += sign
+        bucket[1] += sign * contribution[1]
+
+
+@event.listens_for(Session, "after_flush")
+def _record_rows(session: Session, flush_context) -> None:  # noqa: ARG001
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        model = type(instance)
+        if model is not JournalEntry and model is not ArchivedJournalEntry:
+            continue
+        columns = ("created_at", "mood", "deleted_at", _text_column(model))
+        state = inspect(instance)
+        current = {name: state.attrs[name].value for name in columns}
+        deltas: Buckets = session.info.setdefault(_DELTAS, {})
+        if instance in session.new:
+            _add(deltas, _contribution(current), 1)
+            continue
+        previous = dict(current)
+        for name in columns:
+            history = state.attrs[name].history
+            if history.deleted:
+                previous[name] = history.deleted[0]
+            elif history.added and state.committed_state.get(name, None) is NO_VALUE:
+                # The old value was never loaded; only a rebuild can tell.
+                session.info[_REBUILD] = True
+        _add(deltas, _contribution(previous), -1)
+        if instance not in session.deleted:
+            _add(deltas, _contribution(current), 1)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement(state: ORMExecuteState) -> None:
+    if (state.is_insert or state.is_update or state.is_delete) and not state.execution_options.get(UNCHANGED):
+        table = getattr(state.statement.table, "name", None)
+        if table in (JournalEntry.__tablename__, ArchivedJournalEntry.__tablename__):
+            state.session.info[_REBUILD] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _update_rollups(session: Session) -> None:
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    deltas = session.info.pop(_DELTAS, None)
+    if session.info.pop(_REBUILD, False):
+        rebuild(session)
+    elif deltas:
+        apply(session, deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_DELTAS, None)
+    session.info.pop(_REBUILD, None)
+
+
+# -- reading them ------------------------------------------------------------
+
+
+def report(
+    session: Any, bucket: str = "week", since: Optional[dt.date] = None, until: Optional[dt.date] = None
+) -> JournalAnalytics:
+    """Entries, reflection length and moods per ``bucket`` from ``since`` up to (not including) ``until``."""
+
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    statement = select(_ROLLUP.c.day, _ROLLUP.c.mood, _ROLLUP.c.entries, _ROLLUP.c.reflection_chars)
+    if since is not None:
+        statement = statement.where(_ROLLUP.c.day >= since)
+    if until is not None:
+        statement = statement.where(_ROLLUP.c.day < until)
+
+    # Plain lists while grouping; models are built once per period.
+    periods: Dict[dt.date, List[Any]] = {}
+    moods: Dict[str, int] = defaultdict(int)
+    by_day: Dict[dt.date, List[Any]] = {}
+    for day, mood, entries, chars in session.execute(statement.order_by(_ROLLUP.c.day, _ROLLUP.c.mood)).all():
+        period = by_day.get(day)
+        if period is None:
+            start = bucket_start(day, bucket)
+            period = by_day[day] = periods.setdefault(start, [0, 0, defaultdict(int)])
+        period[0] += entries
+        period[1] += chars
+        period[2][mood] += entries
+        moods[mood] += entries
+    return JournalAnalytics(
+        bucket=bucket,
+        periods=[
+            JournalAnalyticsPeriod(start=start, entries=entries, reflection_chars=chars, moods=dict(by_mood))
+            for start, (entries, chars, by_mood) in periods.items()
+        ],
+        moods=dict(moods),
+    )
+
+
+# -- dashboard panel ---------------------------------------------------------
+
+
+@dataclasses.dataclass(slots=True)
+class WeekRow:
+    week: str
+    reflections: int
+    average_length: int
+    top_mood: str
+
+
+@dataclasses.dataclass(slots=True)
+class MoodShare:
+    mood: str
+    reflections: int
+    percent: int
+
+
+def recent_weeks(session: Any, today: dt.date, weeks: int = 8) -> Tuple[List[WeekRow], List[MoodShare]]:
+    """The last ``weeks`` weeks, newest first, and the mood mix over them."""
+
+    this_week = bucket_start(today, "week")
+    found = report(session, "week", this_week - dt.timedelta(weeks=weeks - 1), this_week + dt.timedelta(weeks=1))
+    rows = [
+        WeekRow(
+            week=period.start.strftime("%b %d"),
+            reflections=period.entries,
+            average_length=round(period.average_reflection_length),
+            top_mood=max(period.moods, key=lambda mood: (period.moods[mood], mood)),
+        )
+        for period in reversed(found.periods)
+    ]
+    total = sum(found.moods.values())
+    shares = [
+        MoodShare(mood=mood, reflections=entries, percent=round(entries * 100 / total))
+        for mood, entries in sorted(found.moods.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    return rows, shares
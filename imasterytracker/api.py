@@ -1,70 +1,270 @@
 from __future__ import annotations
 
-from typing import Any, Callable, Iterable
-
-import reflex as rx
-from pydantic import ValidationError
+import dataclasses
+import datetime as dt
+import functools
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Annotated, Any, Awaitable, Callable, Iterable, List
+
+from pydantic import Field, TypeAdapter, ValidationError
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
     HTTP_202_ACCEPTED,
     HTTP_204_NO_CONTENT,
+    HTTP_304_NOT_MODIFIED,
     HTTP_400_BAD_REQUEST,
+    HTTP_401_UNAUTHORIZED,
     HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
+    HTTP_413_CONTENT_TOO_LARGE,
+    HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+    HTTP_422_UNPROCESSABLE_CONTENT,
+    HTTP_424_FAILED_DEPENDENCY,
+    HTTP_503_SERVICE_UNAVAILABLE,
 )
-from sqlmodel import Session, select
-
+from sqlmodel import Session
+
+from . import (
+    analytics,
+    archive,
+    backup,
+    changes,
+    compression,
+    db,
+    entity_cache,
+    listing,
+    live,
+    maintenance,
+    search,
+    shards,
+    snapshot,
+    summary,
+    tenancy,
+    tombstones,
+    var_cache,
+    workspace,
+)
+from .export_cache import ExportCache
+from .idempotency import MAX_KEY_LENGTH, IdempotencyStore, StoredResponse, request_fingerprint
+from .jobs import JobManager, QueueFull
+from .models import ArchivedJournalEntry, Habit, JournalEntry, LearningStream
 from .schemas import (
+    MAX_BATCH_SIZE,
+    BackupRead,
+    BatchOperation,
+    BatchRequest,
     HabitCreate,
     HabitRead,
+    JobRead,
     JournalEntryCreate,
     JournalEntryRead,
     LearningStreamCreate,
     LearningStreamRead,
-    WorkspaceImport,
 )
-from .state import DashboardState, Habit, JournalEntry, LearningStream
+
+
+# Requests pick their workspace with this header (or ``?workspace=``).
+WORKSPACE_HEADER = "X-Workspace"
 
 
 def _with_session(func: Callable[[Session], Any]) -> Any:
-    with rx.session() as session:
+    with tenancy.session() as session:
+        return func(session)
+
+
+def _with_read_session(func: Callable[[Session], Any]) -> Any:
+    with tenancy.read_session() as session:
         return func(session)
 
 
 def _serialize(result: Iterable[Any]) -> list[dict[str, Any]]:
-    return [item.model_dump() for item in result]
+    return [item.model_dump(mode="json") for item in result]
+
+
+def _validation_detail(error: ValidationError) -> str:
+    details = error.errors()[0]
+    raw_loc = details.get("loc", ("payload",))
+    field = str(raw_loc[-1]) if raw_loc else "payload"
+    field = field.replace("_", " ").title()
+    message = details.get("msg", "Invalid data")
+    return f"{field}: {message}"
+
+
+idempotency_store = IdempotencyStore.from_env()
+job_manager = JobManager.from_env()
+tenancy.on_open(job_manager.recover)
+backup_scheduler = backup.scheduler_from_env(job_manager.submit_backup)
+
+
+def _archive_workspaces() -> None:
+    policy = archive.ArchivePolicy.from_env()
+    for workspace_id in tenancy.workspace_ids():
+        with tenancy.session(workspace_id) as session:
+            archive.archive_entries(session, policy)
+
+
+archive_scheduler = archive.scheduler_from_env(_archive_workspaces)
+
+maintainer = maintenance.Maintenance.from_env()
+changes.subscribe_all(maintainer.record_write)
+
+
+def _maintain_workspaces() -> None:
+    for workspace_id in tenancy.workspace_ids():
+        with tenancy.session(workspace_id) as session:
+            maintainer.run(workspace_id, session)
+
+
+maintenance_scheduler = maintenance.scheduler_from_env(_maintain_workspaces)
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def idempotent(handler: Handler) -> Handler:
+    """Replay the stored response when a request repeats its ``Idempotency-Key``.
+
+    The key is bound to a fingerprint of the method, URL and body; reusing it
+    for a different payload is rejected rather than silently replayed.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(request: Request) -> Response:
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return await handler(request)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return JSONResponse(
+                {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"},
+                status_code=HTTP_400_BAD_REQUEST,
+            )
+
+        target = f"{request.url.path}?{request.url.query}" if request.url.query else request.url.path
+        fingerprint = request_fingerprint(request.method, target, await request.body())
+        workspace_id = tenancy.current_workspace()
+        if workspace_id != shards.DEFAULT_WORKSPACE:
+            # Keys are chosen by clients, so each workspace gets its own namespace.
+            key = f"{workspace_id}/{key}"
+        stored = idempotency_store.get(key)
+        if stored is None:
+            if not idempotency_store.begin(key):
+                return JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"},
+                    status_code=HTTP_409_CONFLICT,
+                )
+            try:
+                response = await handler(request)
+                if response.status_code < 500:
+                    stored = StoredResponse(
+                        fingerprint=fingerprint,
+                        status_code=response.status_code,
+                        media_type=response.media_type,
+                        body=bytes(response.body),
+                        created=time.time(),
+                    )
+                    idempotency_store.put(key, stored)
+                return response
+            finally:
+                idempotency_store.finish(key)
+
+        if stored.fingerprint != fingerprint:
+            return JSONResponse(
+                {"detail": "Idempotency-Key was already used with a different request"},
+                status_code=HTTP_422_UNPROCESSABLE_CONTENT,
+            )
+        return Response(
+            stored.body,
+            status_code=stored.status_code,
+            media_type=stored.media_type,
+            headers={"Idempotent-Replayed": "true"},
+        )
 
+    return wrapper
 
-async def list_streams(request: Request) -> JSONResponse:  # noqa: ARG001
-    data = _with_session(
-        lambda session: [
-            LearningStreamRead.model_validate(stream, from_attributes=True)
-            for stream in session.exec(select(LearningStream))
-        ]
+
+def _list(request: Request, resource: listing.Resource) -> JSONResponse:
+    """Filtered, sorted, optionally projected rows; see ``listing`` for the parameters."""
+
+    try:
+        query = listing.ListQuery.parse(resource, request.query_params)
+    except listing.ListingError as error:
+        return JSONResponse({"detail": str(error)}, status_code=HTTP_400_BAD_REQUEST)
+    return JSONResponse(_with_read_session(query.fetch), status_code=HTTP_200_OK)
+
+
+def _entity(request: Request, param: str, kind: str, load: Callable[[Session, int], Any], missing: str) -> Response:
+    """One entity as JSON, through ``entity_cache``; ``load`` returns its read schema or ``None``."""
+
+    try:
+        entity_id = int(request.path_params[param])
+    except ValueError:
+        return JSONResponse({"detail": missing}, status_code=HTTP_404_NOT_FOUND)
+
+    def _load() -> bytes | None:
+        found = _with_read_session(lambda session: load(session, entity_id))
+        return None if found is None else found.model_dump_json().encode()
+
+    body = entity_cache.cache.get(tenancy.current_workspace(), kind, entity_id, _load)
+    if body is None:
+        return JSONResponse({"detail": missing}, status_code=HTTP_404_NOT_FOUND)
+    return Response(body, status_code=HTTP_200_OK, media_type="application/json")
+
+
+def _read(model: Any, schema: type) -> Callable[[Session, int], Any]:
+    def load(session: Session, entity_id: int) -> Any:
+        record = session.get(model, entity_id)
+        return None if record is None else schema.model_validate(record, from_attributes=True)
+
+    return load
+
+
+def _load_journal_entry(session: Session, entry_id: int) -> JournalEntryRead | None:
+    entry = session.get(JournalEntry, entry_id)
+    if entry is not None:
+        return JournalEntryRead.model_validate(entry, from_attributes=True)
+    archived = session.get(ArchivedJournalEntry, entry_id)
+    if archived is None:
+        return None
+    return JournalEntryRead(
+        id=archived.id,
+        title=archived.title,
+        reflection=archive.decompress_text(archived.reflection_z),
+        mood=archived.mood,
+        created_at=archived.created_at,
     )
-    return JSONResponse(_serialize(data), status_code=HTTP_200_OK)
 
 
+async def get_stream(request: Request) -> Response:
+    return _entity(request, "stream_id", "streams", _read(LearningStream, LearningStreamRead), "Stream not found")
+
+
+async def list_streams(request: Request) -> JSONResponse:
+    return _list(request, listing.STREAMS)
+
+
+@idempotent
 async def create_stream(request: Request) -> JSONResponse:
     payload = LearningStreamCreate.model_validate(await request.json())
 
     def _create(session: Session) -> LearningStreamRead:
-        stream = LearningStream(
-            name=payload.name,
-            focus=payload.focus,
-            milestones_total=payload.milestones_total,
-            milestones_completed=payload.milestones_completed,
-            color=payload.color or DashboardState._random_color(),
-        )
+        stream = workspace.build_stream(payload)
         session.add(stream)
         session.commit()
         session.refresh(stream)
         return LearningStreamRead.model_validate(stream, from_attributes=True)
 
     created = _with_session(_create)
-    return JSONResponse(created.model_dump(), status_code=HTTP_201_CREATED)
+    return JSONResponse(created.model_dump(mode="json"), status_code=HTTP_201_CREATED)
 
 
 async def delete_stream(request: Request) -> Response:
@@ -74,35 +274,34 @@ async def delete_stream(request: Request) -> Response:
         stream = session.get(LearningStream, stream_id)
         if not stream:
             return JSONResponse({"detail": "Stream not found"}, status_code=HTTP_404_NOT_FOUND)
-        session.delete(stream)
+        tombstones.soft_delete(session, stream)
         session.commit()
         return Response(status_code=HTTP_204_NO_CONTENT)
 
     return _with_session(_delete)
 
 
-async def list_habits(request: Request) -> JSONResponse:  # noqa: ARG001
-    data = _with_session(
-        lambda session: [
-            HabitRead.model_validate(habit, from_attributes=True)
-            for habit in session.exec(select(Habit))
-        ]
-    )
-    return JSONResponse(_serialize(data), status_code=HTTP_200_OK)
+async def get_habit(request: Request) -> Response:
+    return _entity(request, "habit_id", "habits", _read(Habit, HabitRead), "Habit not found")
+
 
+async def list_habits(request: Request) -> JSONResponse:
+    return _list(request, listing.HABITS)
 
+
+@idempotent
 async def create_habit(request: Request) -> JSONResponse:
     payload = HabitCreate.model_validate(await request.json())
 
     def _create(session: Session) -> HabitRead:
-        habit = Habit(name=payload.name, cadence=payload.cadence or "Daily", context=payload.context)
+        habit = workspace.build_habit(payload)
         session.add(habit)
         session.commit()
         session.refresh(habit)
         return HabitRead.model_validate(habit, from_attributes=True)
 
     created = _with_session(_create)
-    return JSONResponse(created.model_dump(), status_code=HTTP_201_CREATED)
+    return JSONResponse(created.model_dump(mode="json"), status_code=HTTP_201_CREATED)
 
 
 async def delete_habit(request: Request) -> Response:
@@ -112,77 +311,584 @@ async def delete_habit(request: Request) -> Response:
         habit = session.get(Habit, habit_id)
         if not habit:
             return JSONResponse({"detail": "Habit not found"}, status_code=HTTP_404_NOT_FOUND)
-        session.delete(habit)
+        tombstones.soft_delete(session, habit)
         session.commit()
         return Response(status_code=HTTP_204_NO_CONTENT)
 
     return _with_session(_delete)
 
 
-async def list_journals(request: Request) -> JSONResponse:  # noqa: ARG001
-    data = _with_session(
-        lambda session: [
-            JournalEntryRead.model_validate(entry, from_attributes=True)
-            for entry in session.exec(select(JournalEntry))
-        ]
-    )
-    return JSONResponse(_serialize(data), status_code=HTTP_200_OK)
+async def get_journal_entry(request: Request) -> Response:
+    """A recent or archived journal entry."""
+
+    return _entity(request, "entry_id", "journal_entries", _load_journal_entry, "Journal entry not found")
+
 
+async def list_journals(request: Request) -> JSONResponse:
+    return _list(request, listing.JOURNALS)
 
+
+@idempotent
 async def create_journal_entry(request: Request) -> JSONResponse:
     payload = JournalEntryCreate.model_validate(await request.json())
 
     def _create(session: Session) -> JournalEntryRead:
-        entry = JournalEntry(
-            title=payload.title,
-            reflection=payload.reflection,
-            mood=payload.mood or "Curious",
-        )
+        entry = workspace.build_journal_entry(payload)
         session.add(entry)
         session.commit()
         session.refresh(entry)
         return JournalEntryRead.model_validate(entry, from_attributes=True)
 
     created = _with_session(_create)
-    return JSONResponse(created.model_dump(), status_code=HTTP_201_CREATED)
+    return JSONResponse(created.model_dump(mode="json"), status_code=HTTP_201_CREATED)
 
 
 async def delete_journal_entry(request: Request) -> Response:
     entry_id = int(request.path_params.get("entry_id", 0))
 
     def _delete(session: Session) -> Response:
-        entry = session.get(JournalEntry, entry_id)
+        entry = session.get(JournalEntry, entry_id) or session.get(ArchivedJournalEntry, entry_id)
         if not entry:
             return JSONResponse({"detail": "Journal entry not found"}, status_code=HTTP_404_NOT_FOUND)
-        session.delete(entry)
+        tombstones.soft_delete(session, entry)
         session.commit()
         return Response(status_code=HTTP_204_NO_CONTENT)
 
     return _with_session(_delete)
 
 
-async def export_workspace(request: Request) -> JSONResponse:  # noqa: ARG001
-    export = DashboardState().export_workspace()
-    return JSONResponse(export.model_dump(), status_code=HTTP_200_OK)
+async def journal_history(request: Request) -> JSONResponse:
+    """Page through recent and archived entries, newest first.
+
+    ``?q=`` filters on title, reflection and mood; pass the returned
+    ``next_cursor`` as ``?cursor=`` for the next page.
+    """
+
+    params = request.query_params
+    try:
+        limit = int(params.get("limit", "50"))
+        page = _with_read_session(
+            lambda session: archive.history(session, limit, params.get("cursor"), params.get("q"))
+        )
+    except ValueError as error:
+        return JSONResponse({"detail": str(error)}, status_code=HTTP_400_BAD_REQUEST)
+    return JSONResponse(page.model_dump(mode="json"), status_code=HTTP_200_OK)
+
+
+# One body per workspace; the dashboard's own vars stay in ``var_cache.memo``.
+summary_cache = var_cache.TableMemo(changes.tracker_for, max_entries=256)
+
+
+def _summary(workspace_id: str) -> tuple[bytes, str]:
+    """The summary body and its ETag, recomputed once per write to the workspace (or per day)."""
+
+    def _compute() -> tuple[bytes, str]:
+        found = _with_read_session(lambda session: summary.load(session, dt.date.today()))
+        body = json.dumps(dataclasses.asdict(found), separators=(",", ":")).encode()
+        return body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    return summary_cache.get("summary", tuple(workspace.TABLES), _compute, workspace_id)
+
+
+async def get_summary(request: Request) -> Response:
+    """The dashboard's headline numbers; send ``If-None-Match`` to poll for ``304`` responses."""
+
+    body, etag = _summary(tenancy.current_workspace())
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    candidates = {tag.strip().removeprefix("W/") for tag in request.headers.get("If-None-Match", "").split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, status_code=HTTP_200_OK, media_type="application/json", headers=headers)
+
+
+def _date_param(params, name: str) -> dt.date | None:
+    raw = params.get(name)
+    if raw is None:
+        return None
+    try:
+        return dt.date.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date") from None
+
+
+async def journal_analytics(request: Request) -> JSONResponse:
+    """Entries, moods and average reflection length per ``?bucket=day|week|month``.
+
+    ``?since=`` and ``?until=`` (exclusive) take dates. Only the rollups are
+    read, however long the journal.
+    """
+
+    params = request.query_params
+    try:
+        since, until = _date_param(params, "since"), _date_param(params, "until")
+        found = _with_read_session(
+            lambda session: analytics.report(session, params.get("bucket", "week"), since, until)
+        )
+    except ValueError as error:
+        return JSONResponse({"detail": str(error)}, status_code=HTTP_400_BAD_REQUEST)
+    return JSONResponse(found.model_dump(mode="json"), status_code=HTTP_200_OK)
+
+
+async def search_workspace(request: Request) -> JSONResponse:
+    """Streams, habits and journal entries matching ``?q=``, best first.
+
+    ``?kinds=stream,journal`` narrows the kinds searched and ``?limit=`` (20,
+    at most 100) caps the hits; see ``search`` for how words match.
+    """
+
+    try:
+        query = search.SearchQuery.parse(request.query_params)
+    except search.SearchError as error:
+        return JSONResponse({"detail": str(error)}, status_code=HTTP_400_BAD_REQUEST)
+    return JSONResponse(_with_read_session(query.run).model_dump(mode="json"), status_code=HTTP_200_OK)
+
+
+# Largest decompressed upload accepted on /api/import.
+MAX_IMPORT_BYTES = int(os.getenv("IMASTERY_IMPORT_MAX_BYTES", str(2 * 1024**3)))
 
 
+def _export_chunks(workspace_id: str = shards.DEFAULT_WORKSPACE):
+    with tenancy.read_session(workspace_id) as session:
+        yield from workspace.iter_export_json(session)
+
+
+export_cache = ExportCache.from_env(_export_chunks, changes.tracker)
+
+# Other workspaces get their own cache while their shard is in use; as many
+# are kept as the shard pool keeps engines open.
+_shard_export_caches: "OrderedDict[str, ExportCache]" = OrderedDict()
+_shard_export_lock = threading.Lock()
+
+
+def _export_cache(workspace_id: str) -> ExportCache:
+    if workspace_id == shards.DEFAULT_WORKSPACE:
+        return export_cache
+    with _shard_export_lock:
+        cache = _shard_export_caches.get(workspace_id)
+        if cache is not None:
+            _shard_export_caches.move_to_end(workspace_id)
+            return cache
+        cache = _shard_export_caches[workspace_id] = ExportCache.from_env(
+            functools.partial(_export_chunks, workspace_id), changes.tracker_for(workspace_id)
+        )
+        evicted = []
+        while len(_shard_export_caches) > tenancy.pool.max_engines:
+            evicted.append(_shard_export_caches.popitem(last=False)[1])
+    for stale in evicted:
+        stale.close()
+    return cache
+
+
+def _snapshot_chunks(workspace_id: str, chunk_size: int = 1024 * 1024):
+    # The directory is written last, so the snapshot goes through a temp file.
+    with tempfile.TemporaryFile() as handle:
+        with tenancy.read_session(workspace_id) as session:
+            snapshot.write_snapshot(session, handle)
+        handle.seek(0)
+        while chunk := handle.read(chunk_size):
+            yield chunk
+
+
+async def export_workspace(request: Request) -> Response:
+    """Stream the export, compressed when ``Accept-Encoding`` allows it.
+
+    ``?format=snapshot`` (or ``Accept: application/vnd.imastery.snapshot``)
+    returns the binary snapshot instead of JSON.
+    """
+
+    export_format = request.query_params.get("format")
+    if export_format is None:
+        export_format = "snapshot" if snapshot.MEDIA_TYPE in request.headers.get("accept", "") else "json"
+    if export_format not in ("json", "snapshot"):
+        return JSONResponse(
+            {"detail": "format must be 'json' or 'snapshot'"},
+            status_code=HTTP_400_BAD_REQUEST,
+        )
+    encoding = compression.negotiate(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    workspace_id = tenancy.current_workspace()
+    if export_format == "snapshot":
+        body = _snapshot_chunks(workspace_id)
+        if encoding is not None:
+            body = compression.compress(body, encoding)
+        return StreamingResponse(body, media_type=snapshot.MEDIA_TYPE, headers=headers)
+
+    cache = _export_cache(workspace_id)
+    cached = cache.get(encoding)
+    if cached is not None:
+        headers["X-Export-Cache"] = "hit"
+        return Response(cached, media_type="application/json", headers=headers)
+    headers["X-Export-Cache"] = "miss"
+    return StreamingResponse(cache.stream(encoding), media_type="application/json", headers=headers)
+
+
+@idempotent
 async def import_workspace(request: Request) -> JSONResponse:
-    raw = await request.json()
+    mode = request.query_params.get("mode", "replace")
+    if mode not in ("replace", "merge"):
+        return JSONResponse(
+            {"detail": "mode must be 'replace' or 'merge'"},
+            status_code=HTTP_400_BAD_REQUEST,
+        )
+    # Validation and writes happen on the job pool; poll /api/jobs/{id}.
+    # Snapshots are told apart from JSON by their magic bytes.
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding == "identity":
+        raw = await request.body()
+        return _accepted(lambda: job_manager.submit_import(raw, mode))
+    if encoding not in compression.ENCODINGS:
+        return JSONResponse(
+            {"detail": f"Content-Encoding must be one of identity, {', '.join(compression.ENCODINGS)}"},
+            status_code=HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    # Compressed uploads are inflated straight to a spool file that the job
+    # maps, so the decompressed document never sits in memory as a whole.
+    os.makedirs(job_manager.artifact_dir, exist_ok=True)
+    spool = tempfile.NamedTemporaryFile(dir=job_manager.artifact_dir, suffix=".upload", delete=False)
     try:
-        payload = WorkspaceImport.model_validate(raw)
+        with spool:
+            async for chunk in compression.decompress(request.stream(), encoding, MAX_IMPORT_BYTES):
+                spool.write(chunk)
+    except (zlib.error, compression.BodyTooLarge) as error:
+        os.remove(spool.name)
+        too_large = isinstance(error, compression.BodyTooLarge)
+        return JSONResponse(
+            {"detail": str(error) if too_large else f"Body is not valid {encoding} data"},
+            status_code=HTTP_413_CONTENT_TOO_LARGE if too_large else HTTP_400_BAD_REQUEST,
+        )
+    response = _accepted(lambda: job_manager.submit_import_file(spool.name, mode))
+    if response.status_code != HTTP_202_ACCEPTED:
+        os.remove(spool.name)
+    return response
+
+
+async def start_export(request: Request) -> JSONResponse:  # noqa: ARG001
+    return _accepted(job_manager.submit_export)
+
+
+def _accepted(submit: Callable[[], JobRead]) -> JSONResponse:
+    try:
+        job = submit()
+    except QueueFull as error:
+        return JSONResponse(
+            {"detail": f"Job queue is full: {error}"},
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "5"},
+        )
+    location = f"/api/jobs/{job.id}"
+    return JSONResponse(
+        {"status": "accepted", "job_id": job.id, "location": location},
+        status_code=HTTP_202_ACCEPTED,
+        headers={"Location": location},
+    )
+
+
+async def get_job(request: Request) -> JSONResponse:
+    job = job_manager.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"detail": "Job not found"}, status_code=HTTP_404_NOT_FOUND)
+    return JSONResponse(job.model_dump(mode="json"), status_code=HTTP_200_OK)
+
+
+async def cancel_job(request: Request) -> JSONResponse:
+    job_id = request.path_params["job_id"]
+    if job_manager.get(job_id) is None:
+        return JSONResponse({"detail": "Job not found"}, status_code=HTTP_404_NOT_FOUND)
+    if not job_manager.cancel(job_id):
+        return JSONResponse({"detail": "Job has already finished"}, status_code=HTTP_409_CONFLICT)
+    return JSONResponse({"status": "cancelling", "job_id": job_id}, status_code=HTTP_202_ACCEPTED)
+
+
+async def download_artifact(request: Request) -> Response:
+    job_id = request.path_params["job_id"]
+    path = job_manager.artifact_path(job_id)
+    if path is None:
+        return JSONResponse({"detail": "No artifact for this job"}, status_code=HTTP_404_NOT_FOUND)
+    if path.endswith(backup.SUFFIX):
+        # A backup is a copy of the whole database; it is as admin-only as the job that made it.
+        denied = _admin_denied(request)
+        if denied is not None:
+            return denied
+        return FileResponse(path, media_type="application/vnd.sqlite3", filename=os.path.basename(path))
+    return FileResponse(path, media_type="application/json", filename=f"workspace-{job_id}.json")
+
+
+# ---------------------------------------------------------------------------
+# Admin
+# ---------------------------------------------------------------------------
+
+
+def _admin_denied(request: Request) -> Response | None:
+    token = os.getenv("IMASTERY_ADMIN_TOKEN")
+    if token:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return JSONResponse({"detail": "Admin token required"}, status_code=HTTP_401_UNAUTHORIZED)
+    return None
+
+
+def admin_only(handler: Handler) -> Handler:
+    """Require ``Authorization: Bearer $IMASTERY_ADMIN_TOKEN`` when the token is set."""
+
+    @functools.wraps(handler)
+    async def wrapper(request: Request) -> Response:
+        denied = _admin_denied(request)
+        if denied is not None:
+            return denied
+        return await handler(request)
+
+    return wrapper
+
+
+def _backup_policy() -> backup.BackupPolicy:
+    return backup.BackupPolicy.from_env(db.database_url())
+
+
+@admin_only
+async def list_backups(request: Request) -> JSONResponse:  # noqa: ARG001
+    try:
+        policy = _backup_policy()
+    except backup.BackupError as error:
+        return JSONResponse({"detail": str(error)}, status_code=HTTP_400_BAD_REQUEST)
+
+    def _listed(workspace_id: str) -> List[BackupRead]:
+        return [
+            BackupRead(name=item.name, size_bytes=item.size_bytes, created_at=item.created_at)
+            for item in backup.list_backups(backup.workspace_policy(policy, workspace_id).directory)
+        ]
+
+    shard_backups = {workspace_id: _serialize(_listed(workspace_id)) for workspace_id in tenancy.workspace_ids()[1:]}
+    return JSONResponse(
+        {
+            "keep": policy.keep,
+            "max_age_days": policy.max_age_days,
+            "backups": _serialize(_listed(shards.DEFAULT_WORKSPACE)),
+            "workspaces": shard_backups,
+        },
+        status_code=HTTP_200_OK,
+    )
+
+
+@admin_only
+async def cache_stats(request: Request) -> JSONResponse:  # noqa: ARG001
+    # The change counters of the workspace the request targets, like the caches beside them.
+    workspace_id = tenancy.current_workspace()
+    tracker = changes.tracker_for(workspace_id)
+    return JSONResponse(
+        {
+            "export": export_cache.stats(),
+            "changes": {
+                "workspace": workspace_id,
+                "versions": tracker.versions(),
+                "syncs": tracker.syncs,
+                "remote_changes": tracker.remote_changes,
+            },
+            "live": live.hub.stats(),
+            "vars": var_cache.memo.stats(),
+            "summary": summary_cache.stats(),
+            "shards": tenancy.pool.stats(),
+            "entities": entity_cache.cache.stats(),
+        },
+        status_code=HTTP_200_OK,
+    )
+
+
+@admin_only
+async def maintenance_stats(request: Request) -> JSONResponse:  # noqa: ARG001
+    return JSONResponse(maintainer.stats(), status_code=HTTP_200_OK)
+
+
+@admin_only
+async def run_maintenance(request: Request) -> JSONResponse:  # noqa: ARG001
+    """Maintain the request's workspace now, busy or not; returns the run's report."""
+
+    workspace_id = tenancy.current_workspace()
+    report = _with_session(lambda session: maintainer.run(workspace_id, session, force=True))
+    return JSONResponse(report, status_code=HTTP_200_OK)
+
+
+@admin_only
+async def start_archive(request: Request) -> JSONResponse:  # noqa: ARG001
+    return _accepted(job_manager.submit_archive)
+
+
+@admin_only
+async def start_backup(request: Request) -> JSONResponse:  # noqa: ARG001
+    # Backups cover the application database and every shard; the job is tracked in the former.
+    with tenancy.use_workspace(shards.DEFAULT_WORKSPACE):
+        return _accepted(job_manager.submit_backup)
+
+
+# Bulk creates take a JSON array of create payloads and insert them in one
+# transaction; a single invalid item rejects the whole request.
+# The length limit is part of the type, so an oversized array is rejected as
+# soon as validation passes ``MAX_BATCH_SIZE`` items, not after all of them.
+_BULK_STREAMS = TypeAdapter(Annotated[List[LearningStreamCreate], Field(max_length=MAX_BATCH_SIZE)])
+_BULK_HABITS = TypeAdapter(Annotated[List[HabitCreate], Field(max_length=MAX_BATCH_SIZE)])
+_BULK_JOURNALS = TypeAdapter(Annotated[List[JournalEntryCreate], Field(max_length=MAX_BATCH_SIZE)])
+
+
+async def _bulk_create(
+    request: Request,
+    adapter: TypeAdapter,
+    build: Callable[[Any], Any],
+    read_model: type,
+) -> JSONResponse:
+    try:
+        payloads = adapter.validate_json(await request.body())
     except ValidationError as error:
-        details = error.errors()[0]
-        raw_loc = details.get("loc", ("payload",))
-        field = str(raw_loc[-1]) if raw_loc else "payload"
-        field = field.replace("_", " ").title()
-        message = details.get("msg", "Invalid data")
-        return JSONResponse({"detail": f"{field}: {message}"}, status_code=HTTP_400_BAD_REQUEST)
+        first = error.errors()[0]
+        if first["type"] == "too_long" and not first.get("loc"):
+            return JSONResponse(
+                {"detail": f"At most {MAX_BATCH_SIZE} items per request"},
+                status_code=HTTP_400_BAD_REQUEST,
+            )
+        raw_loc = first.get("loc", ())
+        prefix = f"Item {raw_loc[0]} " if raw_loc and isinstance(raw_loc[0], int) else ""
+        return JSONResponse(
+            {"detail": f"{prefix}{_validation_detail(error)}"},
+            status_code=HTTP_400_BAD_REQUEST,
+        )
 
-    state = DashboardState()
-    state.import_workspace(payload)
-    if state.toast_message.startswith("Workspace imported"):
-        return JSONResponse({"status": "accepted"}, status_code=HTTP_202_ACCEPTED)
-    return JSONResponse({"detail": state.toast_message}, status_code=HTTP_400_BAD_REQUEST)
+    def _create(session: Session) -> list[Any]:
+        records = [build(payload) for payload in payloads]
+        session.add_all(records)
+        session.flush()
+        created = [read_model.model_validate(record, from_attributes=True) for record in records]
+        session.commit()
+        return created
+
+    return JSONResponse(_serialize(_with_session(_create)), status_code=HTTP_201_CREATED)
+
+
+@idempotent
+async def create_streams_bulk(request: Request) -> JSONResponse:
+    return await _bulk_create(request, _BULK_STREAMS, workspace.build_stream, LearningStreamRead)
+
+
+@idempotent
+async def create_habits_bulk(request: Request) -> JSONResponse:
+    return await _bulk_create(request, _BULK_HABITS, workspace.build_habit, HabitRead)
+
+
+@idempotent
+async def create_journals_bulk(request: Request) -> JSONResponse:
+    return await _bulk_create(request, _BULK_JOURNALS, workspace.build_journal_entry, JournalEntryRead)
+
+
+_BATCH_CREATE = {
+    "stream": (LearningStreamCreate, workspace.build_stream, LearningStreamRead),
+    "habit": (HabitCreate, workspace.build_habit, HabitRead),
+    "journal": (JournalEntryCreate, workspace.build_journal_entry, JournalEntryRead),
+}
+
+_BATCH_TARGETS = {
+    "stream": (LearningStream, "Stream not found"),
+    "habit": (Habit, "Habit not found"),
+    "journal": (JournalEntry, "Journal entry not found"),
+}
+
+
+class _BatchFailure(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _apply_operation(session: Session, operation: BatchOperation) -> tuple[int, Any]:
+    if operation.op == "create":
+        schema, build, read_model = _BATCH_CREATE[operation.type]
+        try:
+            payload = schema.model_validate(operation.data)
+        except ValidationError as error:
+            raise _BatchFailure(HTTP_400_BAD_REQUEST, _validation_detail(error)) from error
+        record = build(payload)
+        session.add(record)
+        session.flush()
+        return HTTP_201_CREATED, read_model.model_validate(record, from_attributes=True).model_dump(mode="json")
+
+    model, missing = _BATCH_TARGETS[operation.type]
+    record = session.get(model, operation.id)
+    # An earlier operation in the batch may have deleted it already.
+    if record is None or record.deleted_at is not None:
+        raise _BatchFailure(HTTP_404_NOT_FOUND, missing)
+    if operation.op == "delete":
+        tombstones.soft_delete(session, record)
+        session.flush()
+        return HTTP_204_NO_CONTENT, None
+
+    workspace.apply_progress(record, operation.delta)
+    session.add(record)
+    session.flush()
+    return HTTP_200_OK, LearningStreamRead.model_validate(record, from_attributes=True).model_dump(mode="json")
+
+
+def _run_batch(session: Session, operations: List[BatchOperation]) -> tuple[int, dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    for index, operation in enumerate(operations):
+        try:
+            status_code, body = _apply_operation(session, operation)
+        except _BatchFailure as failure:
+            session.rollback()
+            # Nothing was applied: earlier operations are reported as rolled
+            # back and later ones as skipped, both with 424.
+            results = [
+                {"index": position, "status": HTTP_424_FAILED_DEPENDENCY, "body": None}
+                for position in range(len(operations))
+            ]
+            results[index] = {
+                "index": index,
+                "status": failure.status_code,
+                "body": {"detail": failure.detail},
+            }
+            return failure.status_code, {"committed": False, "failed_index": index, "results": results}
+        results.append({"index": index, "status": status_code, "body": body})
+
+    session.commit()
+    return HTTP_200_OK, {"committed": True, "results": results}
+
+
+@idempotent
+async def run_batch(request: Request) -> JSONResponse:
+    """Apply a list of create/delete/progress operations atomically."""
+
+    try:
+        batch = BatchRequest.model_validate_json(await request.body())
+    except ValidationError as error:
+        return JSONResponse({"detail": _validation_detail(error)}, status_code=HTTP_400_BAD_REQUEST)
+
+    status_code, body = _with_session(lambda session: _run_batch(session, batch.operations))
+    return JSONResponse(body, status_code=status_code)
+
+
+class WorkspaceMiddleware:
+    """Run each API request in its workspace, after picking up writes other processes made to it."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        workspace_id = (
+            request.headers.get(WORKSPACE_HEADER)
+            or request.query_params.get("workspace")
+            or shards.DEFAULT_WORKSPACE
+        )
+        try:
+            shards.validate_workspace_id(workspace_id)
+        except shards.ShardError as error:
+            await JSONResponse({"detail": str(error)}, status_code=HTTP_400_BAD_REQUEST)(scope, receive, send)
+            return
+        with tenancy.use_workspace(workspace_id):
+            changes.tracker_for(workspace_id).sync()
+            await self.app(scope, receive, send)
 
 
 def register_routes(app) -> None:
@@ -190,17 +896,42 @@ def register_routes(app) -> None:
     if api is None:
         raise AttributeError("Reflex app does not expose a FastAPI instance")
 
+    api.add_middleware(WorkspaceMiddleware)
+
     api.add_route("/api/streams", list_streams, methods=["GET"])
     api.add_route("/api/streams", create_stream, methods=["POST"])
+    api.add_route("/api/streams/bulk", create_streams_bulk, methods=["POST"])
+    api.add_route("/api/streams/{stream_id}", get_stream, methods=["GET"])
     api.add_route("/api/streams/{stream_id}", delete_stream, methods=["DELETE"])
 
     api.add_route("/api/habits", list_habits, methods=["GET"])
     api.add_route("/api/habits", create_habit, methods=["POST"])
+    api.add_route("/api/habits/bulk", create_habits_bulk, methods=["POST"])
+    api.add_route("/api/habits/{habit_id}", get_habit, methods=["GET"])
     api.add_route("/api/habits/{habit_id}", delete_habit, methods=["DELETE"])
 
     api.add_route("/api/journals", list_journals, methods=["GET"])
+    api.add_route("/api/journals/history", journal_history, methods=["GET"])
     api.add_route("/api/journals", create_journal_entry, methods=["POST"])
+    api.add_route("/api/journals/bulk", create_journals_bulk, methods=["POST"])
+    api.add_route("/api/journals/{entry_id}", get_journal_entry, methods=["GET"])
     api.add_route("/api/journals/{entry_id}", delete_journal_entry, methods=["DELETE"])
 
+    api.add_route("/api/summary", get_summary, methods=["GET"])
+    api.add_route("/api/analytics/journal", journal_analytics, methods=["GET"])
+    api.add_route("/api/search", search_workspace, methods=["GET"])
     api.add_route("/api/export", export_workspace, methods=["GET"])
     api.add_route("/api/import", import_workspace, methods=["POST"])
+    api.add_route("/api/batch", run_batch, methods=["POST"])
+
+    api.add_route("/api/exports", start_export, methods=["POST"])
+    api.add_route("/api/jobs/{job_id}", get_job, methods=["GET"])
+    api.add_route("/api/jobs/{job_id}/cancel", cancel_job, methods=["POST"])
+    api.add_route("/api/jobs/{job_id}/artifact", download_artifact, methods=["GET"])
+
+    api.add_route("/api/admin/backups", list_backups, methods=["GET"])
+    api.add_route("/api/admin/backups", start_backup, methods=["POST"])
+    api.add_route("/api/admin/cache", cache_stats, methods=["GET"])
+    api.add_route("/api/admin/archive", start_archive, methods=["POST"])
+    api.add_route("/api/admin/maintenance", maintenance_stats, methods=["GET"])
+    api.add_route("/api/admin/maintenance", run_maintenance, methods=["POST"])
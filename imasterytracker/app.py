@@ -1,9 +1,20 @@
 from __future__ import annotations
 
+from .startup import profiler  # first, so the profiler origin precedes the heavy imports
+
+import asyncio
+import contextlib
+
 import reflex as rx
 
-from .api import register_routes
-from .state import DashboardState, Habit, JournalEntry, LearningStream
+from . import live
+from .api import archive_scheduler, backup_scheduler, job_manager, maintenance_scheduler, register_routes
+from .analytics import MoodShare, WeekRow
+from .projections import HabitCard, JournalCard, StreamCard
+from .schemas import SearchHit
+from .state import ChangeSync, DashboardState, prepare_database
+
+profiler.mark("imports")
 
 
 def section_header(title: str, description: str) -> rx.Component:
@@ -62,6 +73,53 @@ def hero_section() -> rx.Component:
     )
 
 
+def search_hit(hit: SearchHit) -> rx.Component:
+    """One search result: its kind, title and the best matching passage."""
+
+    return rx.hstack(
+        rx.badge(hit.kind, color_scheme="gray", variant="soft"),
+        rx.vstack(
+            rx.text(hit.title, weight="medium", size="3"),
+            rx.text(hit.snippet, color="gray.10", size="2"),
+            align="start",
+            gap="1",
+        ),
+        align="start",
+        gap="3",
+        width="100%",
+    )
+
+
+def search_section() -> rx.Component:
+    """One box searching streams, habits and journal entries as you type."""
+
+    return rx.vstack(
+        rx.input(
+            placeholder="Search streams, habits and reflections",
+            value=DashboardState.search_query,
+            on_change=DashboardState.set_search_query.debounce(250),
+            size="3",
+            width="100%",
+        ),
+        rx.cond(
+            DashboardState.search_hits.length() > 0,
+            rx.card(
+                rx.vstack(rx.foreach(DashboardState.search_hits, search_hit), gap="3", width="100%"),
+                width="100%",
+                padding="4",
+                border_radius="xl",
+            ),
+            rx.cond(
+                DashboardState.search_query != "",
+                rx.text("No matches yet.", color="gray.10", size="2"),
+                rx.fragment(),
+            ),
+        ),
+        gap="3",
+        width="100%",
+    )
+
+
 def stats_section() -> rx.Component:
     """Key stats for the dashboard."""
 
@@ -95,7 +153,7 @@ def stats_section() -> rx.Component:
     )
 
 
-def stream_card(stream: LearningStream) -> rx.Component:
+def stream_card(stream: StreamCard) -> rx.Component:
     """Render a learning stream progress card."""
 
     progress = rx.cond(
@@ -291,7 +349,7 @@ def streams_section() -> rx.Component:
     )
 
 
-def habit_card(habit: Habit) -> rx.Component:
+def habit_card(habit: HabitCard) -> rx.Component:
     """Render an individual habit card."""
 
     return rx.card(
@@ -311,8 +369,9 @@ def habit_card(habit: Habit) -> rx.Component:
             rx.hstack(
                 rx.cond(
                     habit.last_completed_on,
-                    rx.text(
-                        habit.last_completed_on.strftime("%b %d, %Y"),
+                    rx.moment(
+                        habit.last_completed_on,
+                        format="MMM DD, YYYY",
                         color="gray.10",
                         size="3",
                     ),
@@ -439,7 +498,7 @@ def habits_section() -> rx.Component:
     )
 
 
-def journal_card(entry: JournalEntry) -> rx.Component:
+def journal_card(entry: JournalCard) -> rx.Component:
     """Render a single journal entry card."""
 
     return rx.card(
@@ -456,8 +515,9 @@ def journal_card(entry: JournalEntry) -> rx.Component:
                 ),
             ),
             rx.text(entry.reflection, color="gray.10", size="3"),
-            rx.text(
-                entry.created_at.strftime("%b %d, %Y %H:%M"),
+            rx.moment(
+                entry.created_at,
+                format="MMM DD, YYYY HH:mm",
                 color="gray.8",
                 size="2",
             ),
@@ -580,6 +640,61 @@ def journal_section() -> rx.Component:
     )
 
 
+def week_row(row: WeekRow) -> rx.Component:
+    """One week of the reflection trend table."""
+
+    return rx.table.row(
+        rx.table.cell(row.week),
+        rx.table.cell(row.reflections),
+        rx.table.cell(row.average_length),
+        rx.table.cell(rx.badge(row.top_mood, color_scheme="orange")),
+    )
+
+
+def mood_badge(share: MoodShare) -> rx.Component:
+    return rx.badge(share.mood, " ", share.percent, "%", color_scheme="orange", variant="soft")
+
+
+def analytics_section() -> rx.Component:
+    """Reflections per week, their length and the mood mix, from the journal rollups."""
+
+    return rx.vstack(
+        section_header(
+            "Reflection trends",
+            "How often you reflect, how deeply, and in what mood over the last eight weeks.",
+        ),
+        rx.cond(
+            DashboardState.weekly_reflections.length() > 0,
+            rx.card(
+                rx.vstack(
+                    rx.hstack(rx.foreach(DashboardState.mood_shares, mood_badge), spacing="2", wrap="wrap"),
+                    rx.table.root(
+                        rx.table.header(
+                            rx.table.row(
+                                rx.table.column_header_cell("Week of"),
+                                rx.table.column_header_cell("Entries"),
+                                rx.table.column_header_cell("Avg. length"),
+                                rx.table.column_header_cell("Top mood"),
+                            )
+                        ),
+                        rx.table.body(rx.foreach(DashboardState.weekly_reflections, week_row)),
+                        width="100%",
+                    ),
+                    gap="4",
+                    align="start",
+                    width="100%",
+                ),
+                width="100%",
+                padding="6",
+                border_radius="2xl",
+            ),
+            rx.text("Trends appear once you log reflections.", color="gray.10", size="3"),
+        ),
+        gap="5",
+        width="100%",
+    )
+
+
 def toast_banner() -> rx.Component:
     """Banner showing the latest toast message."""
 
@@ -605,7 +720,8 @@ def toast_banner() -> rx.Component:
     )
 
 
-@rx.page(route="/", title="iMasteryTracker")
+@rx.page(route="/", title="iMasteryTracker", on_load=DashboardState.watch_changes)
+@profiler.timed("pages")
 def index() -> rx.Component:
     """Primary dashboard page."""
 
@@ -613,11 +729,13 @@ def index() -> rx.Component:
         rx.center(
             rx.vstack(
                 hero_section(),
+                search_section(),
                 toast_banner(),
                 stats_section(),
                 streams_section(),
                 habits_section(),
                 journal_section(),
+                analytics_section(),
                 gap="10",
                 width="100%",
                 max_width="1100px",
@@ -629,6 +747,35 @@ def index() -> rx.Component:
     )
 
 
+def on_startup() -> dict[str, float]:
+    """Prepare the database, then report how long the worker took to get ready."""
+
+    with profiler.phase("models"):
+        prepare_database()
+        job_manager.recover()
+        live.hub.start()
+    return profiler.log_ready()
+
+
+@contextlib.asynccontextmanager
+async def run_schedulers():
+    """Run the backup, archive and maintenance schedules for the worker's lifetime."""
+
+    schedulers = [s for s in (backup_scheduler, archive_scheduler, maintenance_scheduler) if s is not None]
+    for scheduler in schedulers:
+        scheduler.start()
+    try:
+        yield
+    finally:
+        for scheduler in schedulers:
+            await asyncio.to_thread(scheduler.stop)
+
+
 app = rx.App(_state=DashboardState)
+app.add_middleware(ChangeSync())
 app.add_page(index)
+profiler.mark("app")
 register_routes(app)
+app.register_lifespan_task(on_startup)
+app.register_lifespan_task(run_schedulers)
+profiler.mark("routes")
@@ -0,0 +1,269 @@
+"""Cold storage for old journal entries.
+
+Entries older than ``ArchivePolicy.after_days`` move from ``journalentry`` to
+``archivedjournalentry`` in short batches, with the reflection text
+zlib-compressed, so the table the dashboard and ``/api/journals`` read stays
+the size of the recent journal. Archived entries keep their ids (journal ids
+are never reused) and are still part of the workspace: exports, snapshots and
+counts include them, ``history`` pages through both tiers, and a merge import
+matches and updates them where they are.
+"""
+
+from __future__ import annotations
+
+import base64
+import dataclasses
+import datetime as dt
+import heapq
+import os
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, insert, or_, true, update
+from sqlmodel import Session, delete, select
+
+from .analytics import UNCHANGED
+from .models import ArchivedJournalEntry, JournalEntry
+from .scheduler import Scheduler
+from .schemas import JournalEntryRead, JournalHistoryEntry, JournalHistoryPage
+
+Progress = Optional[Callable[[int], None]]
+
+# Entries moved per transaction: each batch holds the write lock only briefly.
+BATCH_SIZE = 500
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class ArchivePolicy:
+    after_days: float = 180.0
+    batch_size: int = BATCH_SIZE
+
+    @classmethod
+    def from_env(cls) -> "ArchivePolicy":
+        return cls(
+            after_days=float(os.getenv("IMASTERY_ARCHIVE_AFTER_DAYS", "180")),
+            batch_size=int(os.getenv("IMASTERY_ARCHIVE_BATCH_SIZE", str(BATCH_SIZE))),
+        )
+
+    def cutoff(self, now: Optional[dt.datetime] = None) -> dt.datetime:
+        return (now or dt.datetime.now(dt.timezone.utc)) - dt.timedelta(days=self.after_days)
+
+
+def scheduler_from_env(run: Callable[[], object]) -> Optional[Scheduler]:
+    """Run ``run`` every ``$IMASTERY_ARCHIVE_INTERVAL_MINUTES`` (60; 0 disables it)."""
+
+    return Scheduler.from_env(run, "IMASTERY_ARCHIVE_INTERVAL_MINUTES", 60, name="archive")
+
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode(), 6)
+
+
+def decompress_text(blob: bytes) -> str:
+    return zlib.decompress(blob).decode()
+
+
+_HOT = (JournalEntry.id, JournalEntry.title, JournalEntry.reflection, JournalEntry.mood, JournalEntry.created_at)
+_COLD = (
+    ArchivedJournalEntry.id,
+    ArchivedJournalEntry.title,
+    ArchivedJournalEntry.reflection_z,
+    ArchivedJournalEntry.mood,
+    ArchivedJournalEntry.created_at,
+)
+
+
+# ---------------------------------------------------------------------------
+# Moving entries between the tiers
+# ---------------------------------------------------------------------------
+
+
+def archive_entries(session: Session, policy: ArchivePolicy, on_progress: Progress = None) -> int:
+    """Move entries older than the policy's cutoff, committing once per batch."""
+
+    cutoff = policy.cutoff()
+    moved = 0
+    while True:
+        rows = session.exec(
+            select(*_HOT)
+            .where(JournalEntry.created_at < cutoff)
+            .order_by(JournalEntry.created_at, JournalEntry.id)
+            .limit(policy.batch_size)
+        ).all()
+        if not rows:
+            return moved
+        archived_at = dt.datetime.now(dt.timezone.utc)
+        # Moving entries between the tiers leaves the analytics and search index as they are.
+        session.exec(
+            insert(ArchivedJournalEntry).execution_options(**{UNCHANGED: True}),
+            params=[
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "reflection_z": compress_text(row.reflection),
+                    "mood": row.mood,
+                    "created_at": row.created_at,
+                    "archived_at": archived_at,
+                }
+                for row in rows
+            ],
+        )
+        session.exec(
+            delete(JournalEntry)
+            .where(JournalEntry.id.in_([row.id for row in rows]))
+            .execution_options(**{UNCHANGED: True})
+        )
+        session.commit()
+        moved += len(rows)
+        if on_progress is not None:
+            on_progress(len(rows))
+
+
+def update_archived(session: Session, updates: Sequence[Dict[str, Any]]) -> None:
+    """Rewrite archived entries in place from ``id`` plus plain ``title``/``reflection``/``mood`` values."""
+
+    if updates:
+        session.exec(update(ArchivedJournalEntry), params=[_freeze(values) for values in updates])
+
+
+def archived_count(session: Session) -> int:
+    return session.exec(select(func.count()).select_from(ArchivedJournalEntry)).one()
+
+
+# ---------------------------------------------------------------------------
+# Reading both tiers
+# ---------------------------------------------------------------------------
+
+
+def iter_column(session: Session, name: str, batch_size: int = 1000) -> Iterator[Any]:
+    """Values of one journal column across both tiers, in id order."""
+
+    hot = session.exec(
+        select(JournalEntry.id, getattr(JournalEntry, name))
+        .order_by(JournalEntry.id)
+        .execution_options(yield_per=batch_size)
+    )
+    column = "reflection_z" if name == "reflection" else name
+    cold = session.exec(
+        select(ArchivedJournalEntry.id, getattr(ArchivedJournalEntry, column))
+        .order_by(ArchivedJournalEntry.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if name == "reflection":
+        cold = ((row_id, decompress_text(blob)) for row_id, blob in cold)
+    for _, value in heapq.merge(hot, cold, key=lambda row: row[0]):
+        yield value
+
+
+def iter_entries(session: Session, batch_size: int = 1000) -> Iterator[JournalEntryRead]:
+    """Every journal entry of both tiers, in id order."""
+
+    hot = session.exec(select(*_HOT).order_by(JournalEntry.id).execution_options(yield_per=batch_size))
+    cold = session.exec(select(*_COLD).order_by(ArchivedJournalEntry.id).execution_options(yield_per=batch_size))
+    for row in heapq.merge(hot, map(_thaw, cold), key=lambda row: row[0]):
+        yield JournalEntryRead(id=row[0], title=row[1], reflection=row[2], mood=row[3], created_at=row[4])
+
+
+def iter_archived(session: Session, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Archived entries as plain column dicts, reflections decompressed."""
+
+    rows = session.exec(select(*_COLD).execution_options(yield_per=batch_size))
+    for row in map(_thaw, rows):
+        yield dict(zip(("id", "title", "reflection", "mood", "created_at"), row))
+
+
+def _thaw(row: Any) -> Tuple[Any, ...]:
+    return (row[0], row[1], decompress_text(row[2]), row[3], row[4])
+
+
+def _freeze(values: Dict[str, Any]) -> Dict[str, Any]:
+    frozen = dict(values)
+    if "reflection" in frozen:
+        frozen["reflection_z"] = compress_text(frozen.pop("reflection"))
+    return frozen
+
+
+def encode_cursor(created_at: dt.datetime, entry_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{entry_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[dt.datetime, int]:
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return dt.datetime.fromisoformat(created_at), int(entry_id)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise InvalidCursor("Invalid cursor") from error
+
+
+def _before(model: Any, cursor: Optional[Tuple[dt.datetime, int]]) -> Any:
+    if cursor is None:
+        return true()
+    created_at, entry_id = cursor
+    return or_(model.created_at < created_at, and_(model.created_at == created_at, model.id < entry_id))
+
+
+def _matches(entry: JournalHistoryEntry, needle: str) -> bool:
+    return any(needle in value.lower() for value in (entry.title, entry.reflection, entry.mood))
+
+
+def history(
+    session: Session, limit: int = 50, cursor: Optional[str] = None, query: Optional[str] = None
+) -> JournalHistoryPage:
+    """Newest-first page of entries from both tiers, optionally filtered by ``query``.
+
+    ``query`` is a case-insensitive substring of the title, reflection or
+    mood. Archived reflections are compressed, so archived candidates are
+    filtered after decompression, a batch at a time.
+    """
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+    needle = (query or "").strip().lower()
+
+    hot_query = select(*_HOT).where(_before(JournalEntry, position))
+    if needle:
+        hot_query = hot_query.where(
+            or_(*(func.lower(column).contains(needle, autoescape=True) for column in _HOT[1:4]))
+        )
+    hot_query = hot_query.order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc()).limit(limit + 1)
+    entries = [JournalHistoryEntry(**row._mapping) for row in session.exec(hot_query)]
+
+    # Once recent entries fill the page, older archived ones cannot make it.
+    floor = (entries[limit - 1].created_at, entries[limit - 1].id) if len(entries) > limit else None
+    cold: List[JournalHistoryEntry] = []
+    after = position
+    while len(cold) <= limit:
+        rows = session.exec(
+            select(*_COLD)
+            .where(_before(ArchivedJournalEntry, after))
+            .order_by(ArchivedJournalEntry.created_at.desc(), ArchivedJournalEntry.id.desc())
+            .limit(limit + 1 if not needle else BATCH_SIZE)
+        ).all()
+        for row in rows:
+            entry_id, title, reflection_z, mood, created_at = row
+            entry = JournalHistoryEntry(
+                id=entry_id,
+                title=title,
+                reflection=decompress_text(reflection_z),
+                mood=mood,
+                created_at=created_at,
+                archived=True,
+            )
+            if not needle or _matches(entry, needle):
+                cold.append(entry)
+        if not needle or len(rows) < BATCH_SIZE:
+            break
+        after = (rows[-1][4], rows[-1][0])
+        if floor is not None and after < floor:
+            break
+
+    merged = sorted([*entries, *cold], key=lambda entry: (entry.created_at, entry.id), reverse=True)
+    page = merged[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(merged) > limit else None
+    return JournalHistoryPage(entries=page, next_cursor=next_cursor)
+
@@ -0,0 +1,227 @@
+"""Online SQLite backups with rotation.
+
+Backups use SQLite's online backup API, which copies the database a few
+pages per step. Between steps no lock is held, so ``DashboardState`` and API
+writes go through while a backup runs. If another connection writes during
+the copy, SQLite restarts it from the first page; after ``max_restarts`` the
+remaining copy is done in a single step instead. Under WAL that step only
+holds a read transaction, which writers do not wait on.
+
+Each backup is written to a ``.partial`` file and renamed once complete, so
+the backup directory only ever holds finished, timestamped snapshots.
+
+``backup_workspaces`` also covers every workspace shard: the application
+database is backed up into the directory itself and each shard into
+``workspaces/<id>/`` below it, all with the same retention.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+import logging
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.engine import make_url
+
+from . import shards
+from .scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "imastery-"
+SUFFIX = ".db"
+WORKSPACES_DIR = "workspaces"
+_STAMP = "%Y%m%dT%H%M%S%fZ"
+
+Progress = Optional[Callable[[int, int], None]]
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+class BackupFile(NamedTuple):
+    name: str
+    path: str
+    size_bytes: int
+    created_at: dt.datetime
+
+
+class BackupResult(NamedTuple):
+    path: str
+    size_bytes: int
+    pages: int
+    steps: int
+    restarts: int
+    seconds: float
+
+
+@dataclasses.dataclass(frozen=True)
+class BackupPolicy:
+    """Where backups go, how they are copied and how many are kept."""
+
+    directory: str
+    keep: int = 7
+    max_age_days: Optional[float] = None
+    pages_per_step: int = 256
+    pause: float = 0.005
+    max_restarts: int = 3
+
+    @classmethod
+    def from_env(cls, database_url: str) -> "BackupPolicy":
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(sqlite_path(database_url))), "backups")
+        max_age = os.getenv("IMASTERY_BACKUP_MAX_AGE_DAYS")
+        return cls(
+            directory=os.getenv("IMASTERY_BACKUP_DIR") or default_dir,
+            keep=int(os.getenv("IMASTERY_BACKUP_KEEP", "7")),
+            max_age_days=float(max_age) if max_age else None,
+            pages_per_step=int(os.getenv("IMASTERY_BACKUP_PAGES", "256")),
+            pause=float(os.getenv("IMASTERY_BACKUP_PAUSE", "0.005")),
+        )
+
+
+def sqlite_path(database_url: str) -> str:
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise BackupError("Backups are only supported for file-backed SQLite databases")
+    return url.database
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def backup_database(database_url: str, policy: BackupPolicy, on_progress: Progress = None) -> BackupResult:
+    """Copy the database into ``policy.directory``, then apply retention.
+
+    ``on_progress`` receives ``(pages copied, total pages)`` after each step
+    and may raise to abandon the backup.
+    """
+
+    source_path = sqlite_path(database_url)
+    if not os.path.exists(source_path):
+        raise BackupError(f"Database {source_path} does not exist")
+    os.makedirs(policy.directory, exist_ok=True)
+    name = f"{PREFIX}{_utcnow().strftime(_STAMP)}{SUFFIX}"
+    path = os.path.join(policy.directory, name)
+    partial = path + ".partial"
+
+    started = time.perf_counter()
+    stats = {"steps": 0, "restarts": 0, "remaining": None, "total": 0}
+
+    def _step(status: int, remaining: int, total: int) -> None:
+        if stats["remaining"] is not None and remaining > stats["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] > policy.max_restarts:
+                raise _Restarted()
+        stats.update(steps=stats["steps"] + 1, remaining=remaining, total=total)
+        if on_progress is not None:
+            on_progress(total - remaining, total)
+        if remaining and policy.pause:
+            time.sleep(policy.pause)
+
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(partial)
+    try:
+        try:
+            source.backup(target, pages=policy.pages_per_step, progress=_step)
+        except _Restarted:
+            source.backup(target)
+            stats["steps"] += 1
+        # Snapshots are single self-contained files, not WAL databases.
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.commit()
+    except BaseException:
+        target.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+    os.replace(partial, path)
+
+    prune_backups(policy)
+    return BackupResult(
+        path=path,
+        size_bytes=os.path.getsize(path),
+        pages=stats["total"],
+        steps=stats["steps"],
+        restarts=stats["restarts"],
+        seconds=time.perf_counter() - started,
+    )
+
+
+def workspace_policy(policy: BackupPolicy, workspace_id: str) -> BackupPolicy:
+    """``policy`` with the backup directory of ``workspace_id``."""
+
+    if workspace_id == shards.DEFAULT_WORKSPACE:
+        return policy
+    directory = os.path.join(policy.directory, WORKSPACES_DIR, shards.validate_workspace_id(workspace_id))
+    return dataclasses.replace(policy, directory=directory)
+
+
+def backup_workspaces(database_url: str, policy: BackupPolicy, on_progress: Progress = None) -> Dict[str, BackupResult]:
+    """Back up the application database, then every workspace shard; results by workspace id.
+
+    ``on_progress`` counts pages over all the databases copied so far.
+    """
+
+    # The application database goes first, so an unsupported URL fails before shards are looked up.
+    results = {shards.DEFAULT_WORKSPACE: backup_database(database_url, policy, on_progress)}
+    done = results[shards.DEFAULT_WORKSPACE].pages
+    for workspace_id in shards.list_shards(database_url):
+
+        def _step(copied: int, total: int, done: int = done) -> None:
+            on_progress(done + copied, done + total)
+
+        url = shards.shard_url(workspace_id, database_url)
+        result = backup_database(url, workspace_policy(policy, workspace_id), _step if on_progress else None)
+        results[workspace_id] = result
+        done += result.pages
+    return results
+
+
+def list_backups(directory: str) -> List[BackupFile]:
+    """Finished backups in ``directory``, newest first."""
+
+    if not os.path.isdir(directory):
+        return []
+    backups = []
+    for name in os.listdir(directory):
+        if not (name.startswith(PREFIX) and name.endswith(SUFFIX)):
+            continue
+        try:
+            created = dt.datetime.strptime(name[len(PREFIX) : -len(SUFFIX)], _STAMP)
+        except ValueError:
+            continue
+        path = os.path.join(directory, name)
+        backups.append(BackupFile(name, path, os.path.getsize(path), created.replace(tzinfo=dt.timezone.utc)))
+    return sorted(backups, key=lambda backup: backup.created_at, reverse=True)
+
+
+def prune_backups(policy: BackupPolicy, now: Optional[dt.datetime] = None) -> List[str]:
+    """Delete backups beyond ``keep`` or older than ``max_age_days``; the newest always stays."""
+
+    now = now or _utcnow()
+    removed = []
+    for index, backup in enumerate(list_backups(policy.directory)):
+        expired = policy.max_age_days is not None and now - backup.created_at > dt.timedelta(days=policy.max_age_days)
+        if index > 0 and (index >= policy.keep or expired):
+            os.remove(backup.path)
+            removed.append(backup.name)
+    return removed
+
+
+def scheduler_from_env(run: Callable[[], object]) -> Optional[Scheduler]:
+    """Run ``run`` every ``$IMASTERY_BACKUP_INTERVAL_MINUTES`` (0, the default, disables it)."""
+
+    return Scheduler.from_env(run, "IMASTERY_BACKUP_INTERVAL_MINUTES", 0, name="backup")
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import functools
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .models import ArchivedJournalEntry, TableVersion
+from .shards import DEFAULT_WORKSPACE
+from .workspace import TABLES
+
+# Per-table write versions for the workspace tables.
+#
+# Every committed session that touched a workspace table bumps that table's
+# version, whichever code path did the write: API handlers, DashboardState
+# events, import jobs and the CLI all go through a SQLAlchemy ``Session``.
+# ORM changes are picked up at flush time and bulk ``insert``/``update``/
+# ``delete`` statements when they execute; both are only published once the
+# transaction commits, and dropped on rollback.
+#
+# The same transaction increments the table's row in ``tableversion``, so
+# other processes on the database can notice the write. ``sync`` is called at
+# the start of each API request and state event: on SQLite it first asks
+# ``PRAGMA data_version`` on a dedicated connection, which only changes when
+# some other connection has committed, and reads ``tableversion`` only then.
+#
+# Each workspace shard has its own ``tableversion`` table and its own tracker
+# (``tracker_for``); a session says which one it writes to through
+# ``session.info["workspace_id"]``, which ``tenancy.session`` sets.
+
+_TABLE_KEYS = {model.__tablename__: key for key, model in TABLES.items()}
+_MODEL_KEYS = {model: key for key, model in TABLES.items()}
+# Archived journal entries are still part of the journal (exports include them).
+_TABLE_KEYS[ArchivedJournalEntry.__tablename__] = _MODEL_KEYS[ArchivedJournalEntry] = "journal_entries"
+_PENDING = "workspace_changes"
+_COMMITTED = "workspace_versions"
+WORKSPACE_ID = "workspace_id"
+_VERSIONS = TableVersion.__table__
+
+Listener = Callable[[FrozenSet[str]], None]
+WorkspaceListener = Callable[[str, FrozenSet[str]], None]
+
+
+class ChangeTracker:
+    def __init__(self) -> None:
+        self._versions: Dict[str, int] = {key: 0 for key in TABLES}
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+        # Cross-process state: the last ``tableversion`` values this process
+        # has accounted for, and the probe connection used to poll them.
+        self._seen: Dict[str, int] = {}
+        self._probe: Optional[Connection] = None
+        self._data_version: Optional[int] = None
+        self._sync_lock = threading.Lock()
+        self.syncs = 0
+        self.remote_changes = 0
+
+    def version(self, *keys: str) -> int:
+        """Sum of the versions of ``keys`` (every table by default); only ever grows."""
+
+        versions = self._versions
+        return sum(versions[key] for key in keys or versions)
+
+    def versions(self) -> Dict[str, int]:
+        return dict(self._versions)
+
+    def bump(self, keys: Iterable[str]) -> None:
+        changed = frozenset(keys)
+        if not changed:
+            return
+        with self._lock:
+            for key in changed:
+                self._versions[key] += 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(changed)
+
+    def subscribe(self, listener: Listener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    # -- cross-process -----------------------------------------------------
+
+    def attach(self, engine: Engine) -> None:
+        """Start following writes made by other processes on ``engine``'s database."""
+
+        self.detach()
+        probe = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        with self._sync_lock:
+            self._probe = probe
+            self._data_version = None
+            self._seen = self._read(probe)
+
+    @property
+    def attached(self) -> bool:
+        return self._probe is not None
+
+    def detach(self) -> None:
+        with self._sync_lock:
+            probe, self._probe = self._probe, None
+        if probe is not None:
+            probe.close()
+
+    def sync(self) -> FrozenSet[str]:
+        """Bump the tables other processes wrote to since the last call."""
+
+        if self._probe is None:
+            return frozenset()
+        with self._sync_lock:
+            probe = self._probe
+            if probe is None:
+                return frozenset()
+            self.syncs += 1
+            if probe.dialect.name == "sqlite":
+                data_version = probe.exec_driver_sql("PRAGMA data_version").scalar()
+                if data_version == self._data_version:
+                    return frozenset()
+                self._data_version = data_version
+            current = self._read(probe)
+            changed = frozenset(key for key, version in current.items() if self._seen.get(key) != version)
+            self._seen.update(current)
+        if changed:
+            self.remote_changes += 1
+            self.bump(changed)
+        return changed
+
+    def _committed(self, keys: Iterable[str], versions: Dict[str, int]) -> None:
+        with self._sync_lock:
+            self._seen.update(versions)
+        self.bump(keys)
+
+    @staticmethod
+    def _read(connection: Connection) -> Dict[str, int]:
+        return {name: version for name, version in connection.execute(select(_VERSIONS.c.name, _VERSIONS.c.version))}
+
+
+tracker = ChangeTracker()
+
+_trackers: Dict[str, ChangeTracker] = {DEFAULT_WORKSPACE: tracker}
+_workspace_listeners: List[WorkspaceListener] = []
+_registry_lock = threading.Lock()
+
+
+def tracker_for(workspace_id: str) -> ChangeTracker:
+    """The tracker of ``workspace_id``'s shard; ``tracker`` for the default workspace."""
+
+    current = _trackers.get(workspace_id)
+    if current is not None:
+        return current
+    with _registry_lock:
+        current = _trackers.get(workspace_id)
+        if current is None:
+            current = ChangeTracker()
+            for listener in _workspace_listeners:
+                current.subscribe(functools.partial(listener, workspace_id))
+            _trackers[workspace_id] = current
+    return current
+
+
+def subscribe_all(listener: WorkspaceListener) -> None:
+    """Call ``listener(workspace_id, tables)`` for commits in every workspace."""
+
+    with _registry_lock:
+        _workspace_listeners.append(listener)
+        for workspace_id, current in _trackers.items():
+            current.subscribe(functools.partial(listener, workspace_id))
+
+
+def attached_trackers() -> Dict[str, ChangeTracker]:
+    return {workspace_id: current for workspace_id, current in list(_trackers.items()) if current.attached}
+
+
+def _increment(connection: Connection, keys: Set[str]) -> Dict[str, int]:
+    versions = {}
+    for key in sorted(keys):
+        statement = update(_VERSIONS).where(_VERSIONS.c.name == key).values(version=_VERSIONS.c.version + 1)
+        if connection.dialect.update_returning:
+            version = connection.execute(statement.returning(_VERSIONS.c.version)).scalar()
+        else:
+            connection.execute(statement)
+            version = connection.execute(select(_VERSIONS.c.version).where(_VERSIONS.c.name == key)).scalar()
+        if version is None:
+            connection.execute(insert(_VERSIONS).values(name=key, version=1))
+            version = 1
+        versions[key] = version
+    return versions
+
+
+def increment(connection: Connection, keys: Iterable[str]) -> Dict[str, int]:
+    """Bump ``keys`` for writes made on ``connection`` outside any ``Session``.
+
+    Call it in the writing transaction; running processes see the new
+    versions on their next ``sync``.
+    """
+
+    return _increment(connection, set(keys))
+
+
+def _pending(session: Session) -> Set[str]:
+    return session.info.setdefault(_PENDING, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session: Session, flush_context) -> None:  # noqa: ARG001
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        key = _MODEL_KEYS.get(type(instance))
+        if key is not None:
+            _pending(session).add(key)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        key = _TABLE_KEYS.get(getattr(state.statement.table, "name", None))
+        if key is not None:
+            _pending(state.session).add(key)
+
+
+@event.listens_for(Session, "before_commit")
+def _persist(session: Session) -> None:
+    # Flush first so objects added since the last flush are counted.
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    keys = session.info.get(_PENDING)
+    if keys:
+        session.info[_COMMITTED] = _increment(session.connection(), keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session: Session) -> None:
+    keys = session.info.pop(_PENDING, ())
+    versions = session.info.pop(_COMMITTED, {})
+    if keys:
+        tracker_for(session.info.get(WORKSPACE_ID, DEFAULT_WORKSPACE))._committed(keys, versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_COMMITTED, None)
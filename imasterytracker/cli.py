@@ -0,0 +1,332 @@
+"""Headless workspace maintenance without booting Reflex.
+
+Usage::
+
+    python -m imasterytracker.cli export [-o workspace.json]
+    python -m imasterytracker.cli export --format snapshot -o workspace.snap
+    python -m imasterytracker.cli import [--merge] workspace.json|workspace.snap
+    python -m imasterytracker.cli snapshot-info workspace.snap
+    python -m imasterytracker.cli backup [--list]
+    python -m imasterytracker.cli stats
+    python -m imasterytracker.cli vacuum
+    python -m imasterytracker.cli archive [--older-than-days 180]
+    python -m imasterytracker.cli maintain
+    python -m imasterytracker.cli analytics [--rebuild] [--bucket week|day|month]
+    python -m imasterytracker.cli search [--rebuild] [--kind journal] [--limit 20] ["deep work"]
+    python -m imasterytracker.cli workspaces [--migrate]
+    python -m imasterytracker.cli --workspace team-a stats
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import os
+import sys
+from typing import Callable, Dict, Optional, Sequence
+
+from sqlalchemy.engine import make_url
+
+from . import analytics, archive, backup, db, ingest, maintenance, search, shards, snapshot, workspace
+
+
+def _export(args: argparse.Namespace) -> int:
+    if args.format == "snapshot":
+        if args.output in (None, "-"):
+            print("snapshot exports need -o/--output", file=sys.stderr)
+            return 1
+        with db.session(args.db_url) as session, open(args.output, "wb") as handle:
+            counts = snapshot.write_snapshot(session, handle)
+        print(f"Snapshot written: {_format_counts(counts)}", file=sys.stderr)
+        return 0
+    with db.session(args.db_url) as session:
+        export = workspace.export_workspace(session)
+    body = export.model_dump_json(indent=2 if args.indent else None)
+    if args.output in (None, "-"):
+        sys.stdout.write(body + "\n")
+    else:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(body)
+    return 0
+
+
+def _import(args: argparse.Namespace) -> int:
+    with open(args.path, "rb") as handle:
+        if snapshot.is_snapshot(handle.read(len(snapshot.MAGIC))):
+            with snapshot.Snapshot.open(args.path) as opened:
+                try:
+                    payload = opened.to_import()
+                except ingest.InvalidWorkspace as error:
+                    print(error, file=sys.stderr)
+                    return 1
+                if not args.merge:
+                    with db.session(args.db_url) as session:
+                        counts = snapshot.restore_snapshot(session, opened)
+                    print(f"Workspace restored: {_format_counts(counts)}", file=sys.stderr)
+                    return 0
+        else:
+            handle.seek(0)
+            try:
+                payload = ingest.parse_workspace(handle.read(), processes=args.processes)
+            except ingest.InvalidWorkspace as error:
+                print(error, file=sys.stderr)
+                return 1
+    with db.session(args.db_url) as session:
+        if args.merge:
+            changes = workspace.merge_workspace(session, payload)
+            print(f"Workspace merged: {workspace.format_changes(changes)}", file=sys.stderr)
+            return 0
+        workspace.replace_workspace(session, payload)
+        counts = workspace.workspace_counts(session)
+    print(f"Workspace imported: {_format_counts(counts)}", file=sys.stderr)
+    return 0
+
+
+def _snapshot_info(args: argparse.Namespace) -> int:
+    try:
+        with snapshot.Snapshot.open(args.path) as opened:
+            info = {
+                "version": opened.version,
+                "tables": {
+                    name: {
+                        "rows": table.rows,
+                        "columns": {column: item.length for column, item in table.columns.items()},
+                    }
+                    for name, table in opened.tables.items()
+                },
+            }
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(json.dumps(info, indent=2))
+    return 0
+
+
+def _backup(args: argparse.Namespace) -> int:
+    url = args.db_url or db.database_url()
+    try:
+        policy = backup.BackupPolicy.from_env(url)
+    except backup.BackupError as error:
+        print(error, file=sys.stderr)
+        return 1
+    if args.keep is not None:
+        policy = dataclasses.replace(policy, keep=args.keep)
+    if args.list:
+        # Shard backups are listed by their path below the backup directory.
+        for workspace_id in [shards.DEFAULT_WORKSPACE, *shards.list_shards(url)]:
+            directory = backup.workspace_policy(policy, workspace_id).directory
+            for item in backup.list_backups(directory):
+                name = os.path.relpath(item.path, policy.directory)
+                print(f"{name}\t{item.size_bytes}\t{item.created_at.isoformat()}")
+        return 0
+    try:
+        results = backup.backup_workspaces(url, policy)
+    except backup.BackupError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for workspace_id, result in results.items():
+        print(result.path)
+        print(
+            f"Backup of {workspace_id} written: {result.size_bytes} bytes, {result.pages} pages in {result.steps} "
+            f"steps ({result.restarts} restarts, {result.seconds:.2f}s)",
+            file=sys.stderr,
+        )
+    return 0
+
+
+def _stats(args: argparse.Namespace) -> int:
+    with db.session(args.db_url) as session:
+        counts = workspace.workspace_counts(session)
+    url = make_url(args.db_url or db.database_url())
+    stats: Dict[str, object] = {"database": url.render_as_string(hide_password=True), **counts}
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        stats["file_bytes"] = os.path.getsize(url.database) if os.path.exists(url.database) else 0
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+def _vacuum(args: argparse.Namespace) -> int:
+    engine = db.get_engine(args.db_url)
+    try:
+        if engine.dialect.name != "sqlite":
+            print("vacuum is only supported for SQLite databases", file=sys.stderr)
+            return 1
+        # VACUUM cannot run inside a transaction, so use an autocommit connection.
+        # It also switches older databases to incremental auto-vacuum.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+            connection.exec_driver_sql("ANALYZE")
+    finally:
+        engine.dispose()
+    print("Database vacuumed.", file=sys.stderr)
+    return 0
+
+
+def _archive(args: argparse.Namespace) -> int:
+    policy = archive.ArchivePolicy.from_env()
+    if args.older_than_days is not None:
+        policy = dataclasses.replace(policy, after_days=args.older_than_days)
+    with db.session(args.db_url) as session:
+        moved = archive.archive_entries(session, policy)
+        remaining = workspace.workspace_counts(session)["journal_entries"] - archive.archived_count(session)
+    print(f"{moved} journal entries archived, {remaining} recent entries left.", file=sys.stderr)
+    return 0
+
+
+def _maintain(args: argparse.Namespace) -> int:
+    with db.session(args.db_url) as session:
+        report = maintenance.Maintenance.from_env().run(args.workspace, session, force=True)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def _analytics(args: argparse.Namespace) -> int:
+    with db.session(args.db_url) as session:
+        if args.rebuild:
+            rows = analytics.rebuild(session)
+            session.commit()
+            print(f"Journal rollups rebuilt: {rows} day and mood buckets.", file=sys.stderr)
+        report = analytics.report(session, args.bucket)
+    print(report.model_dump_json(indent=2))
+    return 0
+
+
+def _search(args: argparse.Namespace) -> int:
+    if not args.rebuild and not args.query:
+        print("search needs a query (or --rebuild)", file=sys.stderr)
+        return 1
+    with db.session(args.db_url) as session:
+        if args.rebuild:
+            rows = search.rebuild(session)
+            session.commit()
+            print(f"Search index rebuilt: {rows} rows.", file=sys.stderr)
+        if args.query:
+            results = search.search(session, args.query, tuple(args.kind or search.KINDS), args.limit)
+            print(results.model_dump_json(indent=2))
+    return 0
+
+
+def _workspaces(args: argparse.Namespace) -> int:
+    base_url = args.db_url or db.database_url()
+    try:
+        workspace_ids = shards.list_shards(base_url)
+    except shards.ShardError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for workspace_id in workspace_ids:
+        if args.migrate:
+            shards.open_shard(shards.shard_url(workspace_id, base_url)).dispose()
+        print(workspace_id)
+    if args.migrate:
+        print(f"{len(workspace_ids)} workspace shards migrated.", file=sys.stderr)
+    return 0
+
+
+def _format_counts(counts: Dict[str, int]) -> str:
+    return ", ".join(f"{count} {key.replace('_', ' ')}" for key, count in counts.items())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m imasterytracker.cli",
+        description="Export, import and maintain an iMastery workspace without starting the app.",
+    )
+    parser.add_argument("--db-url", help="Database URL (default: $REFLEX_DB_URL or the rxconfig default)")
+    parser.add_argument(
+        "--workspace",
+        default=shards.DEFAULT_WORKSPACE,
+        help="Work on this workspace's shard instead of the default workspace",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write the workspace as JSON")
+    export.add_argument("-o", "--output", help="Destination file (default: stdout)")
+    export.add_argument("--indent", action="store_true", help="Pretty-print the JSON")
+    export.add_argument(
+        "--format",
+        choices=("json", "snapshot"),
+        default="json",
+        help="JSON document or binary columnar snapshot (default: json)",
+    )
+    export.set_defaults(handler=_export)
+
+    import_ = commands.add_parser("import", help="Replace the workspace with a JSON file or snapshot")
+    import_.add_argument("path", help="Snapshot or JSON file matching the WorkspaceImport schema")
+    import_.add_argument(
+        "--merge",
+        action="store_true",
+        help="Only insert, update or delete what changed instead of replacing everything",
+    )
+    import_.add_argument(
+        "--processes",
+        type=int,
+        help="Worker processes for validating large files (default: $IMASTERY_IMPORT_PROCESSES or 1)",
+    )
+    import_.set_defaults(handler=_import)
+
+    info = commands.add_parser("snapshot-info", help="List the tables and column sizes in a snapshot")
+    info.add_argument("path", help="Snapshot file written by export --format snapshot")
+    info.set_defaults(handler=_snapshot_info)
+
+    backup_ = commands.add_parser(
+        "backup", help="Copy the database and its workspace shards online and rotate old backups"
+    )
+    backup_.add_argument("--list", action="store_true", help="List existing backups instead of taking one")
+    backup_.add_argument("--keep", type=int, help="Backups to keep (default: $IMASTERY_BACKUP_KEEP or 7)")
+    backup_.set_defaults(handler=_backup)
+
+    stats = commands.add_parser("stats", help="Print row counts and database size")
+    stats.set_defaults(handler=_stats)
+
+    vacuum = commands.add_parser("vacuum", help="Reclaim free pages and refresh planner statistics")
+    vacuum.set_defaults(handler=_vacuum)
+
+    archive_ = commands.add_parser("archive", help="Move old journal entries to the compressed archive")
+    archive_.add_argument(
+        "--older-than-days",
+        type=float,
+        help="Archive entries older than this (default: $IMASTERY_ARCHIVE_AFTER_DAYS or 180)",
+    )
+    archive_.set_defaults(handler=_archive)
+
+    maintain = commands.add_parser(
+        "maintain", help="Purge expired tombstones, then ANALYZE, incremental vacuum and WAL checkpoint"
+    )
+    maintain.set_defaults(handler=_maintain)
+
+    analytics_ = commands.add_parser("analytics", help="Print journal entries, moods and reflection length over time")
+    analytics_.add_argument("--bucket", choices=analytics.BUCKETS, default="week")
+    analytics_.add_argument("--rebuild", action="store_true", help="Recompute the rollups from the journal first")
+    analytics_.set_defaults(handler=_analytics)
+
+    search_ = commands.add_parser("search", help="Search streams, habits and journal entries")
+    search_.add_argument("query", nargs="?", default="")
+    search_.add_argument("--kind", action="append", choices=search.KINDS, help="Only this kind (repeatable)")
+    search_.add_argument("--limit", type=int, default=search.DEFAULT_LIMIT)
+    search_.add_argument("--rebuild", action="store_true", help="Re-index every row first")
+    search_.set_defaults(handler=_search)
+
+    workspaces = commands.add_parser("workspaces", help="List the workspace shards")
+    workspaces.add_argument("--migrate", action="store_true", help="Upgrade every shard to the latest schema")
+    workspaces.set_defaults(handler=_workspaces)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    handler: Callable[[argparse.Namespace], int] = args.handler
+    if args.workspace != shards.DEFAULT_WORKSPACE and handler is not _workspaces:
+        try:
+            args.db_url = shards.shard_url(args.workspace, args.db_url or db.database_url())
+        except shards.ShardError as error:
+            print(error, file=sys.stderr)
+            return 1
+        # Shards are created and migrated on first use, as in the app.
+        shards.open_shard(args.db_url).dispose()
+    return handler(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
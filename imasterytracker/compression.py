@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import zlib
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+
+# HTTP content codings backed by the stdlib ``zlib`` module. "deflate" is the
+# zlib-wrapped stream per RFC 9110; raw deflate is still accepted on upload
+# because some clients send it.
+ENCODINGS = ("gzip", "deflate")
+
+_COMPRESS_WBITS = {"gzip": 31, "deflate": 15}
+
+# Flush compressed output once this much input has accumulated, so the first
+# bytes reach the client before the whole export has been serialised.
+FLUSH_BYTES = 256 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the coding to use for ``Accept-Encoding``, or ``None`` for identity."""
+
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [(weights.get(name, wildcard), -index, name) for index, name in enumerate(ENCODINGS)]
+    quality, _, name = max(candidates)
+    return name if quality > 0 else None
+
+
+def compress(chunks: Iterable[bytes], encoding: str, level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _COMPRESS_WBITS[encoding])
+    pending = 0
+    for chunk in chunks:
+        output = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= FLUSH_BYTES:
+            output += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if output:
+            yield output
+    yield compressor.flush()
+
+
+def _decompressor(encoding: str, head: bytes):
+    if encoding == "gzip":
+        return zlib.decompressobj(31)
+    # A zlib header is two bytes whose big-endian value is a multiple of 31
+    # with the deflate method in the low nibble; anything else is raw deflate.
+    if len(head) >= 2 and head[0] & 0x0F == 8 and (head[0] << 8 | head[1]) % 31 == 0:
+        return zlib.decompressobj(15)
+    return zlib.decompressobj(-15)
+
+
+async def decompress(chunks: AsyncIterable[bytes], encoding: str, max_size: int) -> AsyncIterator[bytes]:
+    """Inflate an uploaded body chunk by chunk; raises ``zlib.error`` on bad input."""
+
+    decompressor = None
+    total = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if decompressor is None:
+            decompressor = _decompressor(encoding, chunk[:2])
+        # Feed bounded slices and cap each step's output, so neither a large
+        # received chunk nor a highly compressed one expands into one huge
+        # buffer (``unconsumed_tail`` is a copy of the remaining input).
+        for offset in range(0, len(chunk), FLUSH_BYTES):
+            data = chunk[offset : offset + FLUSH_BYTES]
+            while data:
+                output = decompressor.decompress(data, FLUSH_BYTES)
+                total += len(output)
+                if total > max_size:
+                    raise BodyTooLarge(f"Decompressed body exceeds {max_size} bytes")
+                if output:
+                    yield output
+                data = decompressor.unconsumed_tail
+    if decompressor is None:
+        return
+    output = decompressor.flush()
+    total += len(output)
+    if total > max_size:
+        raise BodyTooLarge(f"Decompressed body exceeds {max_size} bytes")
+    if output:
+        yield output
+    if not decompressor.eof:
+        raise zlib.error("Compressed body ended early")
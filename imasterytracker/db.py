@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, create_engine
+
+from . import analytics, changes, models, search, tombstones  # noqa: F401  (registers the tables and the session hooks)
+
+# Headless database access for tooling that must not import Reflex. Mirrors the
+# ``db_url`` in ``rxconfig.py``; ``REFLEX_DB_URL`` overrides both.
+DEFAULT_DB_URL = "sqlite:///imasterytracker.db"
+
+
+def database_url() -> str:
+    return os.getenv("REFLEX_DB_URL") or DEFAULT_DB_URL
+
+
+def enable_wal(engine: Engine) -> None:
+    """Switch a file-backed SQLite database to write-ahead logging.
+
+    The mode is persistent, so this only needs to run once per database. With
+    WAL, readers no longer wait on a long-running import or export job.
+    """
+
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+def enable_incremental_vacuum(engine: Engine) -> None:
+    """Let maintenance return free pages a batch at a time.
+
+    SQLite only honours this before the first table is created (or on the
+    next ``VACUUM``), so it is a no-op on existing databases.
+    """
+
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+
+
+def get_engine(url: Optional[str] = None) -> Engine:
+    engine = create_engine(url or database_url())
+    enable_incremental_vacuum(engine)
+    SQLModel.metadata.create_all(engine)
+    enable_wal(engine)
+    return engine
+
+
+@contextmanager
+def session(url: Optional[str] = None) -> Iterator[Session]:
+    engine = get_engine(url)
+    try:
+        with Session(engine) as db_session:
+            yield db_session
+    finally:
+        engine.dispose()
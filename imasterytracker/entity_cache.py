@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .changes import WORKSPACE_ID, tracker_for
+from .models import ArchivedJournalEntry
+from .shards import DEFAULT_WORKSPACE
+from .workspace import TABLES
+
+# Serialised single entities for ``GET /api/<kind>/{id}``.
+#
+# ``EntityCache`` is a read-through LRU of JSON bodies keyed by workspace,
+# kind (a ``workspace.TABLES`` key) and id, bounded by entry count and bytes.
+# It is kept current from the same session events as ``changes``: an ORM
+# write (``update_stream_progress``, ``toggle_habit``, a delete) evicts just
+# the rows the session flushed, a bulk ``insert``/``update``/``delete``
+# (imports, archiving, purges) evicts the whole kind, both once the session
+# commits. A per-kind generation, read before loading, keeps a row loaded
+# while a write commits from being stored, and writes made by other processes
+# (``ChangeTracker.sync``) invalidate every entry of that workspace.
+
+Key = Tuple[str, str, int]
+
+_KINDS = {model: kind for kind, model in TABLES.items()}
+_KINDS[ArchivedJournalEntry] = "journal_entries"
+_TABLE_KINDS = {model.__tablename__: kind for model, kind in _KINDS.items()}
+_EVICTIONS = "entity_evictions"
+
+
+class EntityCache:
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 16 * 1024 * 1024) -> None:
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Each entry keeps the workspace's remote-change count it was read at.
+        self._entries: "OrderedDict[Key, Tuple[int, bytes]]" = OrderedDict()
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "EntityCache":
+        return cls(
+            max_entries=int(os.getenv("IMASTERY_ENTITY_CACHE_MAX_ENTRIES", "4096")),
+            max_bytes=int(os.getenv("IMASTERY_ENTITY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        )
+
+    def get(self, workspace_id: str, kind: str, entity_id: int, load: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """The cached body, or ``load()``'s (kept unless ``None``, i.e. not found)."""
+
+        key = (workspace_id, kind, entity_id)
+        remote = tracker_for(workspace_id).remote_changes
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == remote:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generations.get(key[:2], 0)
+        body = load()
+        if body is None or len(body) > self.max_bytes:
+            return body
+        with self._lock:
+            if self._generations.get(key[:2], 0) == generation:
+                self._drop(key)
+                self._entries[key] = (remote, body)
+                self._bytes += len(body)
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    self._bytes -= len(self._entries.popitem(last=False)[1][1])
+                    self.expirations += 1
+        return body
+
+    def evict(self, workspace_id: str, kind: str, entity_ids: Optional[Iterable[int]] = None) -> None:
+        """Drop ``entity_ids`` of ``kind`` (all of them when ``None``)."""
+
+        with self._lock:
+            self._generations[(workspace_id, kind)] = self._generations.get((workspace_id, kind), 0) + 1
+            if entity_ids is None:
+                stale = [key for key in self._entries if key[:2] == (workspace_id, kind)]
+            else:
+                stale = [(workspace_id, kind, entity_id) for entity_id in entity_ids]
+            for key in stale:
+                self.evictions += self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _drop(self, key: Key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[1])
+        return True
+
+
+cache = EntityCache.from_env()
+
+
+# -- eviction from session writes ---------------------------------------------
+
+
+def _pending(session: Session) -> Dict[str, Optional[Set[int]]]:
+    """Kind -> ids to evict at commit; ``None`` means every id."""
+
+    return session.info.setdefault(_EVICTIONS, {})
+
+
+@event.listens_for(Session, "after_flush")
+def _record_rows(session: Session, flush_context) -> None:  # noqa: ARG001
+    for instance in (*session.dirty, *session.deleted):
+        kind = _KINDS.get(type(instance))
+        if kind is None:
+            continue
+        ids = _pending(session).setdefault(kind, set())
+        if ids is not None:
+            ids.add(instance.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement(state: ORMExecuteState) -> None:
+    if state.is_update or state.is_delete or state.is_insert:
+        kind = _TABLE_KINDS.get(getattr(state.statement.table, "name", None))
+        if kind is not None:
+            _pending(state.session)[kind] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _evict(session: Session) -> None:
+    pending = session.info.pop(_EVICTIONS, None)
+    if pending:
+        workspace_id = session.info.get(WORKSPACE_ID, DEFAULT_WORKSPACE)
+        for kind, ids in pending.items():
+            cache.evict(workspace_id, kind, ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_EVICTIONS, None)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, Optional
+
+from . import compression
+from .changes import ChangeTracker
+
+logger = logging.getLogger(__name__)
+
+
+class ExportCache:
+    """Keep the serialised ``/api/export`` body for the current write version.
+
+    Entries are keyed by content coding (``None`` for identity) and tagged with
+    the tracker version read *before* the body was produced, so a write that
+    lands mid-build only costs an extra miss, never a stale hit. Bodies larger
+    than ``max_bytes`` are streamed without being kept.
+
+    With ``warm_after`` set, the identity body is rebuilt on a background
+    thread once no write has happened for that many seconds.
+    """
+
+    def __init__(
+        self,
+        chunks: Callable[[], Iterable[bytes]],
+        tracker: ChangeTracker,
+        max_bytes: int = 64 * 1024 * 1024,
+        warm_after: float = 0.0,
+    ) -> None:
+        self._chunks = chunks
+        self._tracker = tracker
+        self.max_bytes = max_bytes
+        self.warm_after = warm_after
+        self._version = -1
+        self._entries: Dict[Optional[str], bytes] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        tracker.subscribe(self._invalidated)
+
+    @classmethod
+    def from_env(cls, chunks: Callable[[], Iterable[bytes]], tracker: ChangeTracker) -> "ExportCache":
+        return cls(
+            chunks,
+            tracker,
+            max_bytes=int(os.getenv("IMASTERY_EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            warm_after=float(os.getenv("IMASTERY_EXPORT_CACHE_WARM_SECONDS", "0")),
+        )
+
+    def get(self, encoding: Optional[str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(encoding) if self._version == self._tracker.version() else None
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    def stream(self, encoding: Optional[str]) -> Iterator[bytes]:
+        """Produce the body, keeping it if it is small enough and still current."""
+
+        version = self._tracker.version()
+        with self._lock:
+            source = self._entries.get(None) if self._version == version else None
+        if source is not None:
+            chunks: Iterable[bytes] = (source,)
+        else:
+            chunks = self._chunks()
+        if encoding is not None:
+            chunks = compression.compress(chunks, encoding)
+
+        kept = []
+        size = 0
+        for chunk in chunks:
+            if kept is not None:
+                size += len(chunk)
+                if size <= self.max_bytes:
+                    kept.append(chunk)
+                else:
+                    kept = None
+            yield chunk
+        if kept is not None:
+            self._store(version, encoding, b"".join(kept))
+
+    def _store(self, version: int, encoding: Optional[str], body: bytes) -> None:
+        with self._lock:
+            if version != self._tracker.version():
+                return
+            if self._version != version:
+                self._version = version
+                self._entries = {}
+            self._entries[encoding] = body
+            self.stores += 1
+
+    def warm(self) -> None:
+        for _ in self.stream(None):
+            pass
+
+    def _warm_in_background(self) -> None:
+        try:
+            self.warm()
+        except Exception:  # noqa: BLE001 - the next request rebuilds it
+            logger.exception("Rebuilding the cached export failed")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            current = self._version == self._tracker.version()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "version": self._tracker.version(),
+                "cached_bytes": sum(len(body) for body in self._entries.values()) if current else 0,
+            }
+
+    def close(self) -> None:
+        """Stop following the tracker and drop the cached bodies."""
+
+        self._tracker.unsubscribe(self._invalidated)
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._entries = {}
+            self._version = -1
+
+    def _invalidated(self, tables: FrozenSet[str]) -> None:  # noqa: ARG002
+        with self._lock:
+            self.invalidations += 1
+            self._entries = {}
+            self._version = -1
+            if self.warm_after <= 0:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.warm_after, self._warm_in_background)
+            self._timer.daemon = True
+            self._timer.start()
@@ -0,0 +1,438 @@
+"""Deterministic synthetic workspace generator.
+
+Usage::
+
+    python -m imasterytracker.generate --streams 40 --habits 120 --journals 1000000 --seed 7
+    python -m imasterytracker.generate --journals 5000 --output workspace.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime as dt
+import json
+import math
+import operator
+import random
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete
+
+from . import analytics, changes, db, search
+from .models import COLOR_PALETTE, ArchivedJournalEntry, Habit, JournalEntry, LearningStream
+
+
+LENGTH_DISTRIBUTIONS = ("uniform", "normal", "lognormal")
+
+DEFAULT_MOODS: Dict[str, float] = {
+    "Curious": 4,
+    "Energised": 3,
+    "Focused": 2,
+    "Stuck": 1,
+}
+
+_TOPICS = [
+    "AI Engineering",
+    "Product Strategy",
+    "Distributed Systems",
+    "Data Visualisation",
+    "Technical Writing",
+    "Interaction Design",
+    "Compiler Design",
+    "Public Speaking",
+    "Negotiation",
+    "Statistics",
+]
+
+_RITUALS = [
+    "Deep Work Block",
+    "Knowledge Capture",
+    "Spaced Repetition",
+    "Code Kata",
+    "Reading Sprint",
+    "Weekly Review",
+    "Paper Summary",
+    "Mentor Sync",
+]
+
+_VOCABULARY = (
+    "practice loop feedback prototype insight model experiment iterate ship "
+    "review refactor sketch research notes user signal metric habit focus "
+    "sprint mentor pairing retrieval vector latency schema deploy backlog "
+    "blocker hypothesis outcome narrative draft outline constraint tradeoff "
+    "pattern system design learning momentum milestone deliberate reflect "
+    "synthesise compound clarity depth rhythm ritual evidence question answer "
+    "story framework principle heuristic benchmark profile measure improve"
+).split()
+
+# Rows pick their texts from a pre-built pool so the per-row cost stays at a
+# single random draw regardless of text length; the pool is large enough to
+# reproduce the requested length distribution.
+_WORD_STREAM_SIZE = 1 << 16
+_TEXT_POOL_SIZE = 1 << 13
+
+
+@dataclasses.dataclass(frozen=True)
+class GeneratorConfig:
+    """Knobs controlling the shape of a generated workspace."""
+
+    streams: int = 10
+    habits: int = 20
+    journals: int = 1000
+    seed: int = 0
+    anchor: dt.date = dataclasses.field(default_factory=lambda: dt.datetime.now(dt.timezone.utc).date())
+    days: int = 365
+    moods: Dict[str, float] = dataclasses.field(default_factory=lambda: dict(DEFAULT_MOODS))
+    title_words: Tuple[int, int] = (2, 6)
+    reflection_words: Tuple[int, int] = (8, 80)
+    length_distribution: str = "lognormal"
+    checkin_density: float = 0.5
+    batch_size: int = 50_000
+
+    def __post_init__(self) -> None:
+        if min(self.streams, self.habits, self.journals) < 0:
+            raise ValueError("Row counts must not be negative")
+        if self.days < 0:
+            raise ValueError("Date spread must not be negative")
+        if not 0.0 <= self.checkin_density <= 1.0:
+            raise ValueError("Check-in density must be between 0 and 1")
+        if self.length_distribution not in LENGTH_DISTRIBUTIONS:
+            raise ValueError(f"Unknown length distribution: {self.length_distribution}")
+        if any(weight < 0 for weight in self.moods.values()) or not sum(self.moods.values()) > 0:
+            raise ValueError("Mood mix needs non-negative weights, at least one of them positive")
+        for low, high in (self.title_words, self.reflection_words):
+            if low < 1 or high < low:
+                raise ValueError("Word ranges must satisfy 1 <= min <= max")
+        if self.batch_size < 1:
+            raise ValueError("Batch size must be positive")
+
+
+class WorkspaceGenerator:
+    """Produce deterministic stream, habit and journal rows from a seed.
+
+    Every table draws from its own random generator so changing one count
+    never reshuffles the rows of another table.
+    """
+
+    def __init__(self, config: GeneratorConfig) -> None:
+        self.config = config
+        words = random.Random(f"{config.seed}:words")
+        self._word_stream = words.choices(_VOCABULARY, k=_WORD_STREAM_SIZE)
+        self._anchor = dt.datetime.combine(config.anchor, dt.time(12, 0), tzinfo=dt.timezone.utc)
+        self._spread_seconds = config.days * 86_400
+
+    def _rng(self, table: str) -> random.Random:
+        return random.Random(f"{self.config.seed}:{table}")
+
+    def _length_sampler(self, rng: random.Random, bounds: Tuple[int, int]):
+        low, high = bounds
+        if low == high:
+            return lambda: low
+        distribution = self.config.length_distribution
+        if distribution == "uniform":
+            return lambda: rng.randint(low, high)
+        if distribution == "normal":
+            mean = (low + high) / 2
+            sigma = (high - low) / 6
+            return lambda: min(high, max(low, round(rng.gauss(mean, sigma))))
+        mu = math.log(math.sqrt(low * high))
+        sigma = math.log(high / low) / 4
+        return lambda: min(high, max(low, round(rng.lognormvariate(mu, sigma))))
+
+    def _text_sampler(self, rng: random.Random, bounds: Tuple[int, int], suffix: str = ""):
+        sample_length = self._length_sampler(rng, bounds)
+        stream = self._word_stream
+        last_offset = len(stream) - bounds[1]
+        pool = []
+        for _ in range(_TEXT_POOL_SIZE):
+            offset = rng.randrange(last_offset)
+            pool.append(" ".join(stream[offset : offset + sample_length()]).capitalize() + suffix)
+        draw = rng.random
+        return lambda: pool[int(draw() * _TEXT_POOL_SIZE)]
+
+    def _created_at(self, rng: random.Random) -> dt.datetime:
+        return self._anchor - dt.timedelta(seconds=int(rng.random() * self._spread_seconds))
+
+    def iter_streams(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("streams")
+        focus = self._text_sampler(rng, self.config.reflection_words)
+        for index in range(self.config.streams):
+            total = rng.randint(1, 12)
+            yield {
+                "name": f"{_TOPICS[index % len(_TOPICS)]} {index + 1}",
+                "focus": focus(),
+                "milestones_total": total,
+                "milestones_completed": rng.randint(0, total),
+                "color": rng.choice(COLOR_PALETTE),
+                "created_at": self._created_at(rng),
+            }
+
+    def iter_habits(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("habits")
+        context = self._text_sampler(rng, self.config.title_words)
+        density = self.config.checkin_density
+        days = self.config.days
+        for index in range(self.config.habits):
+            roll = rng.random()
+            if roll < density:
+                last_completed_on: Optional[dt.date] = self.config.anchor
+            elif days and roll < density + (1 - density) / 2:
+                last_completed_on = self.config.anchor - dt.timedelta(days=rng.randint(1, days))
+            else:
+                last_completed_on = None
+            yield {
+                "name": f"{_RITUALS[index % len(_RITUALS)]} {index + 1}",
+                "cadence": "Weekly" if rng.random() < 0.2 else "Daily",
+                "context": context(),
+                "last_completed_on": last_completed_on,
+                "created_at": self._created_at(rng),
+            }
+
+    def iter_journal_entries(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("journals")
+        title = self._text_sampler(rng, self.config.title_words)
+        reflection = self._text_sampler(rng, self.config.reflection_words, suffix=".")
+        moods = list(self.config.moods)
+        weights = list(self.config.moods.values())
+        created_at = self._created_at
+        remaining = self.config.journals
+        while remaining:
+            size = min(remaining, self.config.batch_size)
+            remaining -= size
+            for mood in rng.choices(moods, weights, k=size):
+                yield {
+                    "title": title(),
+                    "reflection": reflection(),
+                    "mood": mood,
+                    "created_at": created_at(rng),
+                }
+
+
+def _batched(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _sqlite_rows(batch: List[Dict[str, Any]], columns: List[str]) -> List[Tuple[Any, ...]]:
+    # Mirror SQLAlchemy's SQLite storage format so generated rows sort and
+    # parse exactly like rows written through the ORM. Generated datetimes are
+    # always UTC, so dropping the offset keeps the stored wall-clock time.
+    temporal = [
+        position
+        for position, column in enumerate(columns)
+        if any(isinstance(row[column], dt.date) for row in batch[:1000])
+    ]
+    getters = [operator.itemgetter(column) for column in columns]
+    values = [list(map(getter, batch)) for getter in getters]
+    for position in temporal:
+        values[position] = [
+            value.isoformat(" ", "microseconds")[:26]
+            if isinstance(value, dt.datetime)
+            else value.isoformat()
+            if value is not None
+            else None
+            for value in values[position]
+        ]
+    return list(zip(*values))
+
+
+def write_database(generator: WorkspaceGenerator, db_url: str, replace: bool = False) -> Dict[str, int]:
+    """Bulk insert generated rows with executemany batches in one transaction.
+
+    SQLite bypasses SQLAlchemy's per-row bind processing and hands plain
+    tuples to the driver, which roughly halves the insert time.
+    """
+
+    engine = db.get_engine(db_url)
+    counts: Dict[str, int] = {}
+    sources = (
+        ("streams", LearningStream, generator.iter_streams()),
+        ("habits", Habit, generator.iter_habits()),
+        ("journal_entries", JournalEntry, generator.iter_journal_entries()),
+    )
+    sqlite = engine.dialect.name == "sqlite"
+    try:
+        with engine.begin() as connection:
+            if sqlite:
+                connection.exec_driver_sql("PRAGMA synchronous=OFF")
+            for key, model, rows in sources:
+                table = model.__table__
+                if replace:
+                    connection.execute(delete(table))
+                    if model is JournalEntry:
+                        # Archived entries are part of the journal being replaced.
+                        connection.execute(delete(ArchivedJournalEntry.__table__))
+                counts[key] = 0
+                for batch in _batched(rows, generator.config.batch_size):
+                    if sqlite:
+                        columns = list(batch[0])
+                        statement = "INSERT INTO {} ({}) VALUES ({})".format(
+                            table.name, ", ".join(columns), ", ".join("?" * len(columns))
+                        )
+                        connection.exec_driver_sql(statement, _sqlite_rows(batch, columns))
+                    else:
+                        connection.execute(table.insert(), batch)
+                    counts[key] += len(batch)
+            # The rows bypassed the session hooks that keep the rollups, the index and the
+            # table versions (which tell running apps to drop their caches) current.
+            analytics.rebuild(connection)
+            search.rebuild(connection)
+            changes.increment(connection, counts)
+    finally:
+        engine.dispose()
+    return counts
+
+
+_IMPORT_FIELDS = {
+    "streams": ("name", "focus", "milestones_total", "milestones_completed", "color"),
+    "habits": ("name", "cadence", "context"),
+    "journal_entries": ("title", "reflection", "mood", "created_at"),
+}
+
+
+def _isoformat(value: Any) -> str:
+    if isinstance(value, dt.date):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def write_import_file(generator: WorkspaceGenerator, path: str) -> Dict[str, int]:
+    """Stream rows to a JSON document accepted by ``WorkspaceImport``.
+
+    Journal entries keep their ``created_at``, which merge imports match on.
+    Streams and habits carry no timestamps or check-ins in the import schema,
+    so for them the date spread and check-in density only apply when writing
+    to the database.
+    """
+
+    counts: Dict[str, int] = {}
+    sources = (
+        ("streams", generator.iter_streams()),
+        ("habits", generator.iter_habits()),
+        ("journal_entries", generator.iter_journal_entries()),
+    )
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_isoformat).encode
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write("{")
+        for position, (key, rows) in enumerate(sources):
+            fields = _IMPORT_FIELDS[key]
+            handle.write(("," if position else "") + f'"{key}":[')
+            counts[key] = 0
+            for batch in _batched(rows, generator.config.batch_size):
+                if counts[key]:
+                    handle.write(",")
+                handle.write(encode([{field: row[field] for field in fields} for row in batch])[1:-1])
+                counts[key] += len(batch)
+            handle.write("]")
+        handle.write("}\n")
+    return counts
+
+
+def _parse_range(value: str) -> Tuple[int, int]:
+    try:
+        low, _, high = value.partition(":")
+        return int(low), int(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected MIN:MAX, got {value!r}") from None
+
+
+def _parse_moods(value: str) -> Dict[str, float]:
+    moods: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        try:
+            moods[name.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid mood weight in {item!r}") from None
+    return moods
+
+
+def _parse_date(value: str) -> dt.date:
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected YYYY-MM-DD, got {value!r}") from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m imasterytracker.generate",
+        description="Generate a deterministic synthetic iMastery workspace.",
+    )
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--habits", type=int, default=20)
+    parser.add_argument("--journals", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--anchor", type=_parse_date, help="Newest creation date (default: today, UTC)")
+    parser.add_argument("--days", type=int, default=365, help="Spread creation dates over this many days")
+    parser.add_argument(
+        "--moods",
+        type=_parse_moods,
+        help="Weighted mood mix, e.g. 'Curious=3,Energised=1'",
+    )
+    parser.add_argument("--title-words", type=_parse_range, default=(2, 6), metavar="MIN:MAX")
+    parser.add_argument("--reflection-words", type=_parse_range, default=(8, 80), metavar="MIN:MAX")
+    parser.add_argument("--length-distribution", choices=LENGTH_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument(
+        "--checkin-density",
+        type=float,
+        default=0.5,
+        help="Share of habits checked in on the anchor date",
+    )
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--db-url", help="Insert into this database (default: the configured db_url)")
+    target.add_argument("--output", help="Write a WorkspaceImport JSON file instead of touching the database")
+    parser.add_argument("--replace", action="store_true", help="Clear existing rows before inserting")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    options: Dict[str, Any] = {
+        "streams": args.streams,
+        "habits": args.habits,
+        "journals": args.journals,
+        "seed": args.seed,
+        "days": args.days,
+        "title_words": args.title_words,
+        "reflection_words": args.reflection_words,
+        "length_distribution": args.length_distribution,
+        "checkin_density": args.checkin_density,
+        "batch_size": args.batch_size,
+    }
+    if args.anchor is not None:
+        options["anchor"] = args.anchor
+    if args.moods is not None:
+        options["moods"] = args.moods
+    try:
+        config = GeneratorConfig(**options)
+    except ValueError as error:
+        parser.error(str(error))
+
+    generator = WorkspaceGenerator(config)
+    started = time.perf_counter()
+    if args.output:
+        counts = write_import_file(generator, args.output)
+        target = args.output
+    else:
+        target = args.db_url or db.database_url()
+        counts = write_database(generator, target, replace=args.replace)
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{count} {key.replace('_', ' ')}" for key, count in counts.items())
+    print(f"Generated {summary} into {target} in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
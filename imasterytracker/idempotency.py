@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+MAX_KEY_LENGTH = 255
+
+
+@dataclasses.dataclass(frozen=True)
+class StoredResponse:
+    """A response captured for replay under an ``Idempotency-Key``."""
+
+    fingerprint: str
+    status_code: int
+    media_type: Optional[str]
+    body: bytes
+    created: float
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Bounded, TTL-evicting LRU of responses keyed by ``Idempotency-Key``.
+
+    Entries live in an in-memory ``OrderedDict``. When ``path`` is given they
+    are also written through to a small SQLite file so replays survive a
+    restart and are shared between workers; memory then acts as the hot tier.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 24 * 3600,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._clock = clock
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._in_flight: set[str] = set()
+        self._lock = threading.Lock()
+        if path:
+            with self._connect() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS idempotency_key ("
+                    "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status_code INTEGER NOT NULL, "
+                    "media_type TEXT, body BLOB NOT NULL, created REAL NOT NULL)"
+                )
+
+    @classmethod
+    def from_env(cls) -> "IdempotencyStore":
+        return cls(
+            max_entries=int(os.getenv("IMASTERY_IDEMPOTENCY_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("IMASTERY_IDEMPOTENCY_TTL_SECONDS", str(24 * 3600))),
+            path=os.getenv("IMASTERY_IDEMPOTENCY_DB") or None,
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=5)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _expired(self, entry: StoredResponse) -> bool:
+        return self._clock() - entry.created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry):
+                    del self._entries[key]
+                    return None
+                self._entries.move_to_end(key)
+                return entry
+        if not self.path:
+            return None
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT fingerprint, status_code, media_type, body, created FROM idempotency_key WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = StoredResponse(row[0], row[1], row[2], bytes(row[3]), row[4])
+        if self._expired(entry):
+            return None
+        with self._lock:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: StoredResponse) -> None:
+        with self._lock:
+            self._remember(key, entry)
+        if not self.path:
+            return
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO idempotency_key VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.fingerprint, entry.status_code, entry.media_type, entry.body, entry.created),
+            )
+            connection.execute(
+                "DELETE FROM idempotency_key WHERE created < ?",
+                (self._clock() - self.ttl_seconds,),
+            )
+            connection.execute(
+                "DELETE FROM idempotency_key WHERE key NOT IN "
+                "(SELECT key FROM idempotency_key ORDER BY created DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def _remember(self, key: str, entry: StoredResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def begin(self, key: str) -> bool:
+        """Claim ``key`` for a request in progress; ``False`` if already claimed."""
+
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def finish(self, key: str) -> None:
+        with self._lock:
+            self._in_flight.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+        if self.path:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM idempotency_key")
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import mmap
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from .schemas import HabitCreate, JournalEntryImport, LearningStreamCreate, WorkspaceImport
+
+# Validate workspace imports straight from the request bytes.
+#
+# Small bodies go through ``WorkspaceImport.model_validate_json`` in one pass,
+# which never materialises the intermediate dicts ``json.loads`` would. Large
+# bodies are cut into byte ranges holding whole array items and each range is
+# validated with ``TypeAdapter.validate_json`` on its own, which keeps
+# pydantic's parsed JSON tree to one chunk at a time. Cutting relies on item
+# objects being flat, which holds for every import schema; if it does not
+# (unexpected nested objects), the body falls back to the single-pass path.
+# So does a chunk that turns out not to be JSON, should a cut ever be wrong.
+#
+# Chunks can be spread over a process pool, but the validated models must be
+# pickled back to this process, which costs more than validating them here.
+# The pool is therefore opt-in via ``IMASTERY_IMPORT_PROCESSES``.
+
+PARALLEL_THRESHOLD = 32 * 1024 * 1024
+CHUNK_BYTES = 8 * 1024 * 1024
+
+_ADAPTERS = {
+    "streams": TypeAdapter(List[LearningStreamCreate]),
+    "habits": TypeAdapter(List[HabitCreate]),
+    "journal_entries": TypeAdapter(List[JournalEntryImport]),
+}
+
+_ARRAY_START = re.compile(rb'"(streams|habits|journal_entries)"\s*:\s*\[\s*')
+# An object item may end at ``}`` followed by ``,`` and the next ``{`` or by
+# the closing ``]``. String content can look the same, so ``_split`` keeps
+# count of the quotes in between and skips candidates that sit inside a string.
+_ITEM_END = re.compile(rb'\}\s*(?:,\s*(?=\{\s*")|(\]))')
+
+Span = Tuple[int, int, int]
+
+# ``bytes`` or a read-only ``mmap`` of a spooled upload.
+Buffer = Union[bytes, mmap.mmap]
+
+
+class InvalidWorkspace(ValueError):
+    pass
+
+
+def default_processes() -> int:
+    return max(1, int(os.getenv("IMASTERY_IMPORT_PROCESSES", "1")))
+
+
+def _first_error(error: ValidationError) -> Tuple[Tuple, str]:
+    first = error.errors()[0]
+    return tuple(first.get("loc", ())), first.get("msg", "Invalid data")
+
+
+class _Miscut(Exception):
+    """A chunk did not hold the items ``_split`` counted in it."""
+
+
+def _invalid(loc: Tuple, message: str, prefix: Tuple = (), offset: int = 0) -> InvalidWorkspace:
+    parts = list(loc)
+    if parts and isinstance(parts[0], int):
+        parts[0] += offset
+    location = ".".join(str(part) for part in (*prefix, *parts)) or "payload"
+    return InvalidWorkspace(f"Invalid workspace at {location}: {message}")
+
+
+def _quotes(raw: Buffer, start: int, end: int) -> int:
+    """Count the unescaped ``"`` in ``raw[start:end]``, which starts outside any escape."""
+
+    segment = raw[start:end]
+    count = segment.count(b'"')
+    escaped = segment.find(b'\\"')
+    while escaped != -1:
+        # The quote is escaped if an odd run of backslashes precedes it.
+        before = escaped
+        while before >= 0 and segment[before] == 0x5C:
+            before -= 1
+        count -= (escaped - before) % 2
+        escaped = segment.find(b'\\"', escaped + 2)
+    return count
+
+
+def _split(raw: Buffer, chunk_bytes: int) -> Optional[Dict[str, List[Span]]]:
+    """Map each table to ``(start, end, items)`` byte ranges of its array.
+
+    Returns ``None`` when the body cannot be cut safely.
+    """
+
+    tables: Dict[str, List[Span]] = {}
+    skeleton = bytearray()
+    position = 0
+    for match in _ARRAY_START.finditer(raw):
+        if match.start() < position:
+            return None
+        key = match.group(1).decode()
+        if key in tables:
+            return None
+        skeleton += raw[position : match.end()]
+        spans: List[Span] = []
+        start = match.end()
+        items = 0
+        if raw[start : start + 1] == b"]":
+            position = start
+        else:
+            inside = False
+            previous = start
+            for end in _ITEM_END.finditer(raw, start):
+                inside ^= _quotes(raw, previous, end.start()) % 2 == 1
+                previous = end.start()
+                if inside:
+                    continue
+                items += 1
+                closing = end.lastindex is not None
+                if closing or end.start() - start >= chunk_bytes:
+                    spans.append((start, end.start() + 1, items))
+                    start, items = end.end(), 0
+                if closing:
+                    position = end.end() - 1
+                    break
+            else:
+                return None
+        tables[key] = spans
+    skeleton += raw[position:]
+
+    # The body minus the array contents must itself be a valid import.
+    try:
+        WorkspaceImport.model_validate_json(bytes(skeleton))
+    except ValidationError:
+        return None
+    return tables
+
+
+def _validate_chunk(key: str, chunk: bytes) -> Tuple[list, Optional[Tuple[Tuple, str]]]:
+    # Errors travel back as plain data; ValidationError does not pickle. A
+    # syntax error comes back as no items at all: the cut is to blame.
+    try:
+        return _ADAPTERS[key].validate_json(chunk), None
+    except ValidationError as error:
+        if error.errors()[0]["type"] == "json_invalid":
+            return [], None
+        return [], _first_error(error)
+
+
+def _validate_whole(
+    raw: Buffer, on_progress: Optional[Callable[[int], None]], on_total: Optional[Callable[[int], None]]
+) -> WorkspaceImport:
+    try:
+        payload = WorkspaceImport.model_validate_json(raw if isinstance(raw, bytes) else raw[:])
+    except ValidationError as error:
+        raise _invalid(*_first_error(error)) from None
+    rows = sum(len(getattr(payload, key)) for key in _ADAPTERS)
+    if on_total is not None:
+        on_total(rows)
+    if on_progress is not None:
+        on_progress(rows)
+    return payload
+
+
+def parse_workspace(
+    raw: Buffer,
+    processes: Optional[int] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+    on_total: Optional[Callable[[int], None]] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+    threshold: int = PARALLEL_THRESHOLD,
+) -> WorkspaceImport:
+    """Validate a JSON import body without building intermediate dicts.
+
+    ``on_total`` receives the item count once it is known and ``on_progress``
+    the number of items validated per step; either may raise to abort. A
+    mapped file is always chunked so it is never copied whole into memory,
+    unless it cannot be cut.
+    """
+
+    processes = default_processes() if processes is None else processes
+    if isinstance(raw, mmap.mmap):
+        threshold = 0
+    tables = _split(raw, chunk_bytes) if len(raw) >= threshold else None
+    if tables is None:
+        return _validate_whole(raw, on_progress, on_total)
+
+    reported = 0
+
+    def _progress(items: int) -> None:
+        nonlocal reported
+        reported += items
+        if on_progress is not None:
+            on_progress(items)
+
+    try:
+        return _validate_chunks(raw, tables, processes, _progress, on_total)
+    except _Miscut:
+        # Only what has not been reported yet counts as progress.
+        return _validate_whole(raw, lambda rows: _progress(rows - reported), on_total)
+
+
+def _validate_chunks(
+    raw: Buffer,
+    tables: Dict[str, List[Span]],
+    processes: int,
+    on_progress: Callable[[int], None],
+    on_total: Optional[Callable[[int], None]],
+) -> WorkspaceImport:
+    if on_total is not None:
+        on_total(sum(items for spans in tables.values() for _, _, items in spans))
+    jobs = [(key, start, end, items) for key, spans in tables.items() for start, end, items in spans]
+    validated: Dict[str, list] = {key: [] for key in _ADAPTERS}
+    offsets: Dict[str, int] = {key: 0 for key in _ADAPTERS}
+
+    def _collect(key: str, items: int, outcome: Tuple[list, Optional[Tuple[Tuple, str]]]) -> None:
+        result, error = outcome
+        if error is not None:
+            raise _invalid(*error, prefix=(key,), offset=offsets[key])
+        if len(result) != items:
+            raise _Miscut()
+        validated[key].extend(result)
+        offsets[key] += items
+        on_progress(items)
+
+    if processes <= 1 or len(jobs) == 1:
+        for key, start, end, items in jobs:
+            _collect(key, items, _validate_chunk(key, b"[" + raw[start:end] + b"]"))
+        return WorkspaceImport.model_construct(**validated)
+
+    # Spawned workers only import pydantic and the schemas, and avoid forking
+    # a process that is running other threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = [
+            (key, items, pool.submit(_validate_chunk, key, b"[" + raw[start:end] + b"]"))
+            for key, start, end, items in jobs
+        ]
+        try:
+            for key, items, future in futures:
+                _collect(key, items, future.result())
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return WorkspaceImport.model_construct(**validated)
@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import contextvars
+import mmap
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from sqlmodel import select, update
+
+from . import archive, backup, db, ingest, shards, snapshot, tenancy, workspace
+from .models import Job
+from .schemas import JobRead
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _aware(value: dt.datetime) -> dt.datetime:
+    # SQLite hands datetimes back naive; they were written in UTC.
+    return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, under another user
+        pass
+    return True
+
+
+class JobManager:
+    """Run imports and exports on a bounded thread pool.
+
+    Every job has a row in the ``job`` table, written when it is queued,
+    started and finished. Row counts move too fast to persist on every chunk
+    (and an import holds SQLite's write lock while it runs), so live progress
+    is kept in memory and overlaid on the row by :meth:`get`.
+
+    Jobs belong to the workspace they were submitted in: the row lives in that
+    workspace's database and the worker runs with it as the current workspace.
+
+    Several worker processes share the job table. Each row records its
+    ``owner`` (``host:pid``), and the owner refreshes ``heartbeat_at`` every
+    ``heartbeat_seconds`` while the job is live; :meth:`recover` only fails
+    jobs whose owner process is gone or, for owners on another host, whose
+    heartbeat is older than ``stale_after``. Cancelling sets the row's
+    ``cancel_requested``, which the owner checks between chunks, so a job can
+    be cancelled from any worker.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 16,
+        artifact_dir: Optional[str] = None,
+        heartbeat_seconds: float = 10.0,
+        stale_after: float = 60.0,
+        cancel_poll_seconds: float = 1.0,
+    ) -> None:
+        if max_workers < 1 or max_pending < 1:
+            raise ValueError("max_workers and max_pending must be positive")
+        if heartbeat_seconds <= 0 or stale_after <= heartbeat_seconds:
+            raise ValueError("stale_after must exceed a positive heartbeat_seconds")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.artifact_dir = artifact_dir or os.path.join(tempfile.gettempdir(), "imastery-jobs")
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_after = stale_after
+        self.cancel_poll_seconds = cancel_poll_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._cancelled: Dict[str, threading.Event] = {}
+        self._polled: Dict[str, float] = {}
+        self._workspaces: Dict[str, str] = {}
+        self._live: Dict[str, Dict[str, int]] = {}
+        self._spools: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "JobManager":
+        return cls(
+            max_workers=int(os.getenv("IMASTERY_JOB_WORKERS", "2")),
+            max_pending=int(os.getenv("IMASTERY_JOB_MAX_PENDING", "16")),
+            artifact_dir=os.getenv("IMASTERY_JOB_DIR") or None,
+            heartbeat_seconds=float(os.getenv("IMASTERY_JOB_HEARTBEAT_SECONDS", "10")),
+            stale_after=float(os.getenv("IMASTERY_JOB_STALE_SECONDS", "60")),
+        )
+
+    @property
+    def owner(self) -> str:
+        # Read on each use: the manager is built at import, possibly before a fork.
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # -- submission --------------------------------------------------------
+
+    def submit_import(self, raw: bytes, mode: str = "replace") -> JobRead:
+        return self._submit("import", mode, self._run_import, raw, mode)
+
+    def submit_import_file(self, path: str, mode: str = "replace") -> JobRead:
+        """Import a spooled upload; the file is removed once the job is done."""
+
+        return self._submit("import", mode, self._run_import_file, path, mode, spool=path)
+
+    def submit_export(self) -> JobRead:
+        return self._submit("export", "", self._run_export)
+
+    def submit_backup(self) -> JobRead:
+        return self._submit("backup", "", self._run_backup)
+
+    def submit_archive(self) -> JobRead:
+        return self._submit("archive", "", self._run_archive)
+
+    def _submit(self, kind: str, mode: str, target, *args: Any, spool: Optional[str] = None) -> JobRead:
+        with self._lock:
+            pending = sum(1 for future in self._futures.values() if not future.done())
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs are already queued or running")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="imastery-job")
+
+            job = Job(id=uuid.uuid4().hex, kind=kind, mode=mode, owner=self.owner, heartbeat_at=_utcnow())
+            with tenancy.session() as session:
+                session.add(job)
+                session.commit()
+                session.refresh(job)
+                created = JobRead.model_validate(job)
+            if spool is not None:
+                self._spools[job.id] = spool
+            self._cancelled[job.id] = threading.Event()
+            self._polled[job.id] = time.monotonic()
+            self._workspaces[job.id] = tenancy.current_workspace()
+            self._live[job.id] = {"rows_total": 0, "rows_validated": 0, "rows_written": 0}
+            future = self._executor.submit(contextvars.copy_context().run, self._run, job.id, target, *args)
+            self._futures[job.id] = future
+            future.add_done_callback(lambda _, job_id=job.id: self._forget(job_id))
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="imastery-job-heartbeat", daemon=True)
+                self._heartbeat.start()
+        return created
+
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+            self._cancelled.pop(job_id, None)
+            self._polled.pop(job_id, None)
+            self._workspaces.pop(job_id, None)
+            self._live.pop(job_id, None)
+            spool = self._spools.pop(job_id, None)
+        if spool is not None and os.path.exists(spool):
+            os.remove(spool)
+
+    # -- inspection and control --------------------------------------------
+
+    def get(self, job_id: str) -> Optional[JobRead]:
+        with tenancy.read_session() as session:
+            job = session.get(Job, job_id)
+            if job is None:
+                return None
+            read = JobRead.model_validate(job)
+        live = self._live.get(job_id)
+        if live is not None and read.status not in FINISHED:
+            read = read.model_copy(update=live)
+        return read
+
+    def artifact_path(self, job_id: str) -> Optional[str]:
+        with tenancy.read_session() as session:
+            job = session.get(Job, job_id)
+        if job is None or job.status != "succeeded" or not job.artifact:
+            return None
+        return job.artifact if os.path.exists(job.artifact) else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job, whichever worker runs it; ``False`` once it has finished."""
+
+        with tenancy.session() as session:
+            requested = session.exec(
+                update(Job)
+                .where(Job.id == job_id, Job.status.in_(("queued", "running")))
+                .values(cancel_requested=True)
+            ).rowcount
+            session.commit()
+        if not requested:
+            return False
+        with self._lock:
+            future = self._futures.get(job_id)
+            event = self._cancelled.get(job_id)
+        if future is not None and event is not None:
+            event.set()
+            if future.cancel():
+                self._finish(job_id, "cancelled")
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[JobRead]:
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and not future.cancelled():
+            future.result(timeout=timeout)
+        return self.get(job_id)
+
+    def recover(self, workspace_id: Optional[str] = None) -> int:
+        """Fail jobs left queued or running by a worker process that is gone; how many."""
+
+        now = _utcnow()
+        with tenancy.session(workspace_id) as session:
+            stale = [
+                job
+                for job in session.exec(select(Job).where(Job.status.in_(("queued", "running")))).all()
+                if self._abandoned(job, now)
+            ]
+            for job in stale:
+                job.status = "failed"
+                job.error = "Interrupted by a restart"
+                job.finished_at = now
+                session.add(job)
+            session.commit()
+        return len(stale)
+
+    def _abandoned(self, job: Job, now: dt.datetime) -> bool:
+        if job.id in self._futures:
+            return False
+        host, _, pid = job.owner.rpartition(":")
+        if not host or not pid.isdigit():
+            # Queued before jobs recorded their owner.
+            return True
+        if host == socket.gethostname():
+            # A live owner on this host may be holding the write lock its heartbeat waits on.
+            return job.owner == self.owner or not _pid_alive(int(pid))
+        return job.heartbeat_at is None or now - _aware(job.heartbeat_at) > dt.timedelta(seconds=self.stale_after)
+
+    # -- execution ---------------------------------------------------------
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with tenancy.session() as session:
+            job = session.get(Job, job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            session.add(job)
+            session.commit()
+
+    def _finish(self, job_id: str, status: str, **fields: Any) -> None:
+        self._update(job_id, status=status, finished_at=_utcnow(), **self._live.get(job_id, {}), **fields)
+
+    def _check_cancelled(self, job_id: str, force: bool = False) -> None:
+        """Raise ``JobCancelled`` once the job is cancelled, here or by another worker.
+
+        The row is polled at most every ``cancel_poll_seconds``, through the
+        read engine, so it is not held up by the job's own write transaction.
+        """
+
+        if self._cancelled[job_id].is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        if not force and now - self._polled[job_id] < self.cancel_poll_seconds:
+            return
+        self._polled[job_id] = now
+        with tenancy.read_session() as session:
+            job = session.get(Job, job_id)
+            if job is not None and job.cancel_requested:
+                self._cancelled[job_id].set()
+                raise JobCancelled()
+
+    def _progress(self, job_id: str, field: str, rows: int) -> None:
+        self._check_cancelled(job_id)
+        self._live[job_id][field] += rows
+
+    def _beat(self) -> None:
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                live = dict(self._workspaces)
+            by_workspace: Dict[str, list] = {}
+            for job_id, workspace_id in live.items():
+                by_workspace.setdefault(workspace_id, []).append(job_id)
+            for workspace_id, job_ids in by_workspace.items():
+                try:
+                    with tenancy.session(workspace_id) as session:
+                        session.exec(update(Job).where(Job.id.in_(job_ids)).values(heartbeat_at=_utcnow()))
+                        session.commit()
+                except Exception:  # noqa: BLE001 - e.g. an import holding the write lock; next beat
+                    logger.debug("Job heartbeat for %s skipped", workspace_id, exc_info=True)
+
+    def _run(self, job_id: str, target, *args: Any) -> None:
+        self._update(job_id, status="running", started_at=_utcnow())
+        try:
+            self._check_cancelled(job_id, force=True)
+            fields = target(job_id, *args) or {}
+        except JobCancelled:
+            self._finish(job_id, "cancelled")
+        except (ingest.InvalidWorkspace, backup.BackupError) as error:
+            self._finish(job_id, "failed", error=str(error))
+        except Exception as error:  # noqa: BLE001 - reported on the job
+            logger.exception("Job %s failed", job_id)
+            self._finish(job_id, "failed", error=str(error) or type(error).__name__)
+        else:
+            self._finish(job_id, "succeeded", **fields)
+
+    def _run_import_file(self, job_id: str, path: str, mode: str) -> Dict[str, Any]:
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                return self._run_import(job_id, b"", mode)
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self._run_import(job_id, mapped, mode)
+
+    def _run_import(self, job_id: str, raw: ingest.Buffer, mode: str) -> Dict[str, Any]:
+        def on_total(rows: int) -> None:
+            self._live[job_id]["rows_total"] = rows
+
+        def on_validated(rows: int) -> None:
+            self._progress(job_id, "rows_validated", rows)
+
+        def on_progress(rows: int) -> None:
+            self._progress(job_id, "rows_written", rows)
+
+        if snapshot.is_snapshot(raw[:8]):
+            opened = snapshot.Snapshot(raw)
+            try:
+                payload = opened.to_import(on_total=on_total, on_progress=on_validated)
+                if mode == "replace":
+                    # Restores keep ids and timestamps and skip the ORM.
+                    with tenancy.session() as session:
+                        counts = snapshot.restore_snapshot(session, opened, on_progress=on_progress)
+                    return {"result": json.dumps({"counts": counts})}
+            finally:
+                opened.release()
+        else:
+            payload = ingest.parse_workspace(raw, on_total=on_total, on_progress=on_validated)
+
+        with tenancy.session() as session:
+            if mode == "merge":
+                changes = workspace.merge_workspace(session, payload, on_progress=on_progress)
+                return {"result": json.dumps({"changes": changes})}
+            workspace.replace_workspace(session, payload, on_progress=on_progress)
+            return {"result": json.dumps({"counts": workspace.workspace_counts(session)})}
+
+    def _run_export(self, job_id: str) -> Dict[str, Any]:
+        # Streamed a batch at a time, as ``/api/export`` does, so the workspace
+        # is never held in memory; each batch is read and written in one go.
+        def on_progress(rows: int) -> None:
+            self._progress(job_id, "rows_validated", rows)
+            self._progress(job_id, "rows_written", rows)
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        path = os.path.join(self.artifact_dir, f"{job_id}.json")
+        partial = f"{path}.part"
+        try:
+            with tenancy.read_session() as session, open(partial, "wb") as handle:
+                counts = workspace.workspace_counts(session)
+                self._live[job_id]["rows_total"] = sum(counts.values())
+                for chunk in workspace.iter_export_json(session, on_progress=on_progress):
+                    handle.write(chunk)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return {"artifact": path, "result": json.dumps({"counts": counts})}
+
+    def _run_backup(self, job_id: str) -> Dict[str, Any]:
+        # Backups count pages rather than rows in the progress fields.
+        def on_progress(copied: int, total: int) -> None:
+            self._check_cancelled(job_id)
+            self._live[job_id].update(rows_total=total, rows_validated=copied, rows_written=copied)
+
+        url = db.database_url()
+        results = backup.backup_workspaces(url, backup.BackupPolicy.from_env(url), on_progress=on_progress)
+        # The application database's backup is the artifact; shard backups are listed by workspace.
+        result = results.pop(shards.DEFAULT_WORKSPACE)
+        every = (result, *results.values())
+        summary = {
+            "backup": os.path.basename(result.path),
+            "size_bytes": sum(item.size_bytes for item in every),
+            "pages": sum(item.pages for item in every),
+            "steps": sum(item.steps for item in every),
+            "restarts": sum(item.restarts for item in every),
+            "seconds": round(sum(item.seconds for item in every), 3),
+            "workspaces": {workspace_id: os.path.basename(item.path) for workspace_id, item in results.items()},
+        }
+        return {"artifact": result.path, "result": json.dumps(summary)}
+
+    def _run_archive(self, job_id: str) -> Dict[str, Any]:
+        def on_progress(rows: int) -> None:
+            self._progress(job_id, "rows_written", rows)
+
+        with tenancy.session() as session:
+            moved = archive.archive_entries(session, archive.ArchivePolicy.from_env(), on_progress=on_progress)
+        return {"result": json.dumps({"archived": moved})}
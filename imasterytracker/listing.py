@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from .models import Habit, JournalEntry, LearningStream
+from .schemas import HabitRead, JournalEntryRead, LearningStreamRead
+
+# Query parameters of the list endpoints.
+#
+# ``?status=active``, ``?cadence=Weekly``, ``?mood=Focused,Energised``,
+# ``?created_after=2024-05-01&created_before=2024-06-01`` and the like become
+# ``WHERE`` clauses, ``?sort=-created_at,name`` an ``ORDER BY`` (ties broken by
+# id) and ``?fields=id,title`` a projection onto just those columns. Each
+# resource lists the filters, sort keys and fields it accepts; anything else is
+# rejected rather than ignored, so a typo never silently returns everything.
+#
+# Without ``fields`` rows are validated through the resource's read schema as
+# before; with it they are only converted to JSON, field by field.
+
+# Parameters the middleware handles, accepted on every endpoint.
+PASSTHROUGH = frozenset({"workspace"})
+
+MAX_LIMIT = 10_000
+
+
+class ListingError(ValueError):
+    pass
+
+
+def _values(raw: str) -> List[str]:
+    values = [value.strip() for value in raw.split(",") if value.strip()]
+    if not values:
+        raise ListingError("Expected at least one value")
+    return values
+
+
+def _timestamp(raw: str) -> dt.datetime:
+    """An ISO date (midnight UTC) or datetime (UTC unless it says otherwise)."""
+
+    try:
+        moment = dt.datetime.fromisoformat(raw)
+    except ValueError:
+        raise ListingError(f"{raw!r} is not an ISO date or datetime") from None
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=dt.timezone.utc)
+    return moment.astimezone(dt.timezone.utc)
+
+
+Filter = Callable[[Any, str], ColumnElement]
+
+
+def _one_of(column: str) -> Filter:
+    return lambda model, raw: getattr(model, column).in_(_values(raw))
+
+
+def _created_after(model: Any, raw: str) -> ColumnElement:
+    return model.created_at >= _timestamp(raw)
+
+
+def _created_before(model: Any, raw: str) -> ColumnElement:
+    return model.created_at < _timestamp(raw)
+
+
+def _stream_status(model: Any, raw: str) -> ColumnElement:
+    if raw == "active":
+        return model.milestones_completed < model.milestones_total
+    if raw == "complete":
+        return model.milestones_completed >= model.milestones_total
+    raise ListingError("status must be 'active' or 'complete'")
+
+
+_CREATED = {"created_after": _created_after, "created_before": _created_before}
+
+
+@dataclasses.dataclass(frozen=True)
+class Resource:
+    model: Any
+    schema: Type[BaseModel]
+    filters: Mapping[str, Filter]
+    sort_keys: Tuple[str, ...]
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        return tuple(self.schema.model_fields)
+
+
+STREAMS = Resource(
+    LearningStream,
+    LearningStreamRead,
+    {"status": _stream_status, **_CREATED},
+    ("id", "name", "created_at", "milestones_total", "milestones_completed"),
+)
+HABITS = Resource(
+    Habit,
+    HabitRead,
+    {"cadence": _one_of("cadence"), **_CREATED},
+    ("id", "name", "cadence", "created_at", "last_completed_on"),
+)
+JOURNALS = Resource(
+    JournalEntry,
+    JournalEntryRead,
+    {"mood": _one_of("mood"), **_CREATED},
+    ("id", "title", "mood", "created_at"),
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class ListQuery:
+    resource: Resource
+    criteria: Tuple[ColumnElement, ...] = ()
+    order: Tuple[Tuple[str, bool], ...] = (("id", False),)
+    fields: Optional[Tuple[str, ...]] = None
+    limit: Optional[int] = None
+
+    @classmethod
+    def parse(cls, resource: Resource, params: Mapping[str, str]) -> "ListQuery":
+        """Validate ``params`` against ``resource``'s allow-lists; raises ``ListingError``."""
+
+        criteria, order, fields, limit = [], [], None, None
+        for name, raw in params.items():
+            if name in PASSTHROUGH:
+                continue
+            if name in resource.filters:
+                try:
+                    criteria.append(resource.filters[name](resource.model, raw))
+                except ListingError as error:
+                    raise ListingError(f"{name}: {error}") from None
+            elif name == "sort":
+                order = [_sort_key(resource, key) for key in _values(raw)]
+            elif name == "fields":
+                fields = tuple(dict.fromkeys(_values(raw)))
+                unknown = sorted(set(fields) - set(resource.fields))
+                if unknown:
+                    raise ListingError(f"fields: unknown {', '.join(unknown)}; allowed: {', '.join(resource.fields)}")
+            elif name == "limit":
+                limit = _limit(raw)
+            else:
+                allowed = sorted({*resource.filters, "sort", "fields", "limit"})
+                raise ListingError(f"Unknown parameter {name!r}; allowed: {', '.join(allowed)}")
+        if "id" not in (key for key, _ in order):
+            order.append(("id", order[-1][1] if order else False))
+        return cls(resource, tuple(criteria), tuple(order), fields, limit)
+
+    def statement(self):
+        model = self.resource.model
+        columns = [getattr(model, name) for name in self.fields or self.resource.fields]
+        statement = select(*columns).where(*self.criteria)
+        statement = statement.order_by(
+            *(getattr(model, key).desc() if descending else getattr(model, key) for key, descending in self.order)
+        )
+        return statement.limit(self.limit) if self.limit is not None else statement
+
+    def fetch(self, session: Session) -> List[Dict[str, Any]]:
+        rows = session.execute(self.statement()).mappings()
+        if self.fields is None:
+            schema = self.resource.schema
+            return [schema.model_validate(dict(row)).model_dump(mode="json") for row in rows]
+        adapters = {name: _adapter(self.resource.schema, name) for name in self.fields}
+        return [{name: adapters[name].dump_python(row[name], mode="json") for name in self.fields} for row in rows]
+
+
+def _sort_key(resource: Resource, key: str) -> Tuple[str, bool]:
+    descending = key.startswith("-")
+    name = key.lstrip("-")
+    if name not in resource.sort_keys:
+        raise ListingError(f"sort: unknown key {name!r}; allowed: {', '.join(resource.sort_keys)}")
+    return name, descending
+
+
+def _limit(raw: str) -> int:
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ListingError(f"limit must be an integer from 1 to {MAX_LIMIT}")
+    return limit
+
+
+_adapters: Dict[Tuple[type, str], TypeAdapter] = {}
+
+
+def _adapter(schema: Type[BaseModel], name: str) -> TypeAdapter:
+    key = (schema, name)
+    if key not in _adapters:
+        _adapters[key] = TypeAdapter(schema.model_fields[name].annotation)
+    return _adapters[key]
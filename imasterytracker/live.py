@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from . import changes
+from .shards import DEFAULT_WORKSPACE
+
+logger = logging.getLogger(__name__)
+
+# Push notifications for open dashboards.
+#
+# Every workspace's tracker calls ``publish`` after each committed write to
+# one of its tables, on whichever thread committed it; writes from other
+# processes arrive the same way once ``sync`` notices them, which the hub's
+# poller does while any tab is subscribed. Each open tab holds one
+# ``Subscription`` to its workspace: the set of
+# table keys changed since it last looked and an ``asyncio.Event`` on its
+# loop. Publishing only unions keys into that set and wakes the waiter, so a
+# burst of writes collapses into one refresh per tab and the backlog can never
+# outgrow the number of tables, however slow a tab is to catch up.
+
+
+class Subscription:
+    def __init__(self, hub: "ChangeHub", token: str, workspace_id: str, loop: asyncio.AbstractEventLoop) -> None:
+        self.token = token
+        self.workspace_id = workspace_id
+        self._hub = hub
+        self._loop = loop
+        self._pending: Set[str] = set()
+        self._wake = asyncio.Event()
+        self.closed = False
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[FrozenSet[str]]:
+        """Wait for changed tables: empty after ``timeout``, ``None`` once closed."""
+
+        if not self._pending and not self.closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._pending and not self.closed and self._hub.settle > 0:
+            # Let the rest of a burst (an import, a bulk update) land first.
+            await asyncio.sleep(self._hub.settle)
+        if self.closed:
+            return None
+        tables, self._pending = frozenset(self._pending), set()
+        self._wake.clear()
+        return tables
+
+    def close(self) -> None:
+        self._hub._remove(self)
+
+    def _notify(self, tables: FrozenSet[str]) -> None:
+        self._pending |= tables
+        self._wake.set()
+
+    def _closed(self) -> None:
+        self.closed = True
+        self._wake.set()
+
+
+class ChangeHub:
+    """Fan committed table changes out to every subscribed dashboard tab.
+
+    A tab has at most one subscription: subscribing again with the same token
+    (a reload, a reconnect) closes the previous one.
+    """
+
+    def __init__(self, settle: float = 0.05, poll_interval: float = 1.0) -> None:
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.published = 0
+        self.deliveries = 0
+
+    @classmethod
+    def from_env(cls) -> "ChangeHub":
+        return cls(
+            settle=float(os.getenv("IMASTERY_LIVE_SETTLE_SECONDS", "0.05")),
+            poll_interval=float(os.getenv("IMASTERY_LIVE_POLL_SECONDS", "1")),
+        )
+
+    def subscribe(self, token: str, workspace_id: str = DEFAULT_WORKSPACE) -> Subscription:
+        """Subscribe ``token``'s tab; must be called on the loop that will wait on it."""
+
+        subscription = Subscription(self, token, workspace_id, asyncio.get_running_loop())
+        with self._lock:
+            previous = self._subscriptions.get(token)
+            self._subscriptions[token] = subscription
+        if previous is not None:
+            self._call(previous._loop, previous._closed)
+        return subscription
+
+    def publish(self, workspace_id: str, tables: FrozenSet[str]) -> None:
+        with self._lock:
+            subscriptions = [
+                subscription
+                for subscription in self._subscriptions.values()
+                if subscription.workspace_id == workspace_id
+            ]
+            self.published += 1
+            self.deliveries += len(subscriptions)
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        for subscription in subscriptions:
+            by_loop.setdefault(subscription._loop, []).append(subscription)
+        # One hop onto each loop, however many tabs it serves.
+        for loop, group in by_loop.items():
+            if not self._call(loop, _notify_all, group, tables):
+                for subscription in group:
+                    self._remove(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscriptions),
+                "published": self.published,
+                "deliveries": self.deliveries,
+            }
+
+    def _remove(self, subscription: Subscription) -> None:
+        with self._lock:
+            if self._subscriptions.get(subscription.token) is subscription:
+                del self._subscriptions[subscription.token]
+        subscription.closed = True
+
+    @staticmethod
+    def _call(loop: asyncio.AbstractEventLoop, callback, *args) -> bool:
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:  # the loop has been closed
+            return False
+        return True
+
+    # -- cross-process poller -----------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None or self.poll_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="imastery-live", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            if not self._subscriptions:
+                continue
+            for workspace_id, tracker in changes.attached_trackers().items():
+                try:
+                    tracker.sync()
+                except Exception:  # noqa: BLE001 - try again on the next tick
+                    logger.exception("Checking %s for writes from other processes failed", workspace_id)
+
+
+def _notify_all(subscriptions: List[Subscription], tables: FrozenSet[str]) -> None:
+    for subscription in subscriptions:
+        if not subscription.closed:
+            subscription._notify(tables)
+
+
+hub = ChangeHub.from_env()
+changes.subscribe_all(hub.publish)
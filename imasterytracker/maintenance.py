@@ -0,0 +1,164 @@
+"""Idle-time upkeep for the workspace databases.
+
+Each run, per workspace: purge tombstones older than the retention period in
+small batches, then ``ANALYZE``, return free pages with an incremental vacuum
+and truncate the WAL with a checkpoint. It only starts once the workspace has
+seen no writes for ``idle_seconds`` and stops purging as soon as one arrives,
+so the batches never queue in front of user traffic. Incremental vacuum needs
+``auto_vacuum=INCREMENTAL``: new databases get it, existing ones after
+``python -m imasterytracker.cli vacuum``.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+from . import tombstones
+from .scheduler import Scheduler
+
+_AUTO_VACUUM = {0: "none", 1: "full", 2: "incremental"}
+
+
+class Busy(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class MaintenancePolicy:
+    retention_days: float = 30.0
+    batch_size: int = 500
+    idle_seconds: float = 60.0
+    vacuum_pages: int = 2000
+
+    @classmethod
+    def from_env(cls) -> "MaintenancePolicy":
+        return cls(
+            retention_days=float(os.getenv("IMASTERY_TOMBSTONE_RETENTION_DAYS", "30")),
+            batch_size=int(os.getenv("IMASTERY_MAINTENANCE_BATCH_SIZE", "500")),
+            idle_seconds=float(os.getenv("IMASTERY_MAINTENANCE_IDLE_SECONDS", "60")),
+            vacuum_pages=int(os.getenv("IMASTERY_MAINTENANCE_VACUUM_PAGES", "2000")),
+        )
+
+
+class Maintenance:
+    def __init__(self, policy: MaintenancePolicy, clock: Callable[[], float] = time.monotonic) -> None:
+        self.policy = policy
+        self._clock = clock
+        self._last_write: Dict[str, float] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.skipped_busy = 0
+        self.interrupted = 0
+        self.purged: Dict[str, int] = {model.__tablename__: 0 for model in tombstones.MODELS}
+        self.last: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_env(cls) -> "Maintenance":
+        return cls(MaintenancePolicy.from_env())
+
+    def record_write(self, workspace_id: str, tables: FrozenSet[str]) -> None:  # noqa: ARG002
+        # Purging commits too; those writes must not count as activity.
+        if not getattr(self._local, "running", False):
+            self._last_write[workspace_id] = self._clock()
+
+    def idle(self, workspace_id: str) -> bool:
+        last = self._last_write.get(workspace_id)
+        return last is None or self._clock() - last >= self.policy.idle_seconds
+
+    def run(self, workspace_id: str, session: Session, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Maintain ``session``'s database; ``None`` when skipped because it is busy."""
+
+        if not force and not self.idle(workspace_id):
+            with self._lock:
+                self.skipped_busy += 1
+            return None
+        started = time.perf_counter()
+        report: Dict[str, Any] = {
+            "started_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "purged": {},
+            "interrupted": False,
+        }
+        self._local.running = True
+        try:
+            self._purge(workspace_id, session, force, report)
+        finally:
+            self._local.running = False
+        if not report["interrupted"]:
+            engine = session.get_bind()
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                self._tidy(connection, report)
+        report["seconds"] = round(time.perf_counter() - started, 4)
+        with self._lock:
+            self.runs += 1
+            self.interrupted += report["interrupted"]
+            for table, count in report["purged"].items():
+                self.purged[table] += count
+            self.last[workspace_id] = report
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "skipped_busy": self.skipped_busy,
+                "interrupted": self.interrupted,
+                "purged": dict(self.purged),
+                "last": {workspace_id: dict(report) for workspace_id, report in self.last.items()},
+            }
+
+    def _purge(self, workspace_id: str, session: Session, force: bool, report: Dict[str, Any]) -> None:
+        before = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=self.policy.retention_days)
+
+        purged = report["purged"]
+
+        for model in tombstones.MODELS:
+            table = model.__tablename__
+            purged[table] = 0
+
+            def between_batches(rows: int, table: str = table) -> None:
+                # Counted here so a run cut short still reports what it removed.
+                purged[table] += rows
+                if not force and not self.idle(workspace_id):
+                    raise Busy()
+
+            try:
+                tombstones.purge(session, model, before, self.policy.batch_size, on_batch=between_batches)
+            except Busy:
+                report["interrupted"] = True
+                return
+
+    def _tidy(self, connection: Connection, report: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        connection.exec_driver_sql("ANALYZE")
+        report["analyze_seconds"] = round(time.perf_counter() - started, 4)
+        if connection.dialect.name != "sqlite":
+            return
+
+        mode = _AUTO_VACUUM.get(connection.exec_driver_sql("PRAGMA auto_vacuum").scalar(), "none")
+        free = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if mode == "incremental":
+            # The pragma frees one page per step and ``execute`` only steps it
+            # once; ``executescript`` runs it to completion.
+            pages = int(self.policy.vacuum_pages)
+            connection.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({pages})")
+        remaining = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        report["vacuum"] = {"auto_vacuum": mode, "pages_freed": free - remaining, "free_pages": remaining}
+
+        if connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal":
+            busy, log, checkpointed = connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+            report["checkpoint"] = {"busy": bool(busy), "log_pages": log, "checkpointed_pages": checkpointed}
+
+
+def scheduler_from_env(run: Callable[[], object]) -> Optional[Scheduler]:
+    """Run ``run`` every ``$IMASTERY_MAINTENANCE_INTERVAL_MINUTES`` (15; 0 disables it)."""
+
+    return Scheduler.from_env(run, "IMASTERY_MAINTENANCE_INTERVAL_MINUTES", 15, name="maintenance")
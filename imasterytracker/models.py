@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import datetime as dt
+import random
+
+from sqlalchemy import Index, text
+from sqlmodel import Field, SQLModel
+
+# Table models are plain SQLModel classes so that headless tooling (the CLI,
+# migrations, the generator) can use them without importing Reflex.
+#
+# Workspace rows are soft-deleted (see ``tombstones``): each table indexes its
+# live rows in display order and, separately, its few tombstones for purging.
+
+
+COLOR_PALETTE = [
+    "#6366F1",
+    "#22C55E",
+    "#F97316",
+    "#EC4899",
+    "#0EA5E9",
+    "#FACC15",
+]
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def random_color() -> str:
+    return random.choice(COLOR_PALETTE)
+
+
+def _soft_delete_indexes(table: str, *filtered: str) -> tuple:
+    """Indexes over live rows in display order, optionally led by the list filters in ``filtered``."""
+
+    live, tombstone = text("deleted_at IS NULL"), text("deleted_at IS NOT NULL")
+    return (
+        Index(f"ix_{table}_live", "created_at", "id", sqlite_where=live, postgresql_where=live),
+        Index(f"ix_{table}_tombstones", "deleted_at", sqlite_where=tombstone, postgresql_where=tombstone),
+        *(
+            Index(f"ix_{table}_live_{column}", column, "created_at", "id", sqlite_where=live, postgresql_where=live)
+            for column in filtered
+        ),
+    )
+
+
+class LearningStream(SQLModel, table=True):
+    """A deliberate practice focus area."""
+
+    __table_args__ = _soft_delete_indexes("learningstream")
+
+    id: int | None = Field(default=None, primary_key=True)
+    name: str
+    focus: str = ""
+    milestones_total: int = 1
+    milestones_completed: int = 0
+    color: str = "#6366F1"
+    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
+    deleted_at: dt.datetime | None = Field(default=None, nullable=True)
+
+
+class Habit(SQLModel, table=True):
+    """A daily or weekly ritual that supports growth."""
+
+    __table_args__ = _soft_delete_indexes("habit", "cadence")
+
+    id: int | None = Field(default=None, primary_key=True)
+    name: str
+    cadence: str = "Daily"
+    context: str = ""
+    last_completed_on: dt.date | None = Field(default=None, nullable=True)
+    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
+    deleted_at: dt.datetime | None = Field(default=None, nullable=True)
+
+
+class JournalEntry(SQLModel, table=True):
+    """Short reflections documenting insights."""
+
+    # Archived entries keep their id, so ids must never be handed out twice.
+    __table_args__ = (*_soft_delete_indexes("journalentry", "mood"), {"sqlite_autoincrement": True})
+
+    id: int | None = Field(default=None, primary_key=True)
+    title: str
+    reflection: str
+    mood: str = "Curious"
+    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
+    deleted_at: dt.datetime | None = Field(default=None, nullable=True)
+
+
+class ArchivedJournalEntry(SQLModel, table=True):
+    """A journal entry moved out of ``journalentry``, its reflection zlib-compressed."""
+
+    __table_args__ = _soft_delete_indexes("archivedjournalentry")
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    title: str
+    reflection_z: bytes
+    mood: str = "Curious"
+    created_at: dt.datetime = Field(nullable=False)
+    archived_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
+    deleted_at: dt.datetime | None = Field(default=None, nullable=True)
+
+
+class JournalRollup(SQLModel, table=True):
+    """Live journal entries per UTC day and mood; maintained by ``analytics``."""
+
+    day: dt.date = Field(primary_key=True)
+    mood: str = Field(primary_key=True)
+    entries: int = 0
+    reflection_chars: int = 0
+
+
+class Job(SQLModel, table=True):
+    """A background import, export or backup and its last persisted progress."""
+
+    id: str = Field(primary_key=True)
+    kind: str
+    mode: str = ""
+    status: str = "queued"
+    rows_total: int = 0
+    rows_validated: int = 0
+    rows_written: int = 0
+    result: str = ""
+    error: str = ""
+    artifact: str = ""
+    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
+    started_at: dt.datetime | None = Field(default=None, nullable=True)
+    finished_at: dt.datetime | None = Field(default=None, nullable=True)
+    # ``host:pid`` of the worker process running the job, and when it last
+    # said it was still alive; see ``JobManager.recover``.
+    owner: str = ""
+    heartbeat_at: dt.datetime | None = Field(default=None, nullable=True)
+    cancel_requested: bool = False
+
+
+class TableVersion(SQLModel, table=True):
+    """Write counter per workspace table, shared by every process on the database."""
+
+    name: str = Field(primary_key=True)
+    version: int = 0
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+from typing import List, Optional, Type, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Habit, JournalEntry, LearningStream
+
+# Slim read-only rows for the dashboard cards.
+#
+# ``DashboardState`` sends its list vars to every open tab on each change, so
+# they carry only the fields the cards in ``app.py`` render. The rows are
+# loaded as column tuples, skipping the ORM identity map and model
+# validation, and serialise as plain dicts. Lists are newest first.
+
+Card = TypeVar("Card")
+
+
+@dataclasses.dataclass(slots=True)
+class StreamCard:
+    id: int
+    name: str
+    focus: str
+    milestones_total: int
+    milestones_completed: int
+    color: str
+
+
+@dataclasses.dataclass(slots=True)
+class HabitCard:
+    id: int
+    name: str
+    cadence: str
+    context: str
+    last_completed_on: Optional[dt.date]
+
+
+@dataclasses.dataclass(slots=True)
+class JournalCard:
+    id: int
+    title: str
+    reflection: str
+    mood: str
+    created_at: dt.datetime
+
+
+def _load(session: Session, card: Type[Card], model) -> List[Card]:
+    columns = [getattr(model, field.name) for field in dataclasses.fields(card)]
+    statement = select(*columns).order_by(model.created_at.desc(), model.id.desc())
+    return [card(*row) for row in session.execute(statement)]
+
+
+def stream_cards(session: Session) -> List[StreamCard]:
+    return _load(session, StreamCard, LearningStream)
+
+
+def habit_cards(session: Session) -> List[HabitCard]:
+    return _load(session, HabitCard, Habit)
+
+
+def journal_cards(session: Session) -> List[JournalCard]:
+    return _load(session, JournalCard, JournalEntry)
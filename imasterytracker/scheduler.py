@@ -0,0 +1,118 @@
+"""Periodic background runs shared by every worker process.
+
+Each worker starts the same schedulers, so a run first takes an exclusive,
+non-blocking ``flock`` on ``.imastery-<name>.lock`` beside the database (or
+in ``$IMASTERY_LOCK_DIR``). A worker that finds the lock held skips that tick.
+The lock file also records when the last run started, and a worker skips a
+run that another one started less than half an interval ago, so timers that
+fire a moment apart in different workers still run the job only once.
+
+Where ``fcntl`` is unavailable, or the database is not a file, runs are not
+coordinated.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy.engine import make_url
+
+from . import db
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def lock_path(name: str, database_url: Optional[str] = None) -> Optional[str]:
+    """The lock file of the ``name`` schedule, or ``None`` if runs can't be coordinated."""
+
+    directory = os.getenv("IMASTERY_LOCK_DIR")
+    if not directory:
+        url = make_url(database_url or db.database_url())
+        if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+            return None
+        directory = os.path.dirname(os.path.abspath(url.database))
+    return os.path.join(directory, f".imastery-{name}.lock")
+
+
+class Scheduler:
+    """Call ``run`` every ``interval`` seconds on a daemon thread, in one worker at a time."""
+
+    def __init__(
+        self,
+        run: Callable[[], object],
+        interval: float,
+        name: str,
+        lock_path: Optional[str] = None,
+    ) -> None:
+        self.run = run
+        self.interval = interval
+        self.name = name
+        self.lock_path = lock_path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(
+        cls, run: Callable[[], object], variable: str, default_minutes: float, name: str
+    ) -> Optional["Scheduler"]:
+        """Run ``run`` every ``$<variable>`` minutes (``default_minutes``; 0 disables it)."""
+
+        minutes = float(os.getenv(variable, str(default_minutes)) or 0)
+        return cls(run, minutes * 60, name, lock_path(name)) if minutes > 0 else None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name=f"imastery-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the schedule, waiting up to ``timeout`` seconds for a run in progress."""
+
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def run_once(self) -> bool:
+        """Run now unless another worker holds the lock or just ran; whether it ran."""
+
+        if self.lock_path is None or fcntl is None:
+            self.run()
+            return True
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, "a+") as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                handle.seek(0)
+                last = float(handle.read().strip() or 0)
+                now = time.time()
+                if 0 <= now - last < self.interval / 2:
+                    return False
+                handle.seek(0)
+                handle.truncate()
+                handle.write(repr(now))
+                handle.flush()
+                self.run()
+                return True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:  # noqa: BLE001 - keep the schedule alive
+                logger.exception("Scheduled %s failed", self.name)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import List, Optional
+import json
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator, model_validator
+
+# Upper bound on items in a bulk create body or operations in a batch.
+MAX_BATCH_SIZE = 5000
 
 
 class LearningStreamBase(BaseModel):
@@ -76,6 +80,12 @@ class JournalEntryCreate(JournalEntryBase):
     pass
 
 
+class JournalEntryImport(JournalEntryCreate):
+    # Exports carry ``created_at``; keeping it lets a merge import match
+    # entries across edits and preserve their original timestamps.
+    created_at: Optional[dt.datetime] = None
+
+
 class JournalEntryRead(JournalEntryBase):
     id: int
     created_at: Optional[dt.datetime] = None
@@ -83,13 +93,102 @@ class JournalEntryRead(JournalEntryBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class JournalHistoryEntry(JournalEntryRead):
+    archived: bool = False
+
+
+class JournalHistoryPage(BaseModel):
+    entries: List[JournalHistoryEntry]
+    next_cursor: Optional[str] = None
+
+
+class JournalAnalyticsPeriod(BaseModel):
+    start: dt.date
+    entries: int = 0
+    reflection_chars: int = 0
+    moods: Dict[str, int] = Field(default_factory=dict)
+
+    @computed_field
+    @property
+    def average_reflection_length(self) -> float:
+        return round(self.reflection_chars / self.entries, 1) if self.entries else 0.0
+
+
+class JournalAnalytics(BaseModel):
+    bucket: str
+    periods: List[JournalAnalyticsPeriod]
+    moods: Dict[str, int]
+
+
+class SearchHit(BaseModel):
+    kind: Literal["stream", "habit", "journal"]
+    id: int
+    title: str
+    snippet: str
+    score: float
+
+
+class SearchResults(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+
 class WorkspaceImport(BaseModel):
     streams: List[LearningStreamCreate] = Field(default_factory=list)
     habits: List[HabitCreate] = Field(default_factory=list)
-    journal_entries: List[JournalEntryCreate] = Field(default_factory=list)
+    journal_entries: List[JournalEntryImport] = Field(default_factory=list)
 
 
 class WorkspaceExport(BaseModel):
     streams: List[LearningStreamRead]
     habits: List[HabitRead]
     journal_entries: List[JournalEntryRead]
+
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "delete", "progress"]
+    type: Literal["stream", "habit", "journal"]
+    id: Optional[int] = None
+    data: Dict[str, Any] = Field(default_factory=dict)
+    delta: int = 0
+
+    @model_validator(mode="after")
+    def _check_target(self) -> "BatchOperation":
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"{self.op} requires an id")
+        if self.op == "progress" and self.type != "stream":
+            raise ValueError("progress only applies to streams")
+        return self
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BackupRead(BaseModel):
+    name: str
+    size_bytes: int
+    created_at: dt.datetime
+
+
+class JobRead(BaseModel):
+    id: str
+    kind: str
+    mode: str = ""
+    status: str
+    rows_total: int = 0
+    rows_validated: int = 0
+    rows_written: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: str = ""
+    created_at: dt.datetime
+    started_at: Optional[dt.datetime] = None
+    finished_at: Optional[dt.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("result", mode="before")
+    def _decode_result(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return json.loads(value) if value else None
+        return value
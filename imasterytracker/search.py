@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import dataclasses
+import re
+import unicodedata
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import column, delete, event, func, insert, inspect, select, table, text
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlmodel import SQLModel
+
+from .analytics import UNCHANGED
+from .listing import PASSTHROUGH
+from .models import ArchivedJournalEntry, Habit, JournalEntry, LearningStream
+from .schemas import SearchHit, SearchResults
+
+# One full-text index over streams, habits and journal entries.
+#
+# ``searchindex`` is an SQLite FTS5 table with a title (stream and habit
+# names, journal titles) and a body (focus, context, reflection) for every live
+# row, archived journal entries included. Its rowid is the row's id with the
+# kind's code in the bits above it, so one row is replaced or dropped by key
+# and each kind is a contiguous rowid range that queries and re-indexing can
+# stick to.
+#
+# The index follows every write in the same transaction, from the same session
+# events as ``analytics``: rows the ORM flushes with a new title, body or
+# ``deleted_at`` are re-indexed just before commit, and a bulk statement on a
+# table re-indexes its kind from scratch, unless it only moves rows without
+# changing the live set (archiving, purging tombstones) and says so with
+# ``analytics.UNCHANGED``. ``rebuild`` re-indexes everything; the
+# ``search --rebuild`` CLI command and the synthetic data generator run it.
+#
+# Every word of a query must match, as a prefix ("strat" finds "strategy";
+# single letters only match themselves). A word of four letters or more that
+# prefixes nothing in the index matches the indexed terms with the same first
+# letter within one edit (two from eight letters) instead, so "stratgey" still
+# finds "strategy". Hits are ranked by bm25, titles weighing four times the
+# body. Ranking costs time per match, so a query matching more than
+# ``RANK_WINDOW`` rows of a kind only ranks the newest ``RANK_WINDOW`` of them.
+
+TABLE = "searchindex"
+KINDS = ("stream", "habit", "journal")
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_TERMS = 8
+RANK_WINDOW = 1000
+
+_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "title, body, prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    # Per term, for typo matching, and per occurrence, to list a prefix's terms
+    # without counting each one's documents.
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE}_vocab USING fts5vocab({TABLE}, row)",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE}_instances USING fts5vocab({TABLE}, instance)",
+)
+_INDEX = table(TABLE, column("rowid"), column("title"), column("body"))
+_ID_BITS = 40
+_PENDING = "search_pending"
+_REINDEX = "search_reindex"
+_BATCH_SIZE = 1000
+_FUZZY_FROM = 4
+# Prefixes with at most this many completions are searched as those terms.
+_MAX_COMPLETIONS = 16
+
+
+class SearchError(ValueError):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class _Source:
+    kind: str
+    code: int
+    model: Any
+    title: str
+    body: str
+
+    @property
+    def low(self) -> int:
+        return self.code << _ID_BITS
+
+    @property
+    def high(self) -> int:
+        return self.low + (1 << _ID_BITS) - 1
+
+    def rowid(self, entity_id: int) -> int:
+        return self.low + entity_id
+
+
+STREAMS = _Source("stream", 1, LearningStream, "name", "focus")
+HABITS = _Source("habit", 2, Habit, "name", "context")
+JOURNALS = _Source("journal", 3, JournalEntry, "title", "reflection")
+# Archived entries keep their ids, so they stay under the same key.
+_ARCHIVED = _Source("journal", 3, ArchivedJournalEntry, "title", "reflection_z")
+
+_SOURCES = {source.kind: source for source in (STREAMS, HABITS, JOURNALS)}
+_BY_MODEL = {source.model: source for source in (STREAMS, HABITS, JOURNALS, _ARCHIVED)}
+_BY_TABLE = {source.model.__tablename__: source for source in _BY_MODEL.values()}
+_BY_CODE = {source.code: source for source in _SOURCES.values()}
+
+
+# -- the index table ---------------------------------------------------------
+
+
+def create(executor: Any) -> bool:
+    """Create the index (and its vocabulary view) if missing; ``True`` if it was."""
+
+    exists = executor.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": TABLE}
+    ).first()
+    if exists:
+        return False
+    for statement in _CREATE:
+        executor.execute(text(statement))
+    return True
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_with_tables(target, connection, **kw) -> None:  # noqa: ARG001
+    # Databases created before the index existed get it filled from their rows.
+    if connection.dialect.name == "sqlite" and create(connection):
+        _fill(connection)
+
+
+def _index_rows(executor: Any, documents: Mapping[int, Optional[Tuple[str, str]]]) -> None:
+    """Replace the rows keyed by ``documents``' rowids; ``None`` only drops the row."""
+
+    keys = sorted(documents)
+    for start in range(0, len(keys), _BATCH_SIZE):
+        batch = keys[start : start + _BATCH_SIZE]
+        executor.execute(delete(_INDEX).where(_INDEX.c.rowid.in_(batch)))
+        rows = [
+            {"rowid": key, "title": documents[key][0], "body": documents[key][1]}
+            for key in batch
+            if documents[key] is not None
+        ]
+        if rows:
+            executor.execute(insert(_INDEX), rows)
+
+
+def _reindex(executor: Any, source: _Source, clear: bool = True) -> None:
+    if clear:
+        executor.execute(delete(_INDEX).where(_INDEX.c.rowid.between(source.low, source.high)))
+    # Rows go in by id: FTS5 writes a new segment whenever rowids stop increasing.
+    if source is JOURNALS:
+        from .archive import decompress_text
+
+        cold = (
+            select(ArchivedJournalEntry.id, ArchivedJournalEntry.title, ArchivedJournalEntry.reflection_z)
+            .where(ArchivedJournalEntry.deleted_at.is_(None))
+            .order_by(ArchivedJournalEntry.id)
+            .execution_options(yield_per=_BATCH_SIZE)
+        )
+        rows = [
+            {"rowid": _ARCHIVED.rowid(entry_id), "title": title, "body": decompress_text(blob)}
+            for entry_id, title, blob in executor.execute(cold)
+        ]
+        for start in range(0, len(rows), _BATCH_SIZE):
+            executor.execute(insert(_INDEX), rows[start : start + _BATCH_SIZE])
+    model = source.model
+    executor.execute(
+        insert(_INDEX).from_select(
+            ["rowid", "title", "body"],
+            select(model.id + source.low, getattr(model, source.title), getattr(model, source.body))
+            .where(model.deleted_at.is_(None))
+            .order_by(model.id),
+        )
+    )
+
+
+def _fill(executor: Any) -> None:
+    for source in _SOURCES.values():
+        _reindex(executor, source, clear=False)
+    # Merge the index into one b-tree per term, the fastest layout to query.
+    executor.execute(text(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"))
+
+
+def rebuild(executor: Any) -> int:
+    """Re-index every live row; returns the number of rows indexed."""
+
+    executor.execute(delete(_INDEX))
+    _fill(executor)
+    return executor.execute(select(func.count()).select_from(_INDEX)).scalar_one()
+
+
+# -- keeping it current ------------------------------------------------------
+
+
+def _document(instance: Any, source: _Source) -> Optional[Tuple[str, str]]:
+    if instance.deleted_at is not None:
+        return None
+    body = getattr(instance, source.body)
+    if source is _ARCHIVED:
+        from .archive import decompress_text
+
+        body = decompress_text(body)
+    return getattr(instance, source.title), body or ""
+
+
+@event.listens_for(Session, "after_flush")
+def _record_rows(session: Session, flush_context) -> None:  # noqa: ARG001
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        source = _BY_MODEL.get(type(instance))
+        if source is None:
+            continue
+        pending: Dict[int, Optional[Tuple[str, str]]] = session.info.setdefault(_PENDING, {})
+        key = source.rowid(instance.id)
+        if instance in session.deleted:
+            pending[key] = None
+        elif instance in session.new or any(
+            inspect(instance).attrs[name].history.has_changes() for name in (source.title, source.body, "deleted_at")
+        ):
+            # Progress, check-ins and the like leave the index alone.
+            pending[key] = _document(instance, source)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement(state: ORMExecuteState) -> None:
+    if (state.is_insert or state.is_update or state.is_delete) and not state.execution_options.get(UNCHANGED):
+        source = _BY_TABLE.get(getattr(state.statement.table, "name", None))
+        if source is not None:
+            state.session.info.setdefault(_REINDEX, set()).add(source.kind)
+
+
+@event.listens_for(Session, "before_commit")
+def _update_index(session: Session) -> None:
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop(_PENDING, None)
+    kinds: Set[str] = session.info.pop(_REINDEX, set())
+    for kind in kinds:
+        _reindex(session, _SOURCES[kind])
+    if pending:
+        codes = {_SOURCES[kind].code for kind in kinds}
+        _index_rows(session, {key: document for key, document in pending.items() if key >> _ID_BITS not in codes})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_REINDEX, None)
+
+
+# -- querying ----------------------------------------------------------------
+
+
+def terms(query: str) -> List[str]:
+    """``query``'s words as the index tokenizes them: lower case, accents removed."""
+
+    folded = "".join(char for char in unicodedata.normalize("NFKD", query.lower()) if not unicodedata.combining(char))
+    return list(dict.fromkeys(re.findall(r"[^\W_]+", folded)))[:MAX_TERMS]
+
+
+def _within(word: str, other: str, limit: int) -> bool:
+    """Whether ``word`` is at most ``limit`` edits (transpositions included) from ``other``."""
+
+    if abs(len(word) - len(other)) > limit:
+        return False
+    before: List[int] = []
+    previous = list(range(len(other) + 1))
+    for i, char in enumerate(word, 1):
+        current = [i] + [0] * len(other)
+        for j, other_char in enumerate(other, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other_char))
+            if i > 1 and j > 1 and char == other[j - 2] and word[i - 2] == other_char:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+def _next_prefix(prefix: str) -> str:
+    """The smallest string greater than every string starting with ``prefix``."""
+
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+_NEXT_TERM = text(f"SELECT term FROM {TABLE}_instances WHERE term >= :low AND term < :high LIMIT 1")
+_NEIGHBOURS = text(
+    f"SELECT term FROM {TABLE}_vocab "
+    "WHERE term >= :low AND term < :high AND length(term) BETWEEN :shortest AND :longest"
+)
+
+
+def _alternatives(session: Any, term: str) -> List[str]:
+    """FTS5 query terms ``term`` may stand for; empty if nothing in the index matches."""
+
+    if len(term) == 1:
+        return [f'"{term}"']
+    # Skip from term to term; a bound of "term\0" seeks past all of term's occurrences.
+    completions: List[str] = []
+    params = {"low": term, "high": _next_prefix(term)}
+    while len(completions) <= _MAX_COMPLETIONS:
+        completion = session.execute(_NEXT_TERM, params).scalar()
+        if completion is None:
+            break
+        completions.append(completion)
+        params["low"] = completion + "\0"
+    if len(completions) > _MAX_COMPLETIONS:
+        return [f'"{term}"*']
+    if completions:
+        # FTS5 merges a prefix's whole doclist up front; a few terms are cheaper.
+        return [f'"{completion}"' for completion in completions]
+    if len(term) < _FUZZY_FROM:
+        return []
+    limit = 1 if len(term) < 8 else 2
+    candidates = session.execute(
+        _NEIGHBOURS,
+        {"low": term[0], "high": _next_prefix(term[0]), "shortest": len(term) - limit, "longest": len(term) + limit},
+    ).scalars()
+    return [f'"{candidate}"' for candidate in candidates if _within(term, candidate, limit)]
+
+
+_WINDOW_FLOOR = text(
+    f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH :match AND rowid BETWEEN :low AND :high "
+    "ORDER BY rowid DESC LIMIT 1 OFFSET :offset"
+)
+_RANKED = text(
+    f"SELECT rowid, title, snippet({TABLE}, 1, '', '', '…', 12), bm25({TABLE}, 4.0, 1.0) AS score FROM {TABLE} "
+    f"WHERE {TABLE} MATCH :match AND rowid BETWEEN :low AND :high ORDER BY score LIMIT :limit"
+)
+
+
+def search(session: Any, query: str, kinds: Tuple[str, ...] = KINDS, limit: int = DEFAULT_LIMIT) -> SearchResults:
+    """The best ``limit`` hits of ``kinds`` for ``query``."""
+
+    groups = []
+    for term in terms(query):
+        alternatives = _alternatives(session, term)
+        if not alternatives:
+            return SearchResults(query=query, hits=[])
+        groups.append("(" + " OR ".join(alternatives) + ")")
+    if not groups:
+        return SearchResults(query=query, hits=[])
+    # bm25 scores are comparable across the whole table, so the kinds' best hits merge by score.
+    ranked = []
+    for kind in kinds:
+        source = _SOURCES[kind]
+        params = {"match": " AND ".join(groups), "low": source.low, "high": source.high}
+        floor = session.execute(_WINDOW_FLOOR, {**params, "offset": RANK_WINDOW - 1}).scalar()
+        if floor is not None:
+            params["low"] = floor
+        ranked.extend(session.execute(_RANKED, {**params, "limit": limit}).all())
+    ranked.sort(key=lambda row: row.score)
+    hits = [
+        SearchHit(
+            kind=_BY_CODE[rowid >> _ID_BITS].kind,
+            id=rowid & ((1 << _ID_BITS) - 1),
+            title=title,
+            snippet=snippet,
+            score=round(-score, 4),
+        )
+        for rowid, title, snippet, score in ranked[:limit]
+    ]
+    return SearchResults(query=query, hits=hits)
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchQuery:
+    """``?q=`` and its options, as ``/api/search`` takes them."""
+
+    query: str
+    kinds: Tuple[str, ...] = KINDS
+    limit: int = DEFAULT_LIMIT
+
+    @classmethod
+    def parse(cls, params: Mapping[str, str]) -> "SearchQuery":
+        """Validate ``params``; raises ``SearchError``."""
+
+        unknown = sorted(set(params) - {"q", "kinds", "limit", *PASSTHROUGH})
+        if unknown:
+            raise SearchError(f"Unknown parameter {unknown[0]!r}; allowed: kinds, limit, q")
+        query = params.get("q", "").strip()
+        if not terms(query):
+            raise SearchError("q must contain at least one word")
+        kinds = KINDS
+        if "kinds" in params:
+            kinds = tuple(dict.fromkeys(kind.strip() for kind in params["kinds"].split(",") if kind.strip()))
+            if not kinds or not set(kinds) <= set(KINDS):
+                raise SearchError(f"kinds must list some of {', '.join(KINDS)}")
+        try:
+            limit = int(params.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_LIMIT:
+            raise SearchError(f"limit must be an integer from 1 to {MAX_LIMIT}")
+        return cls(query, kinds, limit)
+
+    def run(self, session: Any) -> SearchResults:
+        return search(session, self.query, self.kinds, self.limit)
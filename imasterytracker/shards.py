@@ -0,0 +1,216 @@
+"""One SQLite file per workspace.
+
+The ``default`` workspace is the application database itself
+(``REFLEX_DB_URL``). Every other workspace lives in its own file under
+``$IMASTERY_SHARD_DIR`` (by default a ``workspaces`` directory next to the
+application database), so each one has its own write lock and writes to
+different workspaces no longer queue behind each other.
+
+Shards are created on first use and brought to the latest schema with the
+project's alembic migrations. ``ShardPool`` keeps the engines of the most
+recently used shards open and disposes the rest: a small writer pool for
+sessions that write, and a read-only pool (``open_reader``) for the rest.
+Nothing here imports Reflex, so the CLI can open and migrate shards
+headlessly.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+
+DEFAULT_WORKSPACE = "default"
+SUFFIX = ".db"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+_WORKSPACE_ID = re.compile(r"[a-z0-9][a-z0-9_-]{0,62}")
+
+Hook = Callable[[str, Engine], None]
+
+
+class ShardError(ValueError):
+    pass
+
+
+def validate_workspace_id(workspace_id: str) -> str:
+    """Workspace ids double as file names: lowercase letters, digits, ``-`` and ``_``."""
+
+    if not _WORKSPACE_ID.fullmatch(workspace_id):
+        raise ShardError(
+            "Workspace id must be 1-63 lowercase letters, digits, '-' or '_', starting with a letter or digit"
+        )
+    return workspace_id
+
+
+def shard_directory(base_url: str) -> str:
+    directory = os.getenv("IMASTERY_SHARD_DIR")
+    if directory:
+        return directory
+    url = make_url(base_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise ShardError("Set IMASTERY_SHARD_DIR when the main database is not a SQLite file")
+    return os.path.join(os.path.dirname(os.path.abspath(url.database)), "workspaces")
+
+
+def shard_url(workspace_id: str, base_url: str) -> str:
+    """Database URL of ``workspace_id``; ``base_url`` is the default workspace's."""
+
+    if workspace_id == DEFAULT_WORKSPACE:
+        return base_url
+    validate_workspace_id(workspace_id)
+    return f"sqlite:///{os.path.join(shard_directory(base_url), workspace_id + SUFFIX)}"
+
+
+def list_shards(base_url: str) -> List[str]:
+    """Ids of the workspaces that have a shard file, sorted."""
+
+    directory = shard_directory(base_url)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name[: -len(SUFFIX)]
+        for name in os.listdir(directory)
+        if name.endswith(SUFFIX) and _WORKSPACE_ID.fullmatch(name[: -len(SUFFIX)])
+    )
+
+
+def migrate(engine: Engine) -> None:
+    """Upgrade ``engine``'s database to the latest migration."""
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+
+def open_shard(url: str, pool_size: int = 5) -> Engine:
+    path = make_url(url).database
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    engine = create_engine(url, pool_size=pool_size, max_overflow=pool_size)
+    with engine.connect() as connection:
+        # Only takes effect while the file is still empty; see ``maintenance``.
+        connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+    migrate(engine)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+    return engine
+
+
+def open_reader(url: str, pool_size: int = 8) -> Engine:
+    """Engine for sessions that only read ``url``'s database.
+
+    SQLite files are opened through a ``mode=ro`` URI: under WAL its readers
+    never wait on a writer, and a stray write fails instead of queueing for
+    the write lock. Other backends get a separate pool on the same URL (point
+    it at a replica to move reads off the primary).
+    """
+
+    parsed = make_url(url)
+    options = {"pool_size": pool_size, "max_overflow": pool_size}
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return create_engine(url, **options)
+    path = quote(os.path.abspath(parsed.database))
+    return create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true", connect_args={"check_same_thread": False}, **options
+    )
+
+
+@dataclasses.dataclass
+class _Shard:
+    workspace_id: str
+    writer: Engine
+    reader: Engine
+
+
+class ShardPool:
+    """LRU of open shards, keyed by URL; each has a writer and a reader engine.
+
+    ``on_open`` runs after a shard is opened and migrated; ``on_close`` runs
+    before an evicted shard's engines are disposed. Sessions still using an
+    evicted engine finish normally; their connections are closed when returned.
+    """
+
+    def __init__(
+        self,
+        max_engines: int = 32,
+        on_open: Optional[Hook] = None,
+        on_close: Optional[Hook] = None,
+        write_pool_size: int = 2,
+        read_pool_size: int = 8,
+    ) -> None:
+        if min(max_engines, write_pool_size, read_pool_size) < 1:
+            raise ValueError("max_engines and the pool sizes must be positive")
+        self.max_engines = max_engines
+        self.write_pool_size = write_pool_size
+        self.read_pool_size = read_pool_size
+        self._on_open = on_open
+        self._on_close = on_close
+        self._engines: "OrderedDict[str, _Shard]" = OrderedDict()
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.evictions = 0
+
+    def engine(self, workspace_id: str, url: str) -> Engine:
+        return self._shard(workspace_id, url).writer
+
+    def reader(self, workspace_id: str, url: str) -> Engine:
+        return self._shard(workspace_id, url).reader
+
+    def _shard(self, workspace_id: str, url: str) -> _Shard:
+        with self._lock:
+            entry = self._engines.get(url)
+            if entry is not None:
+                self._engines.move_to_end(url)
+                return entry
+            opening = self._opening.setdefault(url, threading.Lock())
+        # Migrating a new shard can take a while; only callers of that shard wait.
+        with opening:
+            with self._lock:
+                entry = self._engines.get(url)
+            if entry is not None:
+                return entry
+            writer = open_shard(url, self.write_pool_size)
+            entry = _Shard(workspace_id, writer, open_reader(url, self.read_pool_size))
+            with self._lock:
+                self._engines[url] = entry
+                self._opening.pop(url, None)
+                self.opens += 1
+                evicted = []
+                while len(self._engines) > self.max_engines:
+                    evicted.append(self._engines.popitem(last=False)[1])
+                    self.evictions += 1
+        # The engine is registered first so ``on_open`` can open sessions on it.
+        if self._on_open is not None:
+            self._on_open(workspace_id, writer)
+        for stale in evicted:
+            self._close(stale)
+        return entry
+
+    def close(self) -> None:
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for shard in engines:
+            self._close(shard)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"open": len(self._engines), "max": self.max_engines, "opens": self.opens, "evictions": self.evictions}
+
+    def _close(self, shard: _Shard) -> None:
+        if self._on_close is not None:
+            self._on_close(shard.workspace_id, shard.writer)
+        shard.writer.dispose()
+        shard.reader.dispose()
@@ -0,0 +1,409 @@
+"""Versioned binary workspace snapshots.
+
+Layout (all integers little-endian)::
+
+    header      magic "IMSNAP\\0\\0", u16 version, u16 table count, u32 reserved
+    directory   per table: name[16], u64 rows, u16 column count, 6 pad bytes
+                  per column: name[24], u8 kind, 7 pad bytes, u64 offset, u64 length
+    blocks      one 8-byte aligned block per column
+
+``INT``, ``DATE`` (days since 1970-01-01) and ``DATETIME`` (UTC microseconds
+since the epoch) columns are packed int64 arrays, with ``NULL`` stored as the
+smallest int64. ``STR`` columns are ``rows + 1`` u64 offsets followed by a
+UTF-8 heap. Readers only touch the directory and the columns they ask for, so
+a snapshot opened through ``mmap`` can be inspected without parsing the rest.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import mmap
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, delete, select
+
+from . import archive, tombstones
+from .ingest import InvalidWorkspace
+from .workspace import TABLES, workspace_counts
+from .models import ArchivedJournalEntry, Habit, JournalEntry, LearningStream
+from .schemas import (
+    HabitCreate,
+    HabitRead,
+    JournalEntryImport,
+    JournalEntryRead,
+    LearningStreamCreate,
+    LearningStreamRead,
+    WorkspaceExport,
+    WorkspaceImport,
+)
+
+MAGIC = b"IMSNAP\x00\x00"
+VERSION = 1
+MEDIA_TYPE = "application/vnd.imastery.snapshot"
+
+INT, DATE, DATETIME, STR = 1, 2, 3, 4
+NULL = -(2**63)
+
+_HEADER = struct.Struct("<8sHHI")
+_TABLE = struct.Struct("<16sQH6x")
+_COLUMN = struct.Struct("<24sB7xQQ")
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+_EPOCH_DAY = dt.date(1970, 1, 1).toordinal()
+_MICROSECOND = dt.timedelta(microseconds=1)
+
+# Rows fetched per batch while writing a column.
+BATCH_SIZE = 10_000
+
+SCHEMA: Dict[str, Tuple[Any, Tuple[Tuple[str, int], ...]]] = {
+    "streams": (
+        LearningStream,
+        (
+            ("id", INT),
+            ("name", STR),
+            ("focus", STR),
+            ("milestones_total", INT),
+            ("milestones_completed", INT),
+            ("color", STR),
+            ("created_at", DATETIME),
+        ),
+    ),
+    "habits": (
+        Habit,
+        (
+            ("id", INT),
+            ("name", STR),
+            ("cadence", STR),
+            ("context", STR),
+            ("last_completed_on", DATE),
+            ("created_at", DATETIME),
+        ),
+    ),
+    "journal_entries": (
+        JournalEntry,
+        (
+            ("id", INT),
+            ("title", STR),
+            ("reflection", STR),
+            ("mood", STR),
+            ("created_at", DATETIME),
+        ),
+    ),
+}
+
+_READ_MODELS = {"streams": LearningStreamRead, "habits": HabitRead, "journal_entries": JournalEntryRead}
+_IMPORT_ADAPTERS = {
+    "streams": TypeAdapter(List[LearningStreamCreate]),
+    "habits": TypeAdapter(List[HabitCreate]),
+    "journal_entries": TypeAdapter(List[JournalEntryImport]),
+}
+
+
+class SnapshotError(InvalidWorkspace):
+    pass
+
+
+def is_snapshot(head: bytes) -> bool:
+    return head[: len(MAGIC)] == MAGIC
+
+
+def _int64s(values: Sequence[int]) -> bytes:
+    packed = array("q", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _encode(kind: int, value: Any) -> int:
+    if value is None:
+        return NULL
+    if kind == DATE:
+        return value.toordinal() - _EPOCH_DAY
+    if kind == DATETIME:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=dt.timezone.utc)
+        return (value - _EPOCH) // _MICROSECOND
+    return value
+
+
+def _decode(kind: int, value: int) -> Any:
+    if value == NULL:
+        return None
+    if kind == DATE:
+        return dt.date.fromordinal(value + _EPOCH_DAY)
+    if kind == DATETIME:
+        return _EPOCH + value * _MICROSECOND
+    return value
+
+
+def _pad(handle: BinaryIO) -> None:
+    remainder = handle.tell() % 8
+    if remainder:
+        handle.write(b"\0" * (8 - remainder))
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+
+def write_snapshot(session: Session, handle: BinaryIO) -> Dict[str, int]:
+    """Write the workspace to a seekable binary ``handle``; returns row counts.
+
+    Each column is read in its own ``ORDER BY id`` pass inside the session's
+    transaction, so only one batch of values is held in memory at a time.
+    """
+
+    counts = workspace_counts(session)
+    start = handle.tell()
+    directory_size = _HEADER.size + sum(
+        _TABLE.size + _COLUMN.size * len(columns) for _, columns in SCHEMA.values()
+    )
+    handle.write(b"\0" * directory_size)
+    _pad(handle)
+
+    directory = [_HEADER.pack(MAGIC, VERSION, len(SCHEMA), 0)]
+    for key, (model, columns) in SCHEMA.items():
+        rows = counts[key]
+        directory.append(_TABLE.pack(key.encode(), rows, len(columns)))
+        for name, kind in columns:
+            offset = handle.tell()
+            if model is JournalEntry:
+                # Archived entries are part of the journal.
+                values = archive.iter_column(session, name, BATCH_SIZE)
+            else:
+                query = select(getattr(model, name)).order_by(model.id).execution_options(yield_per=BATCH_SIZE)
+                values = session.exec(query)
+            if kind == STR:
+                _write_strings(handle, values, rows)
+            else:
+                batch: List[int] = []
+                for value in values:
+                    batch.append(_encode(kind, value))
+                    if len(batch) == BATCH_SIZE:
+                        handle.write(_int64s(batch))
+                        batch = []
+                handle.write(_int64s(batch))
+            length = handle.tell() - offset
+            _pad(handle)
+            directory.append(_COLUMN.pack(name.encode(), kind, offset - start, length))
+
+    end = handle.tell()
+    handle.seek(start)
+    handle.write(b"".join(directory))
+    handle.seek(end)
+    return counts
+
+
+def _write_strings(handle: BinaryIO, values: Iterator[str], rows: int) -> None:
+    # Reserve the offsets, stream the heap, then come back for the offsets.
+    offsets_at = handle.tell()
+    handle.seek(offsets_at + 8 * (rows + 1))
+    offsets = array("q", [0])
+    position = 0
+    pieces: List[bytes] = []
+    for value in values:
+        encoded = (value or "").encode()
+        position += len(encoded)
+        offsets.append(position)
+        pieces.append(encoded)
+        if len(pieces) == BATCH_SIZE:
+            handle.write(b"".join(pieces))
+            pieces = []
+    handle.write(b"".join(pieces))
+    if len(offsets) != rows + 1:
+        raise SnapshotError("Table changed while the snapshot was being written")
+    end = handle.tell()
+    handle.seek(offsets_at)
+    handle.write(_int64s(offsets))
+    handle.seek(end)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+
+class Column(NamedTuple):
+    kind: int
+    offset: int
+    length: int
+
+
+class Table(NamedTuple):
+    rows: int
+    columns: Dict[str, Column]
+
+
+class Snapshot:
+    """Random access to a snapshot held in ``bytes`` or an ``mmap``."""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]) -> None:
+        self._view = memoryview(buffer)
+        if len(self._view) < _HEADER.size:
+            raise SnapshotError("File is too short to be a snapshot")
+        magic, self.version, table_count, _ = _HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Not an iMastery snapshot")
+        if self.version > VERSION:
+            raise SnapshotError(f"Snapshot version {self.version} is newer than supported ({VERSION})")
+
+        self.tables: Dict[str, Table] = {}
+        position = _HEADER.size
+        for _ in range(table_count):
+            name, rows, column_count = _TABLE.unpack_from(self._view, position)
+            position += _TABLE.size
+            columns = {}
+            for _ in range(column_count):
+                column, kind, offset, length = _COLUMN.unpack_from(self._view, position)
+                position += _COLUMN.size
+                if offset + length > len(self._view):
+                    raise SnapshotError("Snapshot is truncated")
+                columns[column.rstrip(b"\0").decode()] = Column(kind, offset, length)
+            self.tables[name.rstrip(b"\0").decode()] = Table(rows, columns)
+
+    @classmethod
+    @contextmanager
+    def open(cls, path: str) -> Iterator["Snapshot"]:
+        with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            snapshot = cls(mapped)
+            try:
+                yield snapshot
+            finally:
+                snapshot.release()
+
+    def release(self) -> None:
+        self._view.release()
+
+    def _int64s(self, offset: int, count: int) -> Sequence[int]:
+        view = self._view[offset : offset + 8 * count]
+        if sys.byteorder == "little":
+            return view.cast("q")
+        values = array("q", view)
+        values.byteswap()
+        return values
+
+    def column(self, table: str, name: str) -> List[Any]:
+        """Decode one column; other columns and tables are never read."""
+
+        info = self.tables[table]
+        column = info.columns[name]
+        if column.kind == STR:
+            offsets = self._int64s(column.offset, info.rows + 1)
+            heap = column.offset + 8 * (info.rows + 1)
+            data = bytes(self._view[heap : column.offset + column.length])
+            return [data[offsets[index] : offsets[index + 1]].decode() for index in range(info.rows)]
+        values = self._int64s(column.offset, info.rows)
+        if column.kind == INT:
+            return [None if value == NULL else value for value in values]
+        return [_decode(column.kind, value) for value in values]
+
+    def rows(self, table: str) -> Iterator[Dict[str, Any]]:
+        names = list(self.tables[table].columns)
+        columns = [self.column(table, name) for name in names]
+        for values in zip(*columns):
+            yield dict(zip(names, values))
+
+    def to_export(self) -> WorkspaceExport:
+        return WorkspaceExport(
+            **{
+                key: [read_model.model_construct(**row) for row in self.rows(key)]
+                for key, read_model in _READ_MODELS.items()
+            }
+        )
+
+    def to_import(
+        self,
+        on_progress: Optional[Callable[[int], None]] = None,
+        on_total: Optional[Callable[[int], None]] = None,
+    ) -> WorkspaceImport:
+        """Validate the rows as an import, with the callbacks of ``parse_workspace``."""
+
+        missing = [key for key in _IMPORT_ADAPTERS if key not in self.tables]
+        if missing:
+            raise SnapshotError(f"Snapshot has no {', '.join(missing)} table")
+        if on_total is not None:
+            on_total(sum(self.tables[key].rows for key in _IMPORT_ADAPTERS))
+        validated: Dict[str, list] = {}
+        for key, adapter in _IMPORT_ADAPTERS.items():
+            rows = list(self.rows(key))
+            validated[key] = []
+            for start in range(0, len(rows), BATCH_SIZE):
+                batch = rows[start : start + BATCH_SIZE]
+                try:
+                    validated[key].extend(adapter.validate_python(batch))
+                except ValidationError as error:
+                    first = error.errors()[0]
+                    index, *field = first.get("loc", (0,))
+                    location = ".".join(str(part) for part in (key, start + index, *field))
+                    raise SnapshotError(f"Invalid snapshot at {location}: {first.get('msg', 'Invalid data')}") from None
+                if on_progress is not None:
+                    on_progress(len(batch))
+        return WorkspaceImport.model_construct(**validated)
+
+
+def restore_snapshot(
+    session: Session, opened: Snapshot, on_progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, int]:
+    """Replace the workspace with the snapshot's rows, ids and timestamps included.
+
+    Columns go straight into Core ``INSERT`` statements instead of ORM objects,
+    which is what makes a snapshot restore fast. Validate with
+    :meth:`Snapshot.to_import` first; nothing here checks the values.
+
+    As with ``replace_workspace``, the old rows are tombstoned rather than
+    removed, so other processes and sync clients see them go. A snapshot row
+    whose id is still taken (live or tombstoned) overwrites that row and
+    brings it back, so the id reads as updated rather than deleted; an
+    archived entry with a restored id is replaced by the restored one.
+    """
+
+    for model in (*TABLES.values(), ArchivedJournalEntry):
+        tombstones.soft_delete_where(session, model)
+
+    counts: Dict[str, int] = {}
+    for key, (model, columns) in SCHEMA.items():
+        table = opened.tables.get(key)
+        if table is None:
+            raise SnapshotError(f"Snapshot has no {key} table")
+        names = [name for name, _ in columns if name in table.columns]
+        values = [opened.column(key, name) for name in names]
+        upsert = sqlite_insert(model)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[model.id],
+            set_={**{name: upsert.excluded[name] for name in names if name != "id"}, "deleted_at": None},
+        )
+        for start in range(0, table.rows, BATCH_SIZE):
+            batch = [
+                dict(zip(names, row))
+                for row in zip(*(column[start : start + BATCH_SIZE] for column in values))
+            ]
+            session.exec(upsert, params=batch)
+            if model is JournalEntry:
+                # Restored entries go to the live table; an archived copy of the same id would stop them from
+                # ever being archived again.
+                ids = [row["id"] for row in batch]
+                session.exec(delete(ArchivedJournalEntry).where(ArchivedJournalEntry.id.in_(ids)))
+            if on_progress is not None:
+                on_progress(len(batch))
+        counts[key] = table.rows
+    session.commit()
+    return counts
+
+
+def read_workspace(
+    raw: Union[bytes, mmap.mmap],
+    on_progress: Optional[Callable[[int], None]] = None,
+    on_total: Optional[Callable[[int], None]] = None,
+) -> WorkspaceImport:
+    snapshot = Snapshot(raw)
+    try:
+        return snapshot.to_import(on_progress=on_progress, on_total=on_total)
+    finally:
+        snapshot.release()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+
+class StartupProfiler:
+    """Accumulate wall time per worker startup phase.
+
+    ``mark`` charges the time since the previous mark to a phase, ``phase``
+    and ``timed`` wrap a block or a function that may run later (page
+    evaluation, lifespan tasks). The origin is the import of this module,
+    which ``app.py`` imports first.
+    """
+
+    def __init__(self) -> None:
+        self._origin = time.perf_counter()
+        self._last = self._origin
+        self.phases: Dict[str, float] = {}
+
+    def _charge(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self._charge(name, now - self._last)
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self._charge(name, self._last - started)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        def decorator(func: F) -> F:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorator
+
+    def report(self) -> Dict[str, float]:
+        timings = {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        timings["ready"] = round((time.perf_counter() - self._origin) * 1000, 1)
+        return timings
+
+    def log_ready(self) -> Dict[str, float]:
+        timings = self.report()
+        summary = " ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items())
+        logger.info("Worker startup: %s", summary)
+        if os.getenv("IMASTERY_STARTUP_PROFILE") == "1":
+            print(f"Worker startup: {summary}", file=sys.stderr)
+        return timings
+
+
+profiler = StartupProfiler()
@@ -1,73 +1,36 @@
 from __future__ import annotations
 
 import datetime as dt
+import functools
 import os
-import random
-from typing import List
+from typing import Callable, Iterable, List, TypeVar
 
 import reflex as rx
 from pydantic import ValidationError
-from sqlmodel import Field, select
+from reflex.middleware import Middleware
+from reflex.utils import prerequisites
+from sqlmodel import Session, SQLModel, select
 
 from rxconfig import config as app_config
 
+from . import analytics, changes, db, live, projections, search, shards, summary, tenancy, tombstones, workspace
+from .analytics import MoodShare, WeekRow
+from .models import COLOR_PALETTE, Habit, JournalEntry, LearningStream, random_color  # noqa: F401
+from .projections import HabitCard, JournalCard, StreamCard
 from .schemas import (
     HabitCreate,
-    HabitRead,
     JournalEntryCreate,
-    JournalEntryRead,
     LearningStreamCreate,
-    LearningStreamRead,
+    SearchHit,
     WorkspaceExport,
     WorkspaceImport,
 )
+from .var_cache import memo, table_var
 
+T = TypeVar("T")
 
-COLOR_PALETTE = [
-    "#6366F1",
-    "#22C55E",
-    "#F97316",
-    "#EC4899",
-    "#0EA5E9",
-    "#FACC15",
-]
-
-
-def _utcnow() -> dt.datetime:
-    return dt.datetime.now(dt.timezone.utc)
-
-
-class LearningStream(rx.Model, table=True):
-    """A deliberate practice focus area."""
-
-    id: int | None = Field(default=None, primary_key=True)
-    name: str
-    focus: str = ""
-    milestones_total: int = 1
-    milestones_completed: int = 0
-    color: str = "#6366F1"
-    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
-
-
-class Habit(rx.Model, table=True):
-    """A daily or weekly ritual that supports growth."""
-
-    id: int | None = Field(default=None, primary_key=True)
-    name: str
-    cadence: str = "Daily"
-    context: str = ""
-    last_completed_on: dt.date | None = Field(default=None, nullable=True)
-    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
-
-
-class JournalEntry(rx.Model, table=True):
-    """Short reflections documenting insights."""
-
-    id: int | None = Field(default=None, primary_key=True)
-    title: str
-    reflection: str
-    mood: str = "Curious"
-    created_at: dt.datetime = Field(default_factory=_utcnow, nullable=False)
+# Hits the dashboard's search box shows.
+SEARCH_HITS = 8
 
 
 class DashboardState(rx.State):
@@ -90,32 +53,51 @@ class DashboardState(rx.State):
     journal_reflection: str = ""
     journal_mood: str = "Curious"
 
+    search_query: str = ""
+
     toast_message: str = ""
 
-    async def init(self):
-        await super().init()
-        LearningStream.create_all()
-        Habit.create_all()
-        JournalEntry.create_all()
-        self._seed_defaults()
+    # Write versions of the tables behind the DB-backed vars, copied from the
+    # change tracker by ``_refresh``. Each var depends on the versions of the
+    # tables it reads, so a change only recomputes (and resends) that section.
+    _streams_version: int = 0
+    _habits_version: int = 0
+    _journal_entries_version: int = 0
+    # The day the "today"/"this week" vars were computed for. Nothing writes
+    # when the date changes, so ``ChangeSync`` and ``watch_changes`` move it.
+    _today: dt.date = dt.date.min
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
     @staticmethod
     def _random_color() -> str:
-        return random.choice(COLOR_PALETTE)
+        return random_color()
 
     @staticmethod
-    def _today() -> dt.date:
+    def _current_date() -> dt.date:
         return dt.date.today()
 
-    def _seed_defaults(self) -> None:
+    def _advance_day(self) -> None:
+        today = self._current_date()
+        if self._today != today:
+            self._today = today
+
+    def _refresh(self, tables: Iterable[str] = workspace.TABLES) -> None:
+        self._advance_day()
+        versions = changes.tracker_for(self.workspace_id).versions()
+        for key in tables:
+            name = f"_{key}_version"
+            if getattr(self, name) != versions[key]:
+                setattr(self, name, versions[key])
+
+    @classmethod
+    def _seed_defaults(cls) -> None:
         if app_config.env == "prod" or os.getenv("IMASTERY_SKIP_SEED") == "1":
             return
 
         with rx.session() as session:
-            if not session.exec(select(LearningStream)).first():
+            if not session.exec(select(LearningStream).limit(1)).first():
                 session.add_all(
                     [
                         LearningStream(
@@ -134,14 +116,14 @@ class DashboardState(rx.State):
                         ),
                     ]
                 )
-            if not session.exec(select(Habit)).first():
+            if not session.exec(select(Habit).limit(1)).first():
                 session.add_all(
                     [
                         Habit(
                             name="Deep Work Block",
                             cadence="Daily",
                             context="90 minutes of focused creation before meetings.",
-                            last_completed_on=self._today(),
+                            last_completed_on=cls._current_date(),
                         ),
                         Habit(
                             name="Knowledge Capture",
@@ -150,7 +132,7 @@ class DashboardState(rx.State):
                         ),
                     ]
                 )
-            if not session.exec(select(JournalEntry)).first():
+            if not session.exec(select(JournalEntry).limit(1)).first():
                 session.add_all(
                     [
                         JournalEntry(
@@ -170,104 +152,116 @@ class DashboardState(rx.State):
     # ------------------------------------------------------------------
     # Database accessors
     # ------------------------------------------------------------------
-    def _get_streams(self) -> List[LearningStream]:
-        with rx.session() as session:
-            return list(
-                session.exec(
-                    select(LearningStream).order_by(LearningStream.created_at.desc())
-                )
-            )
+    @rx.var(initial_value=shards.DEFAULT_WORKSPACE)
+    def workspace_id(self) -> str:
+        """The workspace in the page's ``?workspace=`` parameter; invalid ids fall back to the default."""
 
-    def _get_habits(self) -> List[Habit]:
-        with rx.session() as session:
-            return list(
-                session.exec(select(Habit).order_by(Habit.created_at.desc()))
-            )
+        requested = self.router.url.query_parameters.get("workspace") or shards.DEFAULT_WORKSPACE
+        try:
+            return shards.validate_workspace_id(requested)
+        except shards.ShardError:
+            return shards.DEFAULT_WORKSPACE
+
+    # Shared by every var (and session) until the table is written again.
+    def _get_streams(self) -> List[StreamCard]:
+        return memo.get(
+            "stream_cards", ("streams",), lambda: _query(self.workspace_id, projections.stream_cards), self.workspace_id
+        )
 
-    def _get_journals(self) -> List[JournalEntry]:
-        with rx.session() as session:
-            return list(
-                session.exec(
-                    select(JournalEntry).order_by(JournalEntry.created_at.desc())
-                )
-            )
+    def _get_habits(self) -> List[HabitCard]:
+        return memo.get(
+            "habit_cards", ("habits",), lambda: _query(self.workspace_id, projections.habit_cards), self.workspace_id
+        )
+
+    def _get_journals(self) -> List[JournalCard]:
+        return memo.get(
+            "journal_cards",
+            ("journal_entries",),
+            lambda: _query(self.workspace_id, projections.journal_cards),
+            self.workspace_id,
+        )
 
-    @rx.var
-    def streams(self) -> List[LearningStream]:
+    # DB-backed vars declare their empty-workspace value as ``initial_value``
+    # so compiling the app never loads the tables; sessions compute the rest,
+    # again whenever ``_refresh`` moves the version of a table they read.
+    @table_var("streams", initial_value=[])
+    def streams(self) -> List[StreamCard]:
         return self._get_streams()
 
-    @rx.var
-    def habits(self) -> List[Habit]:
+    @table_var("habits", initial_value=[])
+    def habits(self) -> List[HabitCard]:
         return self._get_habits()
 
-    @rx.var
-    def journal_entries(self) -> List[JournalEntry]:
+    @table_var("journal_entries", initial_value=[])
+    def journal_entries(self) -> List[JournalCard]:
         return self._get_journals()
 
     # ------------------------------------------------------------------
     # Metrics
     # ------------------------------------------------------------------
-    @rx.var
+    @table_var("streams", initial_value=0)
     def total_streams(self) -> int:
         return len(self._get_streams())
 
-    @rx.var
+    @table_var("streams", initial_value=0)
     def milestone_completion(self) -> int:
         streams = self._get_streams()
-        total = sum(stream.milestones_total for stream in streams)
-        completed = sum(stream.milestones_completed for stream in streams)
-        if total == 0:
-            return 0
-        return round((completed / total) * 100)
+        return summary.milestone_completion(
+            sum(stream.milestones_completed for stream in streams), sum(stream.milestones_total for stream in streams)
+        )
 
-    @rx.var
+    @table_var("habits", initial_value=0)
     def total_habits(self) -> int:
         return len(self._get_habits())
 
-    @rx.var
+    @table_var("streams", initial_value="00/00")
     def milestone_copy(self) -> str:
         streams = self._get_streams()
-        completed = sum(stream.milestones_completed for stream in streams)
-        total = sum(stream.milestones_total for stream in streams)
-        return f"{completed:02}/{total:02}" if total else "00/00"
+        return summary.milestone_copy(
+            sum(stream.milestones_completed for stream in streams), sum(stream.milestones_total for stream in streams)
+        )
 
-    @rx.var
+    @table_var("habits", daily=True, initial_value=0)
     def habits_completed_today(self) -> int:
-        today = self._today()
+        today = self._today
         return sum(1 for habit in self._get_habits() if habit.last_completed_on == today)
 
-    @rx.var
+    @rx.var(initial_value="Secured milestones 00/00")
     def milestone_detail(self) -> str:
         return f"Secured milestones {self.milestone_copy}"
 
-    @rx.var
+    @table_var("journal_entries", initial_value=0)
     def journal_count(self) -> int:
-        return len(self._get_journals())
+        # Archived entries still count; the cards only list the live table.
+        return memo.get(
+            "journal_count",
+            ("journal_entries",),
+            lambda: _query(self.workspace_id, workspace.workspace_counts)["journal_entries"],
+            self.workspace_id,
+        )
 
-    @rx.var
+    @table_var("journal_entries", daily=True, initial_value=0)
     def reflections_this_week(self) -> int:
-        seven_days_ago = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=7)
+        seven_days_ago = summary.week_ago()
         return sum(1 for entry in self._get_journals() if entry.created_at >= seven_days_ago)
 
-    @rx.var
+    @table_var("habits", daily=True, initial_value="Create a ritual to build your execution rhythm.")
     def habit_consistency_copy(self) -> str:
         habits = self._get_habits()
         if not habits:
             return "Create a ritual to build your execution rhythm."
-        completed = sum(1 for habit in habits if habit.last_completed_on == self._today())
+        completed = sum(1 for habit in habits if habit.last_completed_on == self._today)
         return f"{completed} of {len(habits)} rituals logged today"
 
-    @rx.var
+    @table_var("streams", initial_value=summary.NO_STREAMS_LEFT)
     def next_stream_message(self) -> str:
-        streams = sorted(self._get_streams(), key=lambda stream: stream.created_at)
-        for stream in streams:
+        # Oldest first.
+        for stream in reversed(self._get_streams()):
             if stream.milestones_completed < stream.milestones_total:
-                remaining = stream.milestones_total - stream.milestones_completed
-                label = "milestone" if remaining == 1 else "milestones"
-                return f"{stream.name}: {remaining} {label} to go"
-        return "All learning streams are fully complete."
+                return summary.next_stream_message(stream.name, stream.milestones_total - stream.milestones_completed)
+        return summary.next_stream_message(None, 0)
 
-    @rx.var
+    @rx.var(initial_value="Set your first milestone to start tracking mastery.")
     def milestone_trend_message(self) -> str:
         completion = self.milestone_completion
         if completion >= 75:
@@ -278,14 +272,12 @@ class DashboardState(rx.State):
             return "Early progress logged—lean into the next milestone."
         return "Set your first milestone to start tracking mastery."
 
-    @rx.var
+    @table_var("journal_entries", initial_value=summary.NO_REFLECTIONS)
     def latest_journal_title(self) -> str:
         entries = self._get_journals()
-        if not entries:
-            return "No reflections yet"
-        return entries[0].title
+        return summary.latest_journal_title(entries[0].title if entries else None)
 
-    @rx.var
+    @table_var("journal_entries", initial_value="Capture your latest insight to build your mastery journal.")
     def latest_journal_preview(self) -> str:
         entries = self._get_journals()
         if not entries:
@@ -295,7 +287,39 @@ class DashboardState(rx.State):
             return text
         return text[:137].rstrip() + "..."
 
-    @rx.var
+    # The analytics panel reads the rollups only, never the journal itself.
+    def _get_analytics(self) -> tuple[List[WeekRow], List[MoodShare]]:
+        today = self._today
+        return memo.get(
+            "journal_analytics",
+            ("journal_entries",),
+            lambda: _query(self.workspace_id, lambda session: analytics.recent_weeks(session, today)),
+            self.workspace_id,
+            today,
+        )
+
+    @table_var("journal_entries", daily=True, initial_value=[])
+    def weekly_reflections(self) -> List[WeekRow]:
+        return self._get_analytics()[0]
+
+    @table_var("journal_entries", daily=True, initial_value=[])
+    def mood_shares(self) -> List[MoodShare]:
+        return self._get_analytics()[1]
+
+    # Hits follow the query and every table they can come from; the index is
+    # fast enough to query on each keystroke, so nothing is memoized.
+    @rx.var(
+        deps=["search_query", "workspace_id", *(f"_{table}_version" for table in workspace.TABLES)],
+        auto_deps=False,
+        initial_value=[],
+    )
+    def search_hits(self) -> List[SearchHit]:
+        query = self.search_query
+        if not search.terms(query):
+            return []
+        return _query(self.workspace_id, lambda session: search.search(session, query, limit=SEARCH_HITS)).hits
+
+    @table_var("streams", initial_value=0)
     def streams_active_count(self) -> int:
         return sum(1 for stream in self._get_streams() if stream.milestones_completed < stream.milestones_total)
 
@@ -324,39 +348,32 @@ class DashboardState(rx.State):
             self.toast_message = self._format_validation_error(error)
             return
 
-        with rx.session() as session:
-            stream = LearningStream(
-                name=payload.name,
-                focus=payload.focus,
-                milestones_total=payload.milestones_total,
-                milestones_completed=payload.milestones_completed,
-                color=payload.color or self._random_color(),
-            )
-            session.add(stream)
+        with tenancy.session(self.workspace_id) as session:
+            session.add(workspace.build_stream(payload))
             session.commit()
+        self._refresh(["streams"])
         self.close_stream_modal()
         self.toast_message = "New learning stream added."
 
     def update_stream_progress(self, stream_id: int, delta: int):
-        with rx.session() as session:
+        with tenancy.session(self.workspace_id) as session:
             stream = session.get(LearningStream, stream_id)
             if not stream:
                 return
-            stream.milestones_completed = min(
-                stream.milestones_total,
-                max(0, stream.milestones_completed + delta),
-            )
+            workspace.apply_progress(stream, delta)
             session.add(stream)
             session.commit()
+        self._refresh(["streams"])
         self.toast_message = "Progress updated."
 
     def remove_stream(self, stream_id: int):
-        with rx.session() as session:
+        with tenancy.session(self.workspace_id) as session:
             stream = session.get(LearningStream, stream_id)
             if not stream:
                 return
-            session.delete(stream)
+            tombstones.soft_delete(session, stream)
             session.commit()
+        self._refresh(["streams"])
         self.toast_message = "Stream removed."
 
     # ------------------------------------------------------------------
@@ -382,20 +399,16 @@ class DashboardState(rx.State):
             self.toast_message = self._format_validation_error(error)
             return
 
-        with rx.session() as session:
-            habit = Habit(
-                name=payload.name,
-                cadence=payload.cadence or "Daily",
-                context=payload.context,
-            )
-            session.add(habit)
+        with tenancy.session(self.workspace_id) as session:
+            session.add(workspace.build_habit(payload))
             session.commit()
+        self._refresh(["habits"])
         self.close_habit_modal()
         self.toast_message = "Habit added."
 
     def toggle_habit(self, habit_id: int):
-        today = self._today()
-        with rx.session() as session:
+        today = self._current_date()
+        with tenancy.session(self.workspace_id) as session:
             habit = session.get(Habit, habit_id)
             if not habit:
                 return
@@ -405,15 +418,17 @@ class DashboardState(rx.State):
                 habit.last_completed_on = today
             session.add(habit)
             session.commit()
+        self._refresh(["habits"])
         self.toast_message = "Habit check-in updated."
 
     def remove_habit(self, habit_id: int):
-        with rx.session() as session:
+        with tenancy.session(self.workspace_id) as session:
             habit = session.get(Habit, habit_id)
             if not habit:
                 return
-            session.delete(habit)
+            tombstones.soft_delete(session, habit)
             session.commit()
+        self._refresh(["habits"])
         self.toast_message = "Habit removed."
 
     # ------------------------------------------------------------------
@@ -439,18 +454,14 @@ class DashboardState(rx.State):
             self.toast_message = self._format_validation_error(error)
             return
 
-        with rx.session() as session:
-            entry = JournalEntry(
-                title=payload.title,
-                reflection=payload.reflection,
-                mood=payload.mood or "Curious",
-            )
-            session.add(entry)
+        with tenancy.session(self.workspace_id) as session:
+            session.add(workspace.build_journal_entry(payload))
             session.commit()
+        self._refresh(["journal_entries"])
         self.close_journal_modal()
         self.toast_message = "Reflection captured."
 
-    def import_workspace(self, data: WorkspaceImport | dict):
+    def import_workspace(self, data: WorkspaceImport | dict, mode: str = "replace"):
         try:
             payload = (
                 data if isinstance(data, WorkspaceImport) else WorkspaceImport.model_validate(data)
@@ -459,79 +470,104 @@ class DashboardState(rx.State):
             self.toast_message = self._format_validation_error(error)
             return
 
+        if mode == "merge":
+            with tenancy.session(self.workspace_id) as session:
+                changes = workspace.merge_workspace(session, payload)
+            self._refresh()
+            self.toast_message = f"Workspace merged: {workspace.format_changes(changes)}."
+            return
+
         self._replace_workspace(payload)
+        self._refresh()
         self.toast_message = "Workspace imported successfully."
 
     def _replace_workspace(self, payload: WorkspaceImport) -> None:
-        with rx.session() as session:
-            for model in (LearningStream, Habit, JournalEntry):
-                for record in session.exec(select(model)):
-                    session.delete(record)
-            session.commit()
-
-            for stream in payload.streams:
-                session.add(
-                    LearningStream(
-                        name=stream.name,
-                        focus=stream.focus,
-                        milestones_total=stream.milestones_total,
-                        milestones_completed=stream.milestones_completed,
-                        color=stream.color or self._random_color(),
-                    )
-                )
-            for habit in payload.habits:
-                session.add(
-                    Habit(
-                        name=habit.name,
-                        cadence=habit.cadence or "Daily",
-                        context=habit.context,
-                    )
-                )
-            for entry in payload.journal_entries:
-                session.add(
-                    JournalEntry(
-                        title=entry.title,
-                        reflection=entry.reflection,
-                        mood=entry.mood or "Curious",
-                    )
-                )
-            session.commit()
+        with tenancy.session(self.workspace_id) as session:
+            workspace.replace_workspace(session, payload)
 
     def export_workspace(self) -> WorkspaceExport:
-        with rx.session() as session:
-            streams = [
-                LearningStreamRead.model_validate(stream, from_attributes=True)
-                for stream in session.exec(select(LearningStream))
-            ]
-            habits = [
-                HabitRead.model_validate(habit, from_attributes=True)
-                for habit in session.exec(select(Habit))
-            ]
-            journal_entries = [
-                JournalEntryRead.model_validate(entry, from_attributes=True)
-                for entry in session.exec(select(JournalEntry))
-            ]
-
-        return WorkspaceExport(
-            streams=streams,
-            habits=habits,
-            journal_entries=journal_entries,
-        )
+        with tenancy.read_session(self.workspace_id) as session:
+            return workspace.export_workspace(session)
 
     def remove_journal_entry(self, journal_id: int):
-        with rx.session() as session:
+        with tenancy.session(self.workspace_id) as session:
             entry = session.get(JournalEntry, journal_id)
             if not entry:
                 return
-            session.delete(entry)
+            tombstones.soft_delete(session, entry)
             session.commit()
+        self._refresh(["journal_entries"])
         self.toast_message = "Entry removed."
 
     def clear_toast(self):
         self.toast_message = ""
 
+    # ------------------------------------------------------------------
+    # Live updates
+    # ------------------------------------------------------------------
+    @rx.event(background=True)
+    async def watch_changes(self):
+        """Refresh the sections other clients write to while this tab stays open."""
+
+        token = self.router.session.client_token
+        subscription = live.hub.subscribe(token, self.workspace_id)
+        try:
+            async with self:
+                self._refresh()
+            while (tables := await subscription.next(timeout=_IDLE_CHECK_SECONDS)) is not None:
+                if not _connected(token):
+                    break
+                if tables:
+                    async with self:
+                        self._refresh(tables)
+                elif self._today != self._current_date():
+                    async with self:
+                        self._advance_day()
+        finally:
+            subscription.close()
+
     def _format_validation_error(self, error: ValidationError) -> str:
         first = error.errors()[0]
         field = first.get("loc", ["value"])[0]
         msg = first.get("msg", "Invalid data")
         return f"{str(field).replace('_', ' ').capitalize()}: {msg}."
+
+
+def _query(workspace_id: str, load: Callable[[Session], T]) -> T:
+    with tenancy.read_session(workspace_id) as session:
+        return load(session)
+
+
+# How often an idle watcher checks that its tab is still connected.
+_IDLE_CHECK_SECONDS = 60.0
+
+
+@functools.lru_cache(maxsize=None)
+def _app() -> rx.App:
+    return prerequisites.get_and_validate_app().app
+
+
+def _connected(token: str) -> bool:
+    namespace = _app().event_namespace
+    return namespace is None or token in namespace.token_to_sid
+
+
+def prepare_database() -> None:
+    """Create missing tables and seed the demo workspace once per worker."""
+
+    engine = rx.Model.get_db_engine()
+    db.enable_incremental_vacuum(engine)
+    SQLModel.metadata.create_all(engine)
+    db.enable_wal(engine)
+    DashboardState._seed_defaults()
+    changes.tracker.attach(engine)
+
+
+class ChangeSync(Middleware):
+    """Pick up writes other worker processes made to the tab's workspace before each state event."""
+
+    async def preprocess(self, app, state, event):  # noqa: ARG002
+        dashboard = await state.get_state(DashboardState)
+        changes.tracker_for(dashboard.workspace_id).sync()
+        dashboard._advance_day()
+        return None
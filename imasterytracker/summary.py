@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models import Habit, JournalEntry, LearningStream
+
+# The headline numbers of the dashboard, for ``/api/summary``.
+#
+# ``DashboardState`` derives them from the card lists it already holds;
+# ``load`` computes the same aggregates in SQL, as scalar subqueries of a single
+# statement, for clients that only want the numbers. Both go through the
+# formatting helpers below, so the two can't drift apart. Tombstones are left
+# out by ``tombstones``' query hook, as everywhere else.
+
+NO_STREAMS_LEFT = "All learning streams are fully complete."
+NO_REFLECTIONS = "No reflections yet"
+
+
+def milestone_completion(completed: int, total: int) -> int:
+    return round((completed / total) * 100) if total else 0
+
+
+def milestone_copy(completed: int, total: int) -> str:
+    return f"{completed:02}/{total:02}" if total else "00/00"
+
+
+def next_stream_message(name: Optional[str], remaining: int) -> str:
+    """For the oldest stream with milestones left, if any."""
+
+    if name is None:
+        return NO_STREAMS_LEFT
+    label = "milestone" if remaining == 1 else "milestones"
+    return f"{name}: {remaining} {label} to go"
+
+
+def latest_journal_title(title: Optional[str]) -> str:
+    return NO_REFLECTIONS if title is None else title
+
+
+def week_ago(now: Optional[dt.datetime] = None) -> dt.datetime:
+    return (now or dt.datetime.now(dt.timezone.utc)) - dt.timedelta(days=7)
+
+
+@dataclasses.dataclass(frozen=True)
+class Summary:
+    milestone_completion: int
+    milestone_copy: str
+    habits_completed_today: int
+    reflections_this_week: int
+    next_stream_message: str
+    latest_journal_title: str
+
+
+def load(session: Session, today: dt.date, now: Optional[dt.datetime] = None) -> Summary:
+    """Every figure in one round trip; ``today`` is the dashboard's local date."""
+
+    unfinished = (
+        select(LearningStream.name, LearningStream.milestones_total - LearningStream.milestones_completed)
+        .where(LearningStream.milestones_completed < LearningStream.milestones_total)
+        .order_by(LearningStream.created_at, LearningStream.id)
+        .limit(1)
+        .subquery()
+    )
+    latest = select(JournalEntry.title).order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc()).limit(1)
+    row = session.execute(
+        select(
+            select(func.coalesce(func.sum(LearningStream.milestones_completed), 0)).scalar_subquery(),
+            select(func.coalesce(func.sum(LearningStream.milestones_total), 0)).scalar_subquery(),
+            select(func.count(Habit.id)).where(Habit.last_completed_on == today).scalar_subquery(),
+            select(func.count(JournalEntry.id)).where(JournalEntry.created_at >= week_ago(now)).scalar_subquery(),
+            select(unfinished.c[0]).scalar_subquery(),
+            select(unfinished.c[1]).scalar_subquery(),
+            latest.scalar_subquery(),
+        )
+    ).one()
+    completed, total, habits_today, reflections, next_name, remaining, latest_title = row
+    return Summary(
+        milestone_completion=milestone_completion(completed, total),
+        milestone_copy=milestone_copy(completed, total),
+        habits_completed_today=habits_today,
+        reflections_this_week=reflections,
+        next_stream_message=next_stream_message(next_name, remaining or 0),
+        latest_journal_title=latest_journal_title(latest_title),
+    )
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import reflex as rx
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from . import changes, db, shards
+from .shards import DEFAULT_WORKSPACE
+
+# Which workspace the current API request or job works on.
+#
+# ``api.WorkspaceMiddleware`` sets it from the ``X-Workspace`` header for the
+# duration of a request and ``JobManager`` carries it onto its worker threads;
+# ``DashboardState`` passes its own ``workspace_id`` explicitly instead.
+# ``session()`` then opens the right database: the app database (through
+# ``rx.session``) for the default workspace, a pooled shard engine otherwise.
+#
+# Sessions that only read use ``read_session()`` instead, which draws from a
+# separate read-only pool per database, so list endpoints, exports and the
+# dashboard's vars never queue behind writers for a connection.
+
+current: contextvars.ContextVar[str] = contextvars.ContextVar("workspace_id", default=DEFAULT_WORKSPACE)
+
+# Called with the id of every shard the pool opens, e.g. to recover its jobs.
+_opened: List[Callable[[str], None]] = []
+
+
+def _attach(workspace_id: str, engine: Engine) -> None:
+    changes.tracker_for(workspace_id).attach(engine)
+    for callback in _opened:
+        callback(workspace_id)
+
+
+def _detach(workspace_id: str, engine: Engine) -> None:  # noqa: ARG001
+    changes.tracker_for(workspace_id).detach()
+
+
+pool = shards.ShardPool(
+    max_engines=int(os.getenv("IMASTERY_SHARD_POOL_SIZE", "32")),
+    on_open=_attach,
+    on_close=_detach,
+    write_pool_size=int(os.getenv("IMASTERY_WRITE_POOL_SIZE", "2")),
+    read_pool_size=int(os.getenv("IMASTERY_READ_POOL_SIZE", "8")),
+)
+
+# Read-only engines on the app database, by URL (``$IMASTERY_READ_DB_URL``
+# can point them at a replica).
+_default_readers: Dict[str, Engine] = {}
+_readers_lock = threading.Lock()
+
+
+def current_workspace() -> str:
+    return current.get()
+
+
+@contextmanager
+def use_workspace(workspace_id: str) -> Iterator[str]:
+    token = current.set(shards.validate_workspace_id(workspace_id))
+    try:
+        yield workspace_id
+    finally:
+        current.reset(token)
+
+
+def workspace_ids() -> List[str]:
+    """The default workspace and every workspace with a shard file."""
+
+    try:
+        return [DEFAULT_WORKSPACE, *shards.list_shards(db.database_url())]
+    except shards.ShardError:
+        return [DEFAULT_WORKSPACE]
+
+
+def on_open(callback: Callable[[str], None]) -> None:
+    _opened.append(callback)
+
+
+def engine(workspace_id: str) -> Engine:
+    """The pooled engine of a (non-default) workspace shard, created on first use."""
+
+    return pool.engine(workspace_id, shards.shard_url(workspace_id, db.database_url()))
+
+
+def reader(workspace_id: str) -> Engine:
+    if workspace_id != DEFAULT_WORKSPACE:
+        return pool.reader(workspace_id, shards.shard_url(workspace_id, db.database_url()))
+    url = os.getenv("IMASTERY_READ_DB_URL") or db.database_url()
+    with _readers_lock:
+        engine = _default_readers.get(url)
+        if engine is None:
+            engine = _default_readers[url] = shards.open_reader(url, pool.read_pool_size)
+    return engine
+
+
+def close() -> None:
+    """Dispose every pooled engine; they are reopened on demand."""
+
+    pool.close()
+    with _readers_lock:
+        engines = list(_default_readers.values())
+        _default_readers.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+@contextmanager
+def read_session(workspace_id: Optional[str] = None) -> Iterator[Session]:
+    """A session on the workspace's read-only pool; committing writes fails."""
+
+    workspace_id = workspace_id or current.get()
+    with Session(reader(workspace_id)) as db_session:
+        db_session.info[changes.WORKSPACE_ID] = workspace_id
+        yield db_session
+
+
+@contextmanager
+def session(workspace_id: Optional[str] = None) -> Iterator[Session]:
+    workspace_id = workspace_id or current.get()
+    if workspace_id == DEFAULT_WORKSPACE:
+        with rx.session() as db_session:
+            yield db_session
+        return
+    with Session(engine(workspace_id)) as db_session:
+        db_session.info[changes.WORKSPACE_ID] = workspace_id
+        yield db_session
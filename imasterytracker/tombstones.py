@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+from sqlmodel import delete, select
+
+from .analytics import UNCHANGED
+from .models import ArchivedJournalEntry, Habit, JournalEntry, LearningStream
+
+# Soft deletes for the workspace tables.
+#
+# Deleting a stream, habit or journal entry only stamps its ``deleted_at``;
+# the row stays behind as a tombstone that other processes and sync clients
+# can still see, and the file does not fragment on every delete. Every ORM
+# ``SELECT`` on these models (``session.get`` included) skips tombstones;
+# pass ``execution_options(include_deleted=True)`` to see them.
+# ``maintenance`` purges tombstones once they are past retention.
+
+MODELS = (LearningStream, Habit, JournalEntry, ArchivedJournalEntry)
+INCLUDE_DELETED = "include_deleted"
+
+Progress = Optional[Callable[[int], None]]
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def soft_delete(session: Session, instance: Any) -> None:
+    instance.deleted_at = _utcnow()
+    session.add(instance)
+
+
+def soft_delete_where(session: Session, model: Any, *criteria: Any) -> None:
+    """Tombstone every live row of ``model`` matching ``criteria`` (all of them by default)."""
+
+    session.exec(update(model).where(model.deleted_at.is_(None), *criteria).values(deleted_at=_utcnow()))
+
+
+def purge(session: Session, model: Any, before: dt.datetime, batch_size: int, on_batch: Progress = None) -> int:
+    """Remove tombstones older than ``before``, committing once per batch.
+
+    ``on_batch`` is called with each batch's size and may raise to stop early.
+    """
+
+    purged = 0
+    while True:
+        ids = session.exec(
+            select(model.id)
+            .where(model.deleted_at.is_not(None), model.deleted_at < before)
+            .limit(batch_size)
+            .execution_options(**{INCLUDE_DELETED: True})
+        ).all()
+        if not ids:
+            return purged
+        # Tombstones left the analytics and the search index when they were made.
+        session.exec(delete(model).where(model.id.in_(ids)).execution_options(**{UNCHANGED: True}))
+        session.commit()
+        purged += len(ids)
+        if on_batch is not None:
+            on_batch(len(ids))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_tombstones(state: ORMExecuteState) -> None:
+    if (
+        state.is_select
+        and not state.is_column_load
+        and not state.is_relationship_load
+        and not state.execution_options.get(INCLUDE_DELETED, False)
+    ):
+        state.statement = state.statement.options(
+            *(
+                with_loader_criteria(model, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+                for model in MODELS
+            )
+        )
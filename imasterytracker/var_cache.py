@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import datetime as dt
+import functools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import reflex as rx
+
+from .changes import ChangeTracker, tracker_for
+from .shards import DEFAULT_WORKSPACE
+
+# Values derived from the workspace tables, shared by every session in the
+# process.
+#
+# Every tab on a workspace sees the same data, so a var computed from the
+# tables has the same value in all of them until one of those tables is
+# written. ``TableMemo`` keeps one value per workspace and name, tagged with
+# the write versions of the tables it was read from (and the day, since
+# several metrics count "today" or "this week"; the caller may pass its own);
+# the version is read *before*
+# computing, so a write that lands mid-compute only costs an extra miss, never
+# a stale hit. The least recently used entries go once ``max_entries`` is hit.
+
+T = TypeVar("T")
+
+
+class TableMemo:
+    def __init__(self, trackers: Callable[[str], ChangeTracker], max_entries: int = 1024) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+        self._trackers = trackers
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Hashable, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, trackers: Callable[[str], ChangeTracker]) -> "TableMemo":
+        return cls(trackers, max_entries=int(os.getenv("IMASTERY_VAR_CACHE_MAX_ENTRIES", "1024")))
+
+    def get(
+        self,
+        name: str,
+        tables: Tuple[str, ...],
+        compute: Callable[[], T],
+        workspace_id: str = DEFAULT_WORKSPACE,
+        day: Optional[dt.date] = None,
+    ) -> T:
+        versions = self._trackers(workspace_id).versions()
+        key = (tuple(versions[table] for table in tables), day or dt.date.today())
+        slot = (workspace_id, name)
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[slot] = (key, value)
+            self._entries.move_to_end(slot)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+memo = TableMemo.from_env(tracker_for)
+
+
+def table_var(*tables: str, daily: bool = False, **var_kwargs: Any) -> Callable[[Callable[..., T]], Any]:
+    """``rx.var`` computed from ``tables`` only, memoized on their write versions.
+
+    The var also lists the state's ``workspace_id`` and ``_<table>_version``
+    vars as its deps, so a session recomputes it (usually from the memo) when
+    those move and never on unrelated events. A ``daily`` var also depends on
+    the state's ``_today`` and is memoized per that day, for values that roll
+    over at midnight without any write.
+    """
+
+    def decorator(fget: Callable[..., T]) -> Any:
+        name = fget.__qualname__
+
+        @functools.wraps(fget)
+        def memoized(self) -> T:
+            day = self._today if daily else None
+            return memo.get(name, tables, lambda: fget(self), self.workspace_id, day)
+
+        return rx.var(
+            memoized,
+            deps=["workspace_id", *(f"_{table}_version" for table in tables), *(["_today"] if daily else [])],
+            auto_deps=False,
+            **var_kwargs,
+        )
+
+    return decorator
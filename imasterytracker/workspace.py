@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+import hashlib
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import func
+from sqlmodel import Session, select, update
+
+from . import archive, tombstones
+from .models import ArchivedJournalEntry
+from .models import Habit, JournalEntry, LearningStream, random_color
+from .schemas import (
+    HabitCreate,
+    HabitRead,
+    JournalEntryCreate,
+    JournalEntryRead,
+    LearningStreamCreate,
+    LearningStreamRead,
+    WorkspaceExport,
+    WorkspaceImport,
+)
+
+# Workspace-wide operations shared by the Reflex state, the HTTP API and the
+# headless CLI. Everything here takes an open session and stays Reflex-free.
+
+TABLES = {
+    "streams": LearningStream,
+    "habits": Habit,
+    "journal_entries": JournalEntry,
+}
+
+# Rows inserted per flush; long writes report progress between chunks.
+WRITE_CHUNK_SIZE = 5000
+
+Progress = Optional[Callable[[int], None]]
+
+
+def build_stream(payload: LearningStreamCreate) -> LearningStream:
+    return LearningStream(
+        name=payload.name,
+        focus=payload.focus,
+        milestones_total=payload.milestones_total,
+        milestones_completed=payload.milestones_completed,
+        color=payload.color or random_color(),
+    )
+
+
+def build_habit(payload: HabitCreate) -> Habit:
+    return Habit(name=payload.name, cadence=payload.cadence or "Daily", context=payload.context)
+
+
+def build_journal_entry(payload: JournalEntryCreate) -> JournalEntry:
+    entry = JournalEntry(title=payload.title, reflection=payload.reflection, mood=payload.mood or "Curious")
+    created_at = getattr(payload, "created_at", None)
+    if created_at is not None:
+        entry.created_at = created_at
+    return entry
+
+
+def apply_progress(stream: LearningStream, delta: int) -> None:
+    stream.milestones_completed = min(
+        stream.milestones_total,
+        max(0, stream.milestones_completed + delta),
+    )
+
+
+def replace_workspace(session: Session, payload: WorkspaceImport, on_progress: Progress = None) -> None:
+    """Delete every row and insert ``payload``, committing once at the end.
+
+    The old rows are tombstoned rather than removed; maintenance purges them.
+
+    ``on_progress`` is called with the number of rows flushed per chunk; it may
+    raise to abandon the import, leaving the transaction to be rolled back.
+    """
+
+    for model in (*TABLES.values(), ArchivedJournalEntry):
+        tombstones.soft_delete_where(session, model)
+
+    for items, build in (
+        (payload.streams, build_stream),
+        (payload.habits, build_habit),
+        (payload.journal_entries, build_journal_entry),
+    ):
+        for start in range(0, len(items), WRITE_CHUNK_SIZE):
+            chunk = items[start : start + WRITE_CHUNK_SIZE]
+            session.add_all(build(item) for item in chunk)
+            session.flush()
+            if on_progress is not None:
+                on_progress(len(chunk))
+    session.commit()
+
+
+# ---------------------------------------------------------------------------
+# Merge import
+# ---------------------------------------------------------------------------
+#
+# Rows are matched by a stable key rather than by id, which differs between
+# databases: streams and habits by name, journal entries by ``created_at``
+# when the file carries it (exports do) and by title plus reflection
+# otherwise. Matched rows are compared by a hash of their content columns and
+# only rewritten when it differs, so ids, ``created_at`` and
+# ``last_completed_on`` survive. Rows absent from the file are deleted.
+# Archived journal entries take part as well and are updated or deleted
+# where they are; new entries go to the live table like any other.
+
+MERGE_CHUNK_SIZE = 500
+
+
+@dataclasses.dataclass(frozen=True)
+class _MergeSpec:
+    model: Any
+    content: Tuple[str, ...]
+    build: Callable[[Any], Any]
+    # Content column values a payload would store; columns it leaves unset
+    # (a stream without a color) are not compared.
+    values: Callable[[Any], Dict[str, Any]]
+    row_keys: Callable[[Dict[str, Any]], List[Hashable]]
+    payload_key: Callable[[Any], Hashable]
+    archived: bool = False
+
+
+def _utc(value: dt.datetime) -> dt.datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _stream_values(stream: LearningStreamCreate) -> Dict[str, Any]:
+    values = {
+        "focus": stream.focus,
+        "milestones_total": stream.milestones_total,
+        "milestones_completed": stream.milestones_completed,
+    }
+    if stream.color:
+        values["color"] = stream.color
+    return values
+
+
+def _journal_payload_key(entry: Any) -> Hashable:
+    if getattr(entry, "created_at", None) is not None:
+        return ("at", _utc(entry.created_at))
+    return ("text", entry.title, entry.reflection)
+
+
+_MERGE_SPECS = {
+    "streams": _MergeSpec(
+        model=LearningStream,
+        content=("focus", "milestones_total", "milestones_completed", "color"),
+        build=build_stream,
+        values=_stream_values,
+        row_keys=lambda row: [("name", row["name"])],
+        payload_key=lambda stream: ("name", stream.name),
+    ),
+    "habits": _MergeSpec(
+        model=Habit,
+        content=("cadence", "context"),
+        build=build_habit,
+        values=lambda habit: {"cadence": habit.cadence or "Daily", "context": habit.context},
+        row_keys=lambda row: [("name", row["name"])],
+        payload_key=lambda habit: ("name", habit.name),
+    ),
+    "journal_entries": _MergeSpec(
+        model=JournalEntry,
+        content=("title", "reflection", "mood"),
+        build=build_journal_entry,
+        values=lambda entry: {
+            "title": entry.title,
+            "reflection": entry.reflection,
+            "mood": entry.mood or "Curious",
+        },
+        row_keys=lambda row: [
+            ("at", _utc(row["created_at"])),
+            ("text", row["title"], row["reflection"]),
+        ],
+        payload_key=_journal_payload_key,
+        archived=True,
+    ),
+}
+
+
+def content_hash(values: Dict[str, Any]) -> str:
+    encoded = repr(sorted(values.items())).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _soft_delete(session: Session, model: Any, ids: List[int]) -> None:
+    for start in range(0, len(ids), MERGE_CHUNK_SIZE):
+        tombstones.soft_delete_where(session, model, model.id.in_(ids[start : start + MERGE_CHUNK_SIZE]))
+
+
+def _merge_table(session: Session, spec: _MergeSpec, payloads: Sequence[Any]) -> Dict[str, int]:
+    model = spec.model
+    columns = sorted({"id", "name", "title", "reflection", "created_at", *spec.content} & set(model.model_fields))
+    rows = {
+        row["id"]: dict(row)
+        for row in (r._mapping for r in session.exec(select(*(getattr(model, c) for c in columns))))
+    }
+    archived: set[int] = set()
+    if spec.archived:
+        for row in archive.iter_archived(session):
+            rows[row["id"]] = row
+            archived.add(row["id"])
+    index: Dict[Hashable, Deque[int]] = defaultdict(deque)
+    for row_id, row in rows.items():
+        for key in spec.row_keys(row):
+            index[key].append(row_id)
+
+    matched: set[int] = set()
+    inserts: List[Any] = []
+    updates: List[Dict[str, Any]] = []
+    for payload in payloads:
+        candidates = index.get(spec.payload_key(payload), deque())
+        while candidates and candidates[0] in matched:
+            candidates.popleft()
+        if not candidates:
+            inserts.append(spec.build(payload))
+            continue
+        row_id = candidates.popleft()
+        matched.add(row_id)
+        values = spec.values(payload)
+        current = {column: rows[row_id][column] for column in values}
+        if content_hash(current) != content_hash(values):
+            updates.append({"id": row_id, **values})
+
+    stale = [row_id for row_id in rows if row_id not in matched]
+    _soft_delete(session, model, [row_id for row_id in stale if row_id not in archived])
+    hot_updates = [values for values in updates if values["id"] not in archived]
+    if hot_updates:
+        session.exec(update(model), params=hot_updates)
+    if archived:
+        _soft_delete(session, ArchivedJournalEntry, [row_id for row_id in stale if row_id in archived])
+        archive.update_archived(session, [values for values in updates if values["id"] in archived])
+    session.add_all(inserts)
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(stale),
+        "unchanged": len(matched) - len(updates),
+    }
+
+
+def merge_workspace(
+    session: Session, payload: WorkspaceImport, on_progress: Progress = None
+) -> Dict[str, Dict[str, int]]:
+    """Apply only the differences between ``payload`` and the stored workspace."""
+
+    changes = {}
+    for key, spec in _MERGE_SPECS.items():
+        payloads = getattr(payload, key)
+        changes[key] = _merge_table(session, spec, payloads)
+        if on_progress is not None:
+            on_progress(len(payloads))
+    session.commit()
+    return changes
+
+
+def format_changes(changes: Dict[str, Dict[str, int]]) -> str:
+    totals: Dict[str, int] = defaultdict(int)
+    for table in changes.values():
+        for action, count in table.items():
+            totals[action] += count
+    return ", ".join(f"{totals[action]} {action}" for action in ("inserted", "updated", "deleted"))
+
+
+def export_workspace(session: Session) -> WorkspaceExport:
+    return WorkspaceExport(
+        streams=[
+            LearningStreamRead.model_validate(stream, from_attributes=True)
+            for stream in session.exec(select(LearningStream))
+        ],
+        habits=[
+            HabitRead.model_validate(habit, from_attributes=True)
+            for habit in session.exec(select(Habit))
+        ],
+        journal_entries=list(archive.iter_entries(session)),
+    )
+
+
+# Rows serialised per piece when streaming an export.
+EXPORT_BATCH_SIZE = 1000
+
+_EXPORT_TABLES = (
+    ("streams", LearningStream, LearningStreamRead),
+    ("habits", Habit, HabitRead),
+    ("journal_entries", JournalEntry, JournalEntryRead),
+)
+_EXPORT_ADAPTERS = {key: TypeAdapter(List[read_model]) for key, _, read_model in _EXPORT_TABLES}
+
+
+def iter_export_json(
+    session: Session,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[bytes]:
+    """Yield the ``WorkspaceExport`` JSON document piece by piece.
+
+    The bytes joined are identical to ``export_workspace(...).model_dump_json()``
+    but only ``batch_size`` rows are held in memory at a time. ``on_progress``
+    is called with the number of rows in each piece once it has been yielded.
+    """
+
+    for index, (key, model, read_model) in enumerate(_EXPORT_TABLES):
+        yield f'{"{" if index == 0 else ","}"{key}":['.encode()
+        adapter = _EXPORT_ADAPTERS[key]
+        if model is JournalEntry:
+            reads: Iterator[Any] = archive.iter_entries(session, batch_size)
+        else:
+            rows = session.exec(select(model).execution_options(yield_per=batch_size))
+            reads = (read_model.model_validate(row, from_attributes=True) for row in rows)
+        batch: List[Any] = []
+        separator = b""
+        for read in reads:
+            batch.append(read)
+            if len(batch) == batch_size:
+                yield separator + adapter.dump_json(batch)[1:-1]
+                if on_progress is not None:
+                    on_progress(len(batch))
+                batch, separator = [], b","
+        if batch:
+            yield separator + adapter.dump_json(batch)[1:-1]
+            if on_progress is not None:
+                on_progress(len(batch))
+        yield b"]"
+    yield b"}"
+
+
+def workspace_counts(session: Session) -> Dict[str, int]:
+    counts = {
+        key: session.exec(select(func.count()).select_from(model)).one()
+        for key, model in TABLES.items()
+    }
+    counts["journal_entries"] += archive.archived_count(session)
+    return counts
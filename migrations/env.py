@@ -6,11 +6,15 @@ from alembic import context
 from sqlalchemy import engine_from_config, pool
 from sqlmodel import SQLModel
 
-from imasterytracker.state import Habit, JournalEntry, LearningStream  # noqa: F401
-from rxconfig import config as app_config
+from imasterytracker.models import Habit, JournalEntry, LearningStream  # noqa: F401
 
 config = context.config
-if config.config_ini_section:
+# Workspace shards are migrated on a connection passed in by the caller
+# (``imasterytracker.shards.migrate``); otherwise target the app database.
+shard_connection = config.attributes.get("connection")
+if shard_connection is None and config.config_ini_section:
+    from rxconfig import config as app_config
+
     config.set_main_option("sqlalchemy.url", app_config.db_url)
 
 if config.config_file_name is not None:
@@ -19,11 +23,18 @@ if config.config_file_name is not None:
 target_metadata = SQLModel.metadata
 
 
+def include_name(name, type_, parent_names) -> bool:  # noqa: ARG001
+    # The FTS5 search index (its vocabulary views and shadow tables included)
+    # is created by hand, not from the metadata; autogenerate must leave it be.
+    return not (type_ == "table" and name is not None and name.startswith("searchindex"))
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -33,6 +44,12 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
+    if shard_connection is not None:
+        context.configure(connection=shard_connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
@@ -40,7 +57,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,35 @@
+"""create background job table"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_create_job"
+down_revision = "0001_create_tables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("mode", sa.String(), nullable=False, server_default=""),
+        sa.Column("status", sa.String(), nullable=False, server_default="queued"),
+        sa.Column("rows_total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rows_validated", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rows_written", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("result", sa.String(), nullable=False, server_default=""),
+        sa.Column("error", sa.String(), nullable=False, server_default=""),
+        sa.Column("artifact", sa.String(), nullable=False, server_default=""),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job")
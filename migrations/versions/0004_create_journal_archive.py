@@ -0,0 +1,40 @@
+"""create the journal archive tier"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_create_journal_archive"
+down_revision = "0003_create_tableversion"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Archived entries keep their ids, so SQLite must stop reusing the ids of
+    # deleted rows; that takes a table rebuild.
+    sqlite = op.get_bind().dialect.name == "sqlite"
+    with op.batch_alter_table(
+        "journalentry",
+        recreate="always" if sqlite else "auto",
+        table_kwargs={"sqlite_autoincrement": True},
+    ) as batch:
+        batch.create_index("ix_journalentry_created_at", ["created_at"])
+    op.create_table(
+        "archivedjournalentry",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("reflection_z", sa.LargeBinary(), nullable=False),
+        sa.Column("mood", sa.String(), nullable=False, server_default="Curious"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_archivedjournalentry_created_at", "archivedjournalentry", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_archivedjournalentry_created_at", table_name="archivedjournalentry")
+    op.drop_table("archivedjournalentry")
+    op.drop_index("ix_journalentry_created_at", table_name="journalentry")
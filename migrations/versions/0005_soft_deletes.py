@@ -0,0 +1,40 @@
+"""soft-delete workspace rows"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_soft_deletes"
+down_revision = "0004_create_journal_archive"
+branch_labels = None
+depends_on = None
+
+TABLES = ("learningstream", "habit", "journalentry", "archivedjournalentry")
+LIVE = sa.text("deleted_at IS NULL")
+TOMBSTONE = sa.text("deleted_at IS NOT NULL")
+
+
+def upgrade() -> None:
+    # The live-row indexes below replace the plain created_at ones.
+    op.drop_index("ix_journalentry_created_at", table_name="journalentry")
+    op.drop_index("ix_archivedjournalentry_created_at", table_name="archivedjournalentry")
+    for table in TABLES:
+        op.add_column(table, sa.Column("deleted_at", sa.DateTime(), nullable=True))
+        op.create_index(
+            f"ix_{table}_live", table, ["created_at", "id"], sqlite_where=LIVE, postgresql_where=LIVE
+        )
+        op.create_index(
+            f"ix_{table}_tombstones", table, ["deleted_at"], sqlite_where=TOMBSTONE, postgresql_where=TOMBSTONE
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_tombstones", table_name=table)
+        op.drop_index(f"ix_{table}_live", table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("deleted_at")
+    op.create_index("ix_archivedjournalentry_created_at", "archivedjournalentry", ["created_at"])
+    op.create_index("ix_journalentry_created_at", "journalentry", ["created_at"])
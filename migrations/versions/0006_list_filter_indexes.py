@@ -0,0 +1,31 @@
+"""index the list endpoints' filters"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_list_filter_indexes"
+down_revision = "0005_soft_deletes"
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text("deleted_at IS NULL")
+FILTERS = (("habit", "cadence"), ("journalentry", "mood"))
+
+
+def upgrade() -> None:
+    for table, column in FILTERS:
+        op.create_index(
+            f"ix_{table}_live_{column}",
+            table,
+            [column, "created_at", "id"],
+            sqlite_where=LIVE,
+            postgresql_where=LIVE,
+        )
+
+
+def downgrade() -> None:
+    for table, column in FILTERS:
+        op.drop_index(f"ix_{table}_live_{column}", table_name=table)
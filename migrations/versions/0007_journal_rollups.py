@@ -0,0 +1,65 @@
+"""journal rollups by day and mood"""
+
+from __future__ import annotations
+
+import datetime as dt
+import zlib
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_journal_rollups"
+down_revision = "0006_list_filter_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _day(value) -> dt.date:
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.timezone.utc)
+    return value.date()
+
+
+def upgrade() -> None:
+    rollup = op.create_table(
+        "journalrollup",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("mood", sa.String(), nullable=False),
+        sa.Column("entries", sa.Integer(), nullable=False),
+        sa.Column("reflection_chars", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "mood"),
+    )
+    # Backfill from both tiers; kept self-contained so later model changes
+    # can't break it.
+    connection = op.get_bind()
+    totals = defaultdict(lambda: [0, 0])
+    hot = connection.exec_driver_sql(
+        "SELECT created_at, mood, reflection FROM journalentry WHERE deleted_at IS NULL"
+    )
+    for created_at, mood, reflection in hot:
+        total = totals[(_day(created_at), mood)]
+        total[0] += 1
+        total[1] += len(reflection)
+    cold = connection.exec_driver_sql(
+        "SELECT created_at, mood, reflection_z FROM archivedjournalentry WHERE deleted_at IS NULL"
+    )
+    for created_at, mood, blob in cold:
+        total = totals[(_day(created_at), mood)]
+        total[0] += 1
+        total[1] += len(zlib.decompress(blob).decode())
+    if totals:
+        op.bulk_insert(
+            rollup,
+            [
+                {"day": day, "mood": mood, "entries": entries, "reflection_chars": chars}
+                for (day, mood), (entries, chars) in totals.items()
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("journalrollup")
@@ -0,0 +1,60 @@
+"""full-text search index over streams, habits and journal entries"""
+
+from __future__ import annotations
+
+import zlib
+
+from alembic import op
+
+
+revision = "0008_search_index"
+down_revision = "0007_journal_rollups"
+branch_labels = None
+depends_on = None
+
+
+# The kind's code sits above the id in the rowid, as in ``imasterytracker.search``.
+STREAM, HABIT, JOURNAL = (code << 40 for code in (1, 2, 3))
+
+
+def upgrade() -> None:
+    # ``create_all`` may have made (and filled) the index already; start over
+    # either way. Kept self-contained so later model changes can't break it.
+    op.execute("DROP TABLE IF EXISTS searchindex_instances")
+    op.execute("DROP TABLE IF EXISTS searchindex_vocab")
+    op.execute("DROP TABLE IF EXISTS searchindex")
+    op.execute(
+        "CREATE VIRTUAL TABLE searchindex USING fts5("
+        "title, body, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute("CREATE VIRTUAL TABLE searchindex_vocab USING fts5vocab(searchindex, row)")
+    op.execute("CREATE VIRTUAL TABLE searchindex_instances USING fts5vocab(searchindex, instance)")
+    # In rowid order throughout: FTS5 writes a new segment whenever rowids stop increasing.
+    op.execute(
+        "INSERT INTO searchindex(rowid, title, body) "
+        f"SELECT id + {STREAM}, name, focus FROM learningstream WHERE deleted_at IS NULL ORDER BY id"
+    )
+    op.execute(
+        "INSERT INTO searchindex(rowid, title, body) "
+        f"SELECT id + {HABIT}, name, context FROM habit WHERE deleted_at IS NULL ORDER BY id"
+    )
+    connection = op.get_bind()
+    archived = connection.exec_driver_sql(
+        "SELECT id, title, reflection_z FROM archivedjournalentry WHERE deleted_at IS NULL ORDER BY id"
+    ).fetchall()
+    if archived:
+        connection.exec_driver_sql(
+            "INSERT INTO searchindex(rowid, title, body) VALUES (?, ?, ?)",
+            [(entry_id + JOURNAL, title, zlib.decompress(blob).decode()) for entry_id, title, blob in archived],
+        )
+    op.execute(
+        "INSERT INTO searchindex(rowid, title, body) "
+        f"SELECT id + {JOURNAL}, title, reflection FROM journalentry WHERE deleted_at IS NULL ORDER BY id"
+    )
+    op.execute("INSERT INTO searchindex(searchindex) VALUES ('optimize')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS searchindex_instances")
+    op.execute("DROP TABLE IF EXISTS searchindex_vocab")
+    op.execute("DROP TABLE IF EXISTS searchindex")
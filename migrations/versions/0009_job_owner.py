@@ -0,0 +1,25 @@
+"""job owner, heartbeat and persisted cancel flag"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_job_owner"
+down_revision = "0008_search_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("job", sa.Column("owner", sa.String(), nullable=False, server_default=""))
+    op.add_column("job", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+    op.add_column("job", sa.Column("cancel_requested", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("job") as batch:
+        batch.drop_column("cancel_requested")
+        batch.drop_column("heartbeat_at")
+        batch.drop_column("owner")
@@ -1,5 +1,12 @@
+import os
+
 import reflex as rx
 
+# Reads go through the read-only pools in ``imasterytracker.tenancy``, so
+# Reflex's engine only serves writes, which SQLite runs one at a time anyway.
+os.environ.setdefault("SQLALCHEMY_POOL_SIZE", os.getenv("IMASTERY_WRITE_POOL_SIZE", "2"))
+os.environ.setdefault("SQLALCHEMY_MAX_OVERFLOW", os.getenv("IMASTERY_WRITE_POOL_SIZE", "2"))
+
 
 class Rxconfig(rx.Config):
     app_name = "imasterytracker"
@@ -9,4 +16,5 @@ class Rxconfig(rx.Config):
     disable_plugins = ["reflex.plugins.sitemap.SitemapPlugin"]
 
 
-config = Rxconfig(app_name="imasterytracker")
+# Reflex ignores un-annotated class attributes, so pass the URL explicitly.
+config = Rxconfig(app_name="imasterytracker", db_url=Rxconfig.db_url)
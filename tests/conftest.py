@@ -14,6 +14,9 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from imasterytracker.state import Habit, JournalEntry, LearningStream  # noqa: E402,F401
+from imasterytracker import entity_cache, tenancy  # noqa: E402
+from imasterytracker.api import summary_cache  # noqa: E402
+from imasterytracker.var_cache import memo  # noqa: E402
 
 
 @pytest.fixture(autouse=True)
@@ -30,4 +33,9 @@ def isolate_database(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Iterato
     monkeypatch.setenv("IMASTERY_SKIP_SEED", "1")
     monkeypatch.setenv("REFLEX_DB_URL", f"sqlite:///{database_path}")
     monkeypatch.setattr(rx, "session", _session_override)
+    # Memoized values are keyed on write versions and ids, not on the database file.
+    memo.clear()
+    summary_cache.clear()
+    entity_cache.cache.clear()
     yield
+    tenancy.close()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import reflex as rx
+from sqlalchemy import select
+from starlette.testclient import TestClient
+
+from imasterytracker import analytics, archive, cli, workspace
+from imasterytracker.app import app
+from imasterytracker.models import JournalEntry, JournalRollup
+from imasterytracker.schemas import WorkspaceImport
+from imasterytracker.state import DashboardState
+
+client = TestClient(app._api)
+
+MONDAY = dt.datetime(2024, 5, 6, 9, tzinfo=dt.timezone.utc)
+
+
+def _rollups() -> list:
+    with rx.session() as session:
+        return [tuple(row) for row in session.execute(select(JournalRollup.__table__).order_by("day", "mood"))]
+
+
+def _rebuilt() -> list:
+    with rx.session() as session:
+        analytics.rebuild(session)
+        rows = [tuple(row) for row in session.execute(select(JournalRollup.__table__).order_by("day", "mood"))]
+        session.rollback()
+    return rows
+
+
+def _entry(title: str, mood: str, days: int, reflection: str = "abcd") -> JournalEntry:
+    return JournalEntry(title=title, reflection=reflection, mood=mood, created_at=MONDAY + dt.timedelta(days=days))
+
+
+def test_rollups_follow_creates_edits_and_deletes():
+    with rx.session() as session:
+        session.add_all([_entry("a", "Focused", 0), _entry("b", "Focused", 1, "xy"), _entry("c", "Calm", 8)])
+        session.commit()
+    client.post("/api/journals", json={"title": "API", "reflection": "Written today.", "mood": "Curious"})
+    state = DashboardState()
+    state.journal_title, state.journal_reflection, state.journal_mood = "UI", "From the dashboard.", "Curious"
+    state.add_journal_entry()
+
+    assert _rollups() == _rebuilt()
+    assert (MONDAY.date(), "Focused", 1, 4) in _rollups()
+
+    with rx.session() as session:
+        entry = session.get(JournalEntry, 2)
+        entry.mood, entry.reflection = "Calm", "longer text"
+        session.add(entry)
+        session.commit()
+    client.delete("/api/journals/3")
+    state.remove_journal_entry(4)
+
+    rows = _rollups()
+    assert rows == _rebuilt()
+    assert [row for row in rows if row[0] < dt.date(2024, 6, 1)] == [
+        (dt.date(2024, 5, 6), "Focused", 1, 4),
+        (dt.date(2024, 5, 7), "Calm", 1, 11),
+    ]
+
+
+def test_bulk_writes_rebuild_and_archiving_leaves_rollups_alone():
+    with rx.session() as session:
+        session.add_all([_entry("old", "Calm", 0), _entry("older", "Tired", -400)])
+        session.commit()
+        before = _rollups()
+
+        assert archive.archive_entries(session, archive.ArchivePolicy(after_days=30)) == 2
+        assert _rollups() == before
+
+        workspace.merge_workspace(
+            session, WorkspaceImport(journal_entries=[{"title": "old", "reflection": "abcd", "mood": "Calm"}])
+        )
+        assert _rollups() == _rebuilt() == [(MONDAY.date(), "Calm", 1, 4)]
+
+        workspace.replace_workspace(session, WorkspaceImport(journal_entries=[{"title": "n", "reflection": "xyz"}]))
+    rows = _rollups()
+    assert rows == _rebuilt() and [(mood, entries, chars) for _, mood, entries, chars in rows] == [("Curious", 1, 3)]
+
+
+def test_endpoint_and_panel_read_the_rollups(monkeypatch):
+    with rx.session() as session:
+        session.add_all(
+            [
+                _entry("a", "Focused", 0, "12345678"),
+                _entry("b", "Calm", 2, "1234"),
+                _entry("c", "Focused", 7, "12"),
+                _entry("d", "Focused", 40),
+            ]
+        )
+        session.commit()
+
+    weeks = client.get("/api/analytics/journal", params={"since": "2024-05-01", "until": "2024-06-01"}).json()
+    assert weeks["moods"] == {"Calm": 1, "Focused": 2}
+    assert weeks["periods"] == [
+        {
+            "start": "2024-05-06",
+            "entries": 2,
+            "reflection_chars": 12,
+            "moods": {"Calm": 1, "Focused": 1},
+            "average_reflection_length": 6.0,
+        },
+        {
+            "start": "2024-05-13",
+            "entries": 1,
+            "reflection_chars": 2,
+            "moods": {"Focused": 1},
+            "average_reflection_length": 2.0,
+        },
+    ]
+    months = client.get("/api/analytics/journal", params={"bucket": "month"}).json()
+    assert [(period["start"], period["entries"]) for period in months["periods"]] == [
+        ("2024-05-01", 3),
+        ("2024-06-01", 1),
+    ]
+    assert client.get("/api/analytics/journal", params={"bucket": "year"}).status_code == 400
+    assert client.get("/api/analytics/journal", params={"since": "May"}).status_code == 400
+
+    monkeypatch.setattr(DashboardState, "_current_date", staticmethod(lambda: dt.date(2024, 5, 15)))
+    state = DashboardState()
+    state._refresh()
+    assert [(row.week, row.reflections, row.average_length, row.top_mood) for row in state.weekly_reflections] == [
+        ("May 13", 1, 2, "Focused"),
+        ("May 06", 2, 6, "Focused"),
+    ]
+    assert [(share.mood, share.percent) for share in state.mood_shares] == [("Focused", 67), ("Calm", 33)]
+
+
+def test_cli_rebuilds_the_rollups(capsys):
+    with rx.session() as session:
+        session.add(_entry("a", "Calm", 0))
+        session.commit()
+        session.execute(JournalRollup.__table__.delete())
+        session.commit()
+
+    assert cli.main(["analytics", "--rebuild", "--bucket", "day"]) == 0
+
+    assert '"start": "2024-05-06"' in capsys.readouterr().out
+    assert _rollups() == [(MONDAY.date(), "Calm", 1, 4)]
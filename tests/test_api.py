@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import gzip
+import json
+
 from starlette.testclient import TestClient
 
+from imasterytracker import snapshot, workspace
+from imasterytracker.api import idempotency_store, job_manager
 from imasterytracker.app import app
+from imasterytracker.schemas import MAX_BATCH_SIZE
 
 client = TestClient(app._api)
 
@@ -32,10 +38,265 @@ def test_stream_crud_cycle():
     assert client.get("/api/streams").json() == []
 
 
+def _wait(response) -> dict:
+    assert response.status_code == 202
+    job_manager.wait(response.json()["job_id"], timeout=10)
+    return client.get(response.headers["Location"]).json()
+
+
 def test_import_validation_error():
     response = client.post(
         "/api/import",
         json={"streams": [{"name": "", "milestones_total": 0}]},
     )
-    assert response.status_code == 400
-    assert "Name" in response.json()["detail"]
+    job = _wait(response)
+    assert job["status"] == "failed"
+    assert "streams.0.name" in job["error"]
+
+
+def test_idempotent_create_replays_without_duplicates():
+    idempotency_store.clear()
+    payload = {"title": "Retry-safe", "reflection": "Only once", "mood": "Focused"}
+    headers = {"Idempotency-Key": "journal-1"}
+
+    first = client.post("/api/journals", json=payload, headers=headers)
+    replay = client.post("/api/journals", json=payload, headers=headers)
+
+    assert first.status_code == replay.status_code == 201
+    assert replay.json() == first.json()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get("/api/journals").json()) == 1
+
+    reused = client.post("/api/journals", json={**payload, "title": "Other"}, headers=headers)
+    assert reused.status_code == 422
+
+
+def test_idempotent_import_skips_rewrite(monkeypatch):
+    idempotency_store.clear()
+    body = {"streams": [{"name": "Compilers", "milestones_total": 2}]}
+    headers = {"Idempotency-Key": "import-1"}
+
+    first = client.post("/api/import", json=body, headers=headers)
+    assert _wait(first)["status"] == "succeeded"
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("replay must not touch the database")
+
+    monkeypatch.setattr(workspace, "replace_workspace", _fail)
+    replay = client.post("/api/import", json=body, headers=headers)
+    assert replay.status_code == 202
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["job_id"] == first.json()["job_id"]
+
+
+def test_bulk_create_inserts_all_or_nothing():
+    response = client.post(
+        "/api/habits/bulk",
+        json=[{"name": "Read"}, {"name": "Write", "cadence": "Weekly"}],
+    )
+    assert response.status_code == 201
+    assert [habit["name"] for habit in response.json()] == ["Read", "Write"]
+    assert all(habit["id"] for habit in response.json())
+
+    rejected = client.post("/api/habits/bulk", json=[{"name": "Sketch"}, {"name": ""}])
+    assert rejected.status_code == 400
+    assert rejected.json()["detail"].startswith("Item 1 Name")
+    assert len(client.get("/api/habits").json()) == 2
+
+    oversized = client.post("/api/habits/bulk", json=[{"name": "Drill"}] * (MAX_BATCH_SIZE + 1))
+    assert oversized.status_code == 400
+    assert oversized.json()["detail"] == f"At most {MAX_BATCH_SIZE} items per request"
+
+
+def test_batch_commits_mixed_operations():
+    stream = client.post("/api/streams", json={"name": "Rust", "milestones_total": 3}).json()
+
+    response = client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {"op": "create", "type": "journal", "data": {"reflection": "Borrow checker clicked"}},
+                {"op": "progress", "type": "stream", "id": stream["id"], "delta": 5},
+                {"op": "create", "type": "habit", "data": {"name": "Kata"}},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"] is True
+    assert [result["status"] for result in body["results"]] == [201, 200, 201]
+    assert body["results"][1]["body"]["milestones_completed"] == 3
+    assert len(client.get("/api/journals").json()) == 1
+
+
+def test_batch_rolls_back_on_failure():
+    stream = client.post("/api/streams", json={"name": "Go"}).json()
+
+    response = client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {"op": "delete", "type": "stream", "id": stream["id"]},
+                {"op": "create", "type": "habit", "data": {"name": "Kata"}},
+                {"op": "delete", "type": "journal", "id": 999},
+                {"op": "create", "type": "habit", "data": {"name": "Never"}},
+            ]
+        },
+    )
+
+    assert response.status_code == 404
+    body = response.json()
+    assert body["committed"] is False
+    assert body["failed_index"] == 2
+    assert [result["status"] for result in body["results"]] == [424, 424, 404, 424]
+    assert len(client.get("/api/streams").json()) == 1
+    assert client.get("/api/habits").json() == []
+
+
+def test_merge_import_reports_changes():
+    payload = {"habits": [{"name": "Read"}, {"name": "Write"}]}
+    first = _wait(client.post("/api/import?mode=merge", json=payload))
+    assert first["result"]["changes"]["habits"]["inserted"] == 2
+
+    payload["habits"][1]["context"] = "Mornings"
+    second = _wait(client.post("/api/import?mode=merge", json=payload))
+    assert second["result"]["changes"]["habits"] == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 1}
+
+    assert client.post("/api/import?mode=upsert", json=payload).status_code == 400
+
+
+def test_export_job_produces_downloadable_artifact():
+    client.post("/api/habits", json={"name": "Read"})
+
+    job = _wait(client.post("/api/exports"))
+    assert job["status"] == "succeeded"
+    assert job["rows_written"] == 1
+
+    artifact = client.get(f"/api/jobs/{job['id']}/artifact")
+    assert artifact.status_code == 200
+    assert artifact.json()["habits"][0]["name"] == "Read"
+    assert artifact.content == client.get("/api/export", headers={"Accept-Encoding": "identity"}).content
+    assert client.post(f"/api/jobs/{job['id']}/cancel").status_code == 409
+    assert client.get("/api/jobs/missing").status_code == 404
+
+
+def test_export_and_import_negotiate_compression():
+    client.post("/api/journals", json={"title": "Packed", "reflection": "Squeeze " * 200})
+
+    response = client.get("/api/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    exported = response.json()
+    assert response.num_bytes_downloaded * 5 < len(response.content)
+    assert exported["journal_entries"][0]["title"] == "Packed"
+    assert "content-encoding" not in client.get("/api/export", headers={"Accept-Encoding": "identity"}).headers
+
+    exported["journal_entries"][0]["title"] = "Unpacked"
+    job = _wait(
+        client.post(
+            "/api/import",
+            content=gzip.compress(json.dumps(exported).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+    )
+    assert job["status"] == "succeeded"
+    assert client.get("/api/journals").json()[0]["title"] == "Unpacked"
+
+    broken = client.post("/api/import", content=b"nope", headers={"Content-Encoding": "gzip"})
+    assert broken.status_code == 400
+    assert client.post("/api/import", content=b"{}", headers={"Content-Encoding": "br"}).status_code == 415
+
+
+def test_snapshot_export_restores_through_import():
+    client.post("/api/streams", json={"name": "Rust", "milestones_total": 3})
+    client.post("/api/journals", json={"title": "Binary", "reflection": "Columns"})
+
+    response = client.get("/api/export?format=snapshot", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == snapshot.MEDIA_TYPE
+    assert response.content.startswith(snapshot.MAGIC)
+    assert client.get("/api/export?format=xml").status_code == 400
+
+    client.post("/api/streams", json={"name": "Go"})
+    job = _wait(client.post("/api/import", content=response.content, headers={"Content-Type": snapshot.MEDIA_TYPE}))
+    assert job["status"] == "succeeded"
+    assert job["result"]["counts"] == {"streams": 1, "habits": 0, "journal_entries": 1}
+    assert [stream["name"] for stream in client.get("/api/streams").json()] == ["Rust"]
+
+
+def test_admin_backup_runs_as_a_job(monkeypatch, tmp_path):
+    monkeypatch.setenv("IMASTERY_BACKUP_DIR", str(tmp_path / "backups"))
+    client.post("/api/habits", json={"name": "Back me up"})
+    client.post("/api/habits", json={"name": "Me too"}, headers={"X-Workspace": "team-backup"})
+
+    job = _wait(client.post("/api/admin/backups"))
+    assert job["kind"] == "backup" and job["status"] == "succeeded"
+    assert job["rows_written"] == job["rows_total"] == job["result"]["pages"]
+
+    listed = client.get("/api/admin/backups").json()
+    assert [item["name"] for item in listed["backups"]] == [job["result"]["backup"]]
+    shard_backup = job["result"]["workspaces"]["team-backup"]
+    assert [item["name"] for item in listed["workspaces"]["team-backup"]] == [shard_backup]
+    assert (tmp_path / "backups" / "workspaces" / "team-backup" / shard_backup).exists()
+    artifact = client.get(f"/api/jobs/{job['id']}/artifact")
+    assert artifact.content.startswith(b"SQLite format 3")
+
+    monkeypatch.setenv("IMASTERY_ADMIN_TOKEN", "s3cret")
+    assert client.post("/api/admin/backups").status_code == 401
+    assert client.get(f"/api/jobs/{job['id']}/artifact").status_code == 401
+    admin = client.get(f"/api/jobs/{job['id']}/artifact", headers={"Authorization": "Bearer s3cret"})
+    assert admin.content.startswith(b"SQLite format 3")
+    authorized = client.get("/api/admin/backups", headers={"Authorization": "Bearer s3cret"})
+    assert authorized.status_code == 200
+
+
+def test_export_is_served_from_cache_until_a_write():
+    client.post("/api/habits", json={"name": "Cached"})
+
+    first = client.get("/api/export", headers={"Accept-Encoding": "identity"})
+    second = client.get("/api/export", headers={"Accept-Encoding": "identity"})
+    assert (first.headers["x-export-cache"], second.headers["x-export-cache"]) == ("miss", "hit")
+    assert first.content == second.content
+
+    client.delete(f"/api/habits/{first.json()['habits'][0]['id']}")
+    third = client.get("/api/export", headers={"Accept-Encoding": "identity"})
+    assert third.headers["x-export-cache"] == "miss"
+    assert third.json()["habits"] == []
+
+    stats = client.get("/api/admin/cache").json()["export"]
+    assert stats["hits"] >= 1 and stats["misses"] >= 2 and stats["cached_bytes"] == len(third.content)
+
+
+def test_list_endpoints_filter_sort_and_project_in_sql():
+    client.post("/api/streams", json={"name": "Done", "milestones_total": 1, "milestones_completed": 1})
+    client.post("/api/streams", json={"name": "Open", "milestones_total": 3})
+    for mood, title in (("Focused", "A"), ("Energised", "B"), ("Curious", "C"), ("Focused", "D")):
+        client.post("/api/journals", json={"title": title, "reflection": "r", "mood": mood})
+
+    active = client.get("/api/streams", params={"status": "active", "fields": "name"}).json()
+    assert active == [{"name": "Open"}]
+
+    moods = client.get("/api/journals", params={"mood": "Focused,Energised", "sort": "-title", "fields": "id,title"})
+    assert [entry["title"] for entry in moods.json()] == ["D", "B", "A"]
+    assert set(moods.json()[0]) == {"id", "title"}
+
+    recent = client.get("/api/journals", params={"created_after": "2000-01-01", "sort": "mood", "limit": 2}).json()
+    assert [(entry["mood"], entry["title"]) for entry in recent] == [("Curious", "C"), ("Energised", "B")]
+    assert recent[0]["reflection"] == "r" and recent[0]["created_at"]
+    assert client.get("/api/journals", params={"created_before": "2000-01-01"}).json() == []
+
+
+def test_list_parameters_are_checked_against_an_allow_list():
+    for params in (
+        {"fields": "id,deleted_at"},
+        {"sort": "reflection"},
+        {"cadence": "Daily"},
+        {"created_after": "yesterday"},
+        {"limit": "0"},
+    ):
+        response = client.get("/api/journals", params=params)
+        assert response.status_code == 400, params
+        assert "detail" in response.json()
+    assert client.get("/api/streams", params={"status": "paused"}).status_code == 400
+    assert client.get("/api/habits", params={"cadence": "Weekly", "workspace": "default"}).json() == []
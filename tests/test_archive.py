@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import datetime as dt
+import io
+
+import reflex as rx
+from sqlmodel import select
+from starlette.testclient import TestClient
+
+from imasterytracker import archive, snapshot, workspace
+from imasterytracker.api import job_manager
+from imasterytracker.app import app
+from imasterytracker.models import ArchivedJournalEntry, JournalEntry
+from imasterytracker.schemas import WorkspaceImport
+from imasterytracker.state import DashboardState
+
+client = TestClient(app._api)
+
+
+def _journal(old: int, recent: int) -> None:
+    now = dt.datetime.now(dt.timezone.utc)
+    with rx.session() as session:
+        for day in range(old):
+            reflection = " ".join([f"Lesson {day}"] * 20)
+            created_at = now - dt.timedelta(days=400 - day)
+            session.add(JournalEntry(title=f"Old {day}", reflection=reflection, created_at=created_at))
+        for day in range(recent):
+            created_at = now - dt.timedelta(days=1 - day)
+            session.add(JournalEntry(title=f"New {day}", reflection="Fresh", created_at=created_at))
+        session.commit()
+
+
+def _archive(batch_size: int = archive.BATCH_SIZE) -> tuple:
+    batches = []
+    with rx.session() as session:
+        moved = archive.archive_entries(session, archive.ArchivePolicy(batch_size=batch_size), batches.append)
+    return moved, batches
+
+
+def test_old_entries_move_in_batches_and_stay_in_the_workspace():
+    _journal(old=5, recent=2)
+
+    assert _archive(batch_size=2) == (5, [2, 2, 1])
+
+    state = DashboardState()
+    assert (state.journal_count, len(state.journal_entries)) == (7, 2)
+    with rx.session() as session:
+        assert len(session.exec(select(JournalEntry)).all()) == 2
+        stored = session.exec(select(ArchivedJournalEntry)).first()
+        assert len(stored.reflection_z) < len(archive.decompress_text(stored.reflection_z))
+        assert workspace.workspace_counts(session)["journal_entries"] == 7
+    exported = client.get("/api/export").json()["journal_entries"]
+    assert [entry["id"] for entry in exported] == list(range(1, 8))
+    assert exported[0]["reflection"] == " ".join(["Lesson 0"] * 20)
+    assert [entry["title"] for entry in client.get("/api/journals").json()] == ["New 0", "New 1"]
+
+
+def test_history_pages_and_searches_both_tiers():
+    _journal(old=4, recent=2)
+    _archive()
+
+    titles, cursor = [], None
+    while True:
+        page = client.get("/api/journals/history", params={"limit": 4, **({"cursor": cursor} if cursor else {})}).json()
+        titles += [(entry["title"], entry["archived"]) for entry in page["entries"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert titles == [("New 1", False), ("New 0", False), *((f"Old {day}", True) for day in (3, 2, 1, 0))]
+    found = client.get("/api/journals/history", params={"q": "LESSON 2"}).json()["entries"]
+    assert [entry["title"] for entry in found] == ["Old 2"]
+    assert client.get("/api/journals/history", params={"cursor": "nope"}).status_code == 400
+
+
+def test_snapshots_and_merges_keep_archived_entries():
+    _journal(old=3, recent=1)
+    _archive()
+    exported = WorkspaceImport.model_validate(client.get("/api/export").json())
+    buffer = io.BytesIO()
+
+    with rx.session() as session:
+        snapshot.write_snapshot(session, buffer)
+        changes = workspace.merge_workspace(session, exported)
+        assert changes["journal_entries"] == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 4}
+        assert archive.archived_count(session) == 3
+
+        # Archived entries are edited and deleted in the archive, never moved back.
+        edited = exported.model_copy(deep=True)
+        edited.journal_entries[0].reflection = "Rewritten"
+        del edited.journal_entries[1]
+        changes = workspace.merge_workspace(session, edited)
+        assert changes["journal_entries"] == {"inserted": 0, "updated": 1, "deleted": 1, "unchanged": 2}
+        assert archive.archived_count(session) == 2
+        assert len(session.exec(select(JournalEntry)).all()) == 1
+        assert [entry.title for entry in archive.iter_entries(session)] == ["Old 0", "Old 2", "New 0"]
+        assert next(archive.iter_entries(session)).reflection == "Rewritten"
+
+        restored = snapshot.restore_snapshot(session, snapshot.Snapshot(buffer.getvalue()))
+        assert restored["journal_entries"] == 4
+        assert archive.archived_count(session) == 0
+        assert _archive()[0] == 3
+
+
+def test_archive_job_and_deletes_reach_the_archive():
+    _journal(old=2, recent=0)
+
+    job = client.post("/api/admin/archive").json()
+    assert job_manager.wait(job["job_id"], timeout=10).result == {"archived": 2}
+
+    assert client.delete("/api/journals/1").status_code == 204
+    created = client.post("/api/journals", json={"title": "After", "reflection": "New id"}).json()
+    assert created["id"] == 3
+    assert [entry["id"] for entry in client.get("/api/export").json()["journal_entries"]] == [2, 3]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import sqlite3
+
+import pytest
+
+from imasterytracker import backup
+
+
+def _database(tmp_path, rows: int = 2000) -> str:
+    path = tmp_path / "source.db"
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT)")
+    connection.executemany("INSERT INTO note (body) VALUES (?)", [("x" * 500,)] * rows)
+    connection.commit()
+    connection.close()
+    return f"sqlite:///{path}"
+
+
+def _rows(path: str) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT count(*) FROM note").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_copies_in_steps_into_a_standalone_file(tmp_path):
+    url = _database(tmp_path)
+    policy = backup.BackupPolicy(directory=str(tmp_path / "backups"), pages_per_step=16, pause=0)
+    progress = []
+
+    result = backup.backup_database(url, policy, on_progress=lambda copied, total: progress.append(copied))
+
+    assert result.steps > 1 and progress[-1] == result.pages
+    assert _rows(result.path) == 2000
+    connection = sqlite3.connect(result.path)
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    connection.close()
+    assert os.listdir(policy.directory) == [os.path.basename(result.path)]
+
+
+def test_concurrent_writes_fall_back_to_a_single_step(tmp_path):
+    url = _database(tmp_path)
+    writer = sqlite3.connect(backup.sqlite_path(url), check_same_thread=False)
+    policy = backup.BackupPolicy(directory=str(tmp_path / "backups"), pages_per_step=8, pause=0, max_restarts=1)
+
+    def _write(copied: int, total: int) -> None:
+        writer.execute("INSERT INTO note (body) VALUES ('during')")
+        writer.commit()
+
+    result = backup.backup_database(url, policy, on_progress=_write)
+    writer.close()
+
+    assert result.restarts == 2
+    assert _rows(result.path) > 2000
+
+
+def test_retention_keeps_newest_and_drops_expired(tmp_path):
+    directory = tmp_path / "backups"
+    directory.mkdir()
+    now = dt.datetime(2026, 5, 10, tzinfo=dt.timezone.utc)
+    for days in range(5):
+        stamp = (now - dt.timedelta(days=days)).strftime("%Y%m%dT%H%M%S%fZ")
+        (directory / f"imastery-{stamp}.db").write_bytes(b"")
+    (directory / "notes.txt").write_text("ignored")
+
+    removed = backup.prune_backups(backup.BackupPolicy(str(directory), keep=4, max_age_days=2.5), now=now)
+
+    assert len(removed) == 2
+    assert [item.created_at.day for item in backup.list_backups(str(directory))] == [10, 9, 8]
+    assert backup.prune_backups(backup.BackupPolicy(str(directory), keep=1, max_age_days=0), now=now + dt.timedelta(days=9))
+    assert len(backup.list_backups(str(directory))) == 1
+
+
+def test_only_file_backed_sqlite_is_supported():
+    with pytest.raises(backup.BackupError):
+        backup.sqlite_path("sqlite://")
+    with pytest.raises(backup.BackupError):
+        backup.sqlite_path("postgresql://localhost/imastery")
+
+
+def test_every_workspace_shard_is_backed_up_with_the_same_retention(tmp_path, monkeypatch):
+    url = _database(tmp_path)
+    monkeypatch.setenv("IMASTERY_SHARD_DIR", str(tmp_path / "shards"))
+    (tmp_path / "shards").mkdir()
+    for workspace_id in ("team-a", "team-b"):
+        connection = sqlite3.connect(tmp_path / "shards" / f"{workspace_id}.db")
+        connection.execute("CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT)")
+        connection.close()
+    policy = backup.BackupPolicy(directory=str(tmp_path / "backups"), keep=1, pause=0)
+    progress = []
+
+    backup.backup_workspaces(url, policy)
+    results = backup.backup_workspaces(url, policy, on_progress=lambda copied, total: progress.append(copied))
+
+    assert list(results) == ["default", "team-a", "team-b"]
+    assert progress[-1] == sum(result.pages for result in results.values())
+    for workspace_id, result in results.items():
+        directory = backup.workspace_policy(policy, workspace_id).directory
+        assert [item.path for item in backup.list_backups(directory)] == [result.path]
+    assert os.path.dirname(results["team-a"].path) == str(tmp_path / "backups" / "workspaces" / "team-a")
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import reflex as rx
+from sqlmodel import delete, update
+from starlette.testclient import TestClient
+
+from imasterytracker.app import app
+from imasterytracker.changes import ChangeTracker, tracker
+from imasterytracker.export_cache import ExportCache
+from imasterytracker.models import Habit, Job, JournalEntry, LearningStream
+from imasterytracker.state import DashboardState
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_commits_bump_the_tables_they_touched():
+    before = tracker.versions()
+
+    with rx.session() as session:
+        session.add(Habit(name="Stretch"))
+        session.commit()
+        session.exec(update(LearningStream).values(focus="x"))
+        session.commit()
+        session.add(Job(id="job", kind="export"))
+        session.commit()
+
+    after = tracker.versions()
+    assert after["habits"] == before["habits"] + 1
+    assert after["streams"] == before["streams"] + 1
+    assert after["journal_entries"] == before["journal_entries"]
+
+
+def test_rolled_back_writes_are_not_published():
+    before = tracker.version()
+
+    with rx.session() as session:
+        session.add(JournalEntry(title="Draft", reflection="Never saved"))
+        session.flush()
+        session.exec(delete(Habit))
+        session.rollback()
+
+    assert tracker.version() == before
+
+
+def test_dashboard_events_invalidate_the_export_cache():
+    cache = ExportCache(lambda: iter([b"{}"]), tracker)
+    list(cache.stream(None))
+    assert cache.get(None) == b"{}"
+
+    state = DashboardState()
+    state.habit_name = "Daily review"
+    state.habit_cadence = "Daily"
+    state.add_habit()
+
+    assert cache.get(None) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_export_cache_never_keeps_a_body_built_across_a_write():
+    local = ChangeTracker()
+
+    def _chunks():
+        yield b"old"
+        local.bump({"habits"})
+        yield b"-data"
+
+    cache = ExportCache(_chunks, local)
+    assert b"".join(cache.stream(None)) == b"old-data"
+    assert cache.get(None) is None
+
+    cache = ExportCache(lambda: iter([b"x" * 10, b"y" * 10]), local, max_bytes=15)
+    assert len(b"".join(cache.stream(None))) == 20
+    assert cache.stats()["stores"] == 0 and cache.get(None) is None
+
+
+def test_write_in_another_process_is_seen_on_the_next_request(tmp_path):
+    client = TestClient(app._api)
+    with rx.session() as session:
+        engine = session.get_bind()
+    tracker.attach(engine)
+    try:
+        client.post("/api/habits", json={"name": "Local"})
+        client.get("/api/export")
+        assert client.get("/api/export").headers["x-export-cache"] == "hit"
+
+        # Worker A: a separate interpreter merging a habit into the same file.
+        payload = tmp_path / "remote.json"
+        payload.write_text(json.dumps({"habits": [{"name": "Local"}, {"name": "Remote"}]}))
+        subprocess.run(
+            [sys.executable, "-m", "imasterytracker.cli", "--db-url", str(engine.url), "import", "--merge", str(payload)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+
+        response = client.get("/api/export")
+        assert response.headers["x-export-cache"] == "miss"
+        assert sorted(habit["name"] for habit in response.json()["habits"]) == ["Local", "Remote"]
+        assert tracker.remote_changes >= 1
+        assert client.get("/api/export").headers["x-export-cache"] == "hit"
+    finally:
+        tracker.detach()
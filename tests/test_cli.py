@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlmodel import Session, create_engine, select
+
+from imasterytracker.cli import main
+from imasterytracker.models import JournalEntry, LearningStream
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Cumulative microseconds reported by ``python -X importtime`` for the CLI.
+IMPORT_BUDGET_US = 1_500_000
+
+
+def _workspace_file(tmp_path: Path) -> Path:
+    path = tmp_path / "workspace.json"
+    path.write_text(
+        json.dumps(
+            {
+                "streams": [{"name": "Rust", "milestones_total": 4, "milestones_completed": 1}],
+                "habits": [{"name": "Read docs"}],
+                "journal_entries": [{"title": "Lifetimes", "reflection": "Borrowing clicked."}],
+            }
+        )
+    )
+    return path
+
+
+def test_import_then_export_round_trip(tmp_path, capsys):
+    url = f"sqlite:///{tmp_path / 'cli.db'}"
+
+    assert main(["--db-url", url, "import", str(_workspace_file(tmp_path))]) == 0
+    assert main(["--db-url", url, "export"]) == 0
+
+    exported = json.loads(capsys.readouterr().out)
+    assert exported["streams"][0]["name"] == "Rust"
+    assert exported["journal_entries"][0]["reflection"] == "Borrowing clicked."
+    with Session(create_engine(url)) as session:
+        assert session.exec(select(LearningStream)).one().milestones_completed == 1
+        assert session.exec(select(JournalEntry)).one().title == "Lifetimes"
+
+
+def test_import_rejects_invalid_file(tmp_path, capsys):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"streams": [{"name": ""}]}))
+
+    assert main(["--db-url", f"sqlite:///{tmp_path / 'cli.db'}", "import", str(path)]) == 1
+    assert "streams.0.name" in capsys.readouterr().err
+
+
+def test_stats_and_vacuum(tmp_path, capsys):
+    url = f"sqlite:///{tmp_path / 'cli.db'}"
+    main(["--db-url", url, "import", str(_workspace_file(tmp_path))])
+    capsys.readouterr()
+
+    assert main(["--db-url", url, "vacuum"]) == 0
+    assert main(["--db-url", url, "stats"]) == 0
+
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["streams"] == 1
+    assert stats["journal_entries"] == 1
+    assert stats["file_bytes"] > 0
+
+
+def test_cli_import_stays_headless_and_within_budget():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, imasterytracker.cli; print('reflex' in sys.modules)",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "False"
+    match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| imasterytracker\.cli$", result.stderr, re.MULTILINE)
+    assert match, result.stderr[-2000:]
+    assert int(match.group(1)) < IMPORT_BUDGET_US
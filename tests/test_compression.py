@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from imasterytracker.compression import BodyTooLarge, compress, decompress, negotiate
+
+
+async def _aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _inflate(data: bytes, encoding: str, max_size: int = 1 << 30, step: int = 7) -> bytes:
+    async def _run() -> bytes:
+        pieces = [data[index : index + step] for index in range(0, len(data), step)]
+        return b"".join([chunk async for chunk in decompress(_aiter(pieces), encoding, max_size)])
+
+    return asyncio.run(_run())
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, None),
+        ("gzip, deflate, br", "gzip"),
+        ("deflate;q=1, gzip;q=0.5", "deflate"),
+        ("gzip;q=0, deflate;q=0", None),
+        ("*", "gzip"),
+        ("br, identity", None),
+    ],
+)
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def test_compressed_stream_round_trips():
+    chunks = [b'{"reflection": "repeat after me"}' * 100 for _ in range(50)]
+    body = b"".join(chunks)
+
+    gzipped = b"".join(compress(iter(chunks), "gzip"))
+    deflated = b"".join(compress(iter(chunks), "deflate"))
+
+    assert gzip.decompress(gzipped) == body
+    assert zlib.decompress(deflated) == body
+    assert len(gzipped) * 10 < len(body)
+    assert _inflate(gzipped, "gzip") == body
+    assert _inflate(deflated, "deflate") == body
+
+
+def test_decompress_accepts_raw_deflate_and_rejects_bad_input():
+    raw = zlib.compressobj(6, zlib.DEFLATED, -15)
+    data = raw.compress(b"hello " * 1000) + raw.flush()
+
+    assert _inflate(data, "deflate") == b"hello " * 1000
+    with pytest.raises(zlib.error):
+        _inflate(b"not gzip at all", "gzip")
+    with pytest.raises(zlib.error):
+        _inflate(gzip.compress(b"truncated" * 100)[:-12], "gzip")
+
+
+def test_decompress_enforces_size_limit():
+    bomb = gzip.compress(b"\0" * (4 * 1024 * 1024))
+
+    with pytest.raises(BodyTooLarge):
+        _inflate(bomb, "gzip", max_size=1024 * 1024, step=len(bomb))
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from starlette.testclient import TestClient
+
+from imasterytracker import archive, tenancy
+from imasterytracker.app import app
+from imasterytracker.entity_cache import EntityCache, cache
+from imasterytracker.state import DashboardState
+
+client = TestClient(app._api)
+
+
+def test_entities_are_read_through_and_evicted_by_their_writes():
+    stream = client.post("/api/streams", json={"name": "Rust", "milestones_total": 3}).json()
+    habit = client.post("/api/habits", json={"name": "Stretch"}).json()
+    url = f"/api/streams/{stream['id']}"
+
+    assert client.get(url).json() == stream
+    assert client.get(url).json() == stream
+    assert cache.stats()["hits"] == 1
+
+    DashboardState().update_stream_progress(stream["id"], 1)
+    assert client.get(url).json()["milestones_completed"] == 1
+
+    assert client.get(f"/api/habits/{habit['id']}").json()["last_completed_on"] is None
+    DashboardState().toggle_habit(habit["id"])
+    assert client.get(f"/api/habits/{habit['id']}").json()["last_completed_on"] is not None
+
+    client.delete(url)
+    assert client.get(url).status_code == 404
+    assert client.get("/api/streams/nope").status_code == 404
+
+    stats = client.get("/api/admin/cache").json()["entities"]
+    assert stats["hits"] == 1 and stats["evictions"] == 3 and stats["entries"] == 1 and stats["bytes"] > 0
+
+
+def test_bulk_writes_evict_the_whole_kind_and_archived_entries_are_served():
+    entry = client.post("/api/journals", json={"title": "Old", "reflection": "Kept cold."}).json()
+    assert client.get(f"/api/journals/{entry['id']}").json()["title"] == "Old"
+
+    with tenancy.session() as session:
+        assert archive.archive_entries(session, archive.ArchivePolicy(after_days=-1)) == 1
+    assert cache.stats()["entries"] == 0
+
+    assert client.get(f"/api/journals/{entry['id']}").json() == entry
+    client.delete(f"/api/journals/{entry['id']}")
+    assert client.get(f"/api/journals/{entry['id']}").status_code == 404
+
+
+def test_lru_is_bounded_and_a_write_during_load_is_not_kept():
+    bounded = EntityCache(max_entries=2, max_bytes=10)
+    for entity_id in range(3):
+        bounded.get("default", "habits", entity_id, lambda: b"{}")
+    assert bounded.get("default", "habits", 9, lambda: b"x" * 11) == b"x" * 11
+    assert bounded.stats()["entries"] == 2 and bounded.stats()["expirations"] == 1 and bounded.stats()["bytes"] == 4
+
+    def _load_racing_a_write() -> bytes:
+        bounded.evict("default", "streams", [1])
+        return b"stale"
+
+    assert bounded.get("default", "streams", 1, _load_racing_a_write) == b"stale"
+    assert bounded.get("default", "streams", 1, lambda: b"fresh") == b"fresh"
+    assert bounded.get("default", "streams", 1, lambda: b"again") == b"fresh"
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import zlib
+
+import pytest
+from sqlmodel import Session, create_engine, select
+
+from imasterytracker.generate import (
+    GeneratorConfig,
+    WorkspaceGenerator,
+    main,
+    write_database,
+    write_import_file,
+)
+from imasterytracker.models import ArchivedJournalEntry, TableVersion
+from imasterytracker.schemas import WorkspaceImport
+from imasterytracker.state import Habit, JournalEntry, LearningStream
+
+ANCHOR = dt.date(2026, 1, 15)
+
+
+def _config(**overrides) -> GeneratorConfig:
+    options = {"streams": 3, "habits": 4, "journals": 50, "seed": 7, "anchor": ANCHOR}
+    options.update(overrides)
+    return GeneratorConfig(**options)
+
+
+def test_same_seed_produces_identical_rows():
+    first = WorkspaceGenerator(_config())
+    second = WorkspaceGenerator(_config())
+
+    assert list(first.iter_journal_entries()) == list(second.iter_journal_entries())
+    assert list(first.iter_habits()) == list(second.iter_habits())
+
+    other = WorkspaceGenerator(_config(seed=8))
+    assert list(other.iter_journal_entries()) != list(first.iter_journal_entries())
+
+
+def test_config_rejects_moods_without_weight():
+    for moods in ({}, {"Calm": 0}, {"Calm": 2, "Stuck": -1}):
+        with pytest.raises(ValueError, match="Mood mix"):
+            _config(moods=moods)
+
+
+def test_rows_respect_configured_shape():
+    config = _config(
+        journals=500,
+        days=10,
+        moods={"Focused": 1},
+        reflection_words=(3, 5),
+        length_distribution="uniform",
+        checkin_density=1.0,
+    )
+    generator = WorkspaceGenerator(config)
+
+    entries = list(generator.iter_journal_entries())
+    assert {entry["mood"] for entry in entries} == {"Focused"}
+    assert all(3 <= len(entry["reflection"].split()) <= 5 for entry in entries)
+    oldest = dt.datetime.combine(ANCHOR, dt.time(12), tzinfo=dt.timezone.utc) - dt.timedelta(days=10)
+    assert all(entry["created_at"] >= oldest for entry in entries)
+    assert all(habit["last_completed_on"] == ANCHOR for habit in generator.iter_habits())
+
+
+def test_import_file_matches_workspace_import(tmp_path):
+    path = tmp_path / "workspace.json"
+
+    counts = write_import_file(WorkspaceGenerator(_config(batch_size=16)), str(path))
+
+    payload = WorkspaceImport.model_validate(json.loads(path.read_text()))
+    assert counts == {"streams": 3, "habits": 4, "journal_entries": 50}
+    generated = WorkspaceGenerator(_config(batch_size=16)).iter_journal_entries()
+    assert [entry.created_at for entry in payload.journal_entries] == [entry["created_at"] for entry in generated]
+    assert len(payload.journal_entries) == 50
+    assert payload.streams[0].name == "AI Engineering 1"
+
+
+def test_write_database_bulk_inserts_rows(tmp_path):
+    url = f"sqlite:///{tmp_path / 'generated.db'}"
+
+    write_database(WorkspaceGenerator(_config()), url)
+    with Session(create_engine(url)) as session:
+        created_at = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+        archived = ArchivedJournalEntry(id=999, title="Old", reflection_z=zlib.compress(b"Gone"), created_at=created_at)
+        session.add(archived)
+        session.commit()
+    counts = write_database(WorkspaceGenerator(_config(journals=20)), url, replace=True)
+
+    assert counts["journal_entries"] == 20
+    with Session(create_engine(url)) as session:
+        # Running apps notice both writes through the table versions.
+        versions = dict(session.exec(select(TableVersion.name, TableVersion.version)).all())
+        assert versions == {"streams": 2, "habits": 2, "journal_entries": 3}
+        assert session.exec(select(ArchivedJournalEntry)).all() == []
+        assert len(session.exec(select(LearningStream)).all()) == 3
+        assert len(session.exec(select(Habit)).all()) == 4
+        entries = session.exec(select(JournalEntry)).all()
+        assert len(entries) == 20
+        assert all(entry.created_at.date() <= ANCHOR for entry in entries)
+
+
+def test_cli_writes_output_file(tmp_path):
+    path = tmp_path / "cli.json"
+
+    exit_code = main(
+        ["--streams", "1", "--habits", "1", "--journals", "5", "--moods", "Curious=2,Stuck", "--output", str(path)]
+    )
+
+    assert exit_code == 0
+    data = json.loads(path.read_text())
+    assert len(data["journal_entries"]) == 5
+    assert {entry["mood"] for entry in data["journal_entries"]} <= {"Curious", "Stuck"}
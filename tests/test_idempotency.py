@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from imasterytracker.idempotency import IdempotencyStore, StoredResponse, request_fingerprint
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _entry(clock: _Clock, body: bytes = b"{}") -> StoredResponse:
+    return StoredResponse(request_fingerprint("POST", "/api/streams", body), 201, "application/json", body, clock())
+
+
+def test_lru_evicts_least_recently_used():
+    clock = _Clock()
+    store = IdempotencyStore(max_entries=2, clock=clock)
+    store.put("a", _entry(clock))
+    store.put("b", _entry(clock))
+    assert store.get("a") is not None
+
+    store.put("c", _entry(clock))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert len(store) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    store = IdempotencyStore(ttl_seconds=60, clock=clock)
+    store.put("a", _entry(clock))
+
+    clock.now += 61
+
+    assert store.get("a") is None
+
+
+def test_sqlite_persistence_survives_a_new_store(tmp_path):
+    clock = _Clock()
+    path = str(tmp_path / "idempotency.db")
+    IdempotencyStore(path=path, clock=clock).put("a", _entry(clock, b'{"id": 1}'))
+
+    restored = IdempotencyStore(path=path, clock=clock).get("a")
+
+    assert restored is not None
+    assert restored.body == b'{"id": 1}'
+    assert restored.status_code == 201
+
+
+def test_in_flight_keys_are_exclusive():
+    store = IdempotencyStore()
+
+    assert store.begin("a")
+    assert not store.begin("a")
+    store.finish("a")
+    assert store.begin("a")
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from imasterytracker import ingest
+from imasterytracker.ingest import InvalidWorkspace, _split, parse_workspace
+
+TRICKY = ('Tricky }},{{"text {}', "code: a}}, {{", 'back\\slash }}]"{}', "ends in }}, {{ \\")
+
+
+def _body(indent=None, journals: int = 40) -> bytes:
+    return json.dumps(
+        {
+            "streams": [{"name": "Rust"}, {"name": "Go", "milestones_total": 3}],
+            "habits": [],
+            "journal_entries": [
+                # Quotes, braces and escapes inside strings must not be taken for item boundaries.
+                {"title": f"Entry {index}", "reflection": TRICKY[index % len(TRICKY)].format(index)}
+                for index in range(journals)
+            ],
+        },
+        indent=indent,
+    ).encode()
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_chunked_validation_matches_single_pass(indent):
+    raw = _body(indent)
+    validated = []
+
+    chunked = parse_workspace(raw, processes=1, threshold=0, chunk_bytes=256, on_progress=validated.append)
+
+    assert chunked == parse_workspace(raw, threshold=len(raw) + 1)
+    assert len(validated) > 3
+    assert sum(validated) == 42
+
+
+def test_chunked_errors_report_absolute_index():
+    data = json.loads(_body())
+    data["journal_entries"][33]["reflection"] = ""
+
+    with pytest.raises(InvalidWorkspace, match=r"journal_entries\.33\.reflection"):
+        parse_workspace(json.dumps(data).encode(), processes=1, threshold=0, chunk_bytes=256)
+
+
+def test_nested_objects_fall_back_to_single_pass():
+    data = json.loads(_body())
+    data["journal_entries"][5]["meta"] = {"tags": [{"a": 1}, {"b": 2}]}
+    raw = json.dumps(data).encode()
+
+    assert _split(raw, 256) is None
+    assert len(parse_workspace(raw, processes=1, threshold=0, chunk_bytes=256).journal_entries) == 40
+
+
+def test_process_pool_matches_in_process_validation():
+    raw = _body(journals=200)
+
+    pooled = parse_workspace(raw, processes=2, threshold=0, chunk_bytes=2048)
+
+    assert pooled == parse_workspace(raw, processes=1, threshold=0, chunk_bytes=2048)
+
+
+def test_bad_cuts_fall_back_to_single_pass(monkeypatch):
+    raw = _body()
+    validated = []
+    spans = _split(raw, 256)
+    start, end, items = spans["journal_entries"][0]
+    spans["journal_entries"][0] = (start, end - 1, items)
+    monkeypatch.setattr(ingest, "_split", lambda raw, chunk_bytes: spans)
+
+    parsed = parse_workspace(raw, processes=1, threshold=0, on_progress=validated.append)
+
+    assert parsed == parse_workspace(raw, threshold=len(raw) + 1)
+    assert sum(validated) == 42
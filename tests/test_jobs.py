@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from imasterytracker import tenancy, workspace
+from imasterytracker.jobs import JobManager, QueueFull
+from imasterytracker.models import Job
+
+
+def _import_body(journals: int = 3) -> bytes:
+    return json.dumps(
+        {
+            "streams": [{"name": "Rust", "milestones_total": 2}],
+            "journal_entries": [{"reflection": f"Note {index}"} for index in range(journals)],
+        }
+    ).encode()
+
+
+def test_import_job_reports_progress_and_result(tmp_path):
+    manager = JobManager(artifact_dir=str(tmp_path))
+
+    job = manager.submit_import(_import_body())
+    assert job.status == "queued"
+    done = manager.wait(job.id, timeout=10)
+
+    assert done.status == "succeeded"
+    assert done.rows_total == done.rows_validated == done.rows_written == 4
+    assert done.result == {"counts": {"streams": 1, "habits": 0, "journal_entries": 3}}
+    assert done.started_at is not None and done.finished_at is not None
+
+
+def test_cancel_queued_and_running_jobs(monkeypatch, tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def _blocking_replace(session, payload, on_progress=None):
+        started.set()
+        release.wait(5)
+        on_progress(1)
+
+    monkeypatch.setattr(workspace, "replace_workspace", _blocking_replace)
+    manager = JobManager(max_workers=1, artifact_dir=str(tmp_path))
+    running = manager.submit_import(_import_body())
+    queued = manager.submit_import(_import_body())
+    assert started.wait(5)
+
+    assert manager.cancel(queued.id)
+    assert manager.get(queued.id).status == "cancelled"
+    assert manager.cancel(running.id)
+    release.set()
+
+    assert manager.wait(running.id, timeout=10).status == "cancelled"
+    assert not manager.cancel(running.id)
+
+
+def test_queue_is_bounded(monkeypatch, tmp_path):
+    release = threading.Event()
+    monkeypatch.setattr(workspace, "replace_workspace", lambda *args, **kwargs: release.wait(5))
+    manager = JobManager(max_workers=1, max_pending=1, artifact_dir=str(tmp_path))
+
+    job = manager.submit_import(_import_body())
+    with pytest.raises(QueueFull):
+        manager.submit_import(_import_body())
+    release.set()
+    assert manager.wait(job.id, timeout=10).status == "succeeded"
+
+
+def _orphan(job_id: str, owner: str, heartbeat_age: float = 0) -> None:
+    with tenancy.session() as session:
+        heartbeat = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=heartbeat_age)
+        session.add(Job(id=job_id, kind="import", status="running", owner=owner, heartbeat_at=heartbeat))
+        session.commit()
+
+
+def test_recover_only_fails_jobs_whose_owner_is_gone(tmp_path):
+    gone = subprocess.Popen([sys.executable, "-c", "pass"])
+    gone.wait()
+    host = socket.gethostname()
+    _orphan("sibling", f"{host}:{os.getppid()}", heartbeat_age=3600)
+    _orphan("dead", f"{host}:{gone.pid}")
+    _orphan("remote-live", "elsewhere:1")
+    _orphan("remote-stale", "elsewhere:2", heartbeat_age=3600)
+    _orphan("legacy", "")
+    manager = JobManager(artifact_dir=str(tmp_path), stale_after=60)
+
+    assert manager.recover() == 3
+    ids = ("sibling", "dead", "remote-live", "remote-stale", "legacy")
+    assert {job_id: manager.get(job_id).status for job_id in ids} == {
+        "sibling": "running",
+        "dead": "failed",
+        "remote-live": "running",
+        "remote-stale": "failed",
+        "legacy": "failed",
+    }
+
+
+def test_another_worker_can_cancel_a_running_job(monkeypatch, tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def _blocking_replace(session, payload, on_progress=None):
+        started.set()
+        release.wait(5)
+        on_progress(1)
+
+    monkeypatch.setattr(workspace, "replace_workspace", _blocking_replace)
+    runner = JobManager(max_workers=1, artifact_dir=str(tmp_path), cancel_poll_seconds=0)
+    other = JobManager(artifact_dir=str(tmp_path))
+    running = runner.submit_import(_import_body())
+    assert started.wait(5)
+
+    assert other.cancel(running.id)
+    release.set()
+
+    assert runner.wait(running.id, timeout=10).status == "cancelled"
+    assert not other.cancel(running.id)
+
+
+def test_live_jobs_heartbeat(monkeypatch, tmp_path):
+    release = threading.Event()
+    monkeypatch.setattr(workspace, "replace_workspace", lambda *args, **kwargs: release.wait(5))
+    manager = JobManager(artifact_dir=str(tmp_path), heartbeat_seconds=0.01, stale_after=1)
+    job = manager.submit_import(_import_body())
+
+    def _heartbeat() -> dt.datetime:
+        with tenancy.read_session() as session:
+            return session.get(Job, job.id).heartbeat_at
+
+    first = _heartbeat()
+    deadline = time.monotonic() + 5
+    while _heartbeat() == first and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+
+    assert _heartbeat() > first
+    assert manager.wait(job.id, timeout=10).status == "succeeded"
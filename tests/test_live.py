@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+
+import reflex as rx
+
+from imasterytracker.changes import ChangeTracker
+from imasterytracker.live import ChangeHub
+from imasterytracker.models import Habit
+from imasterytracker.state import DashboardState
+
+
+def _hub(tracker: ChangeTracker) -> ChangeHub:
+    hub = ChangeHub(settle=0)
+    tracker.subscribe(functools.partial(hub.publish, "default"))
+    return hub
+
+
+def _changed_vars(state: DashboardState) -> set[str]:
+    delta = state.get_delta()
+    state._clean()
+    return {name.rsplit("_rx_state_", 1)[0] for name in delta.get(state.get_full_name(), {})}
+
+
+def test_bursts_coalesce_into_one_wakeup_per_tab():
+    tracker = ChangeTracker()
+    hub = _hub(tracker)
+
+    async def scenario():
+        tabs = [hub.subscribe(f"tab-{index}") for index in range(300)]
+        for _ in range(50):
+            tracker.bump({"habits"})
+        tracker.bump({"streams"})
+        received = await asyncio.gather(*(tab.next(timeout=1) for tab in tabs))
+        follow_up = await tabs[0].next(timeout=0.01)
+        return received, follow_up
+
+    received, follow_up = asyncio.run(scenario())
+
+    assert all(tables == {"habits", "streams"} for tables in received)
+    assert follow_up == frozenset()
+    assert hub.stats() == {"subscribers": 300, "published": 51, "deliveries": 51 * 300}
+
+
+def test_writes_on_other_threads_wake_subscribers():
+    tracker = ChangeTracker()
+    hub = _hub(tracker)
+
+    async def scenario():
+        tab = hub.subscribe("tab")
+        writer = threading.Thread(target=tracker.bump, args=({"journal_entries"},))
+        writer.start()
+        tables = await tab.next(timeout=1)
+        writer.join()
+        return tables
+
+    assert asyncio.run(scenario()) == {"journal_entries"}
+
+
+def test_resubscribing_a_tab_closes_its_previous_watcher():
+    hub = ChangeHub(settle=0)
+
+    async def scenario():
+        first = hub.subscribe("tab")
+        second = hub.subscribe("tab")
+        closed = await first.next(timeout=1)
+        first.close()
+        return closed, second
+
+    closed, second = asyncio.run(scenario())
+
+    assert closed is None
+    assert hub.stats()["subscribers"] == 1 and not second.closed
+
+
+def test_refresh_recomputes_only_the_changed_section():
+    state = DashboardState()
+    state._refresh()
+    _changed_vars(state)
+    assert state.total_habits == 0 and state.total_streams == 0
+
+    # Written by another client, e.g. ``POST /api/habits``.
+    with rx.session() as session:
+        session.add(Habit(name="Stretch"))
+        session.commit()
+    assert _changed_vars(state) == set()
+
+    state._refresh({"habits"})
+    changed = _changed_vars(state)
+
+    assert {"habits", "total_habits", "habit_consistency_copy"} <= changed
+    assert not changed & {"streams", "total_streams", "journal_entries", "journal_count"}
+    assert state.total_habits == 1
+
+
+def test_local_events_refresh_their_own_section():
+    state = DashboardState()
+    _changed_vars(state)
+    assert state.journal_count == 0
+
+    state.journal_title = "Found the bottleneck"
+    state.journal_reflection = "The ORM write, not the parse."
+    state.add_journal_entry()
+
+    assert "journal_count" in _changed_vars(state)
+    assert state.journal_count == 1
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import datetime as dt
+import threading
+
+import reflex as rx
+from sqlalchemy import event
+from sqlmodel import Session, select
+from starlette.testclient import TestClient
+
+from imasterytracker import db
+from imasterytracker.app import app
+from imasterytracker.maintenance import Maintenance, MaintenancePolicy
+from imasterytracker.models import Habit, JournalEntry
+from imasterytracker.tombstones import INCLUDE_DELETED
+
+client = TestClient(app._api)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _tombstones(count: int, days_ago: float) -> None:
+    deleted_at = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=days_ago)
+    with rx.session() as session:
+        session.add_all(Habit(name=f"h{index}", deleted_at=deleted_at) for index in range(count))
+        session.commit()
+
+
+def _rows(model) -> int:
+    with rx.session() as session:
+        return len(session.exec(select(model).execution_options(**{INCLUDE_DELETED: True})).all())
+
+
+def test_purges_expired_tombstones_in_batches_then_tidies_up():
+    _tombstones(5, days_ago=40)
+    _tombstones(2, days_ago=1)
+    with rx.session() as session:
+        session.add(JournalEntry(title="Keep", reflection="Live rows stay."))
+        session.commit()
+
+        report = Maintenance(MaintenancePolicy(batch_size=2)).run("default", session)
+
+    assert report["purged"] == {"learningstream": 0, "habit": 5, "journalentry": 0, "archivedjournalentry": 0}
+    assert not report["interrupted"] and "analyze_seconds" in report
+    assert report["vacuum"]["auto_vacuum"] in ("none", "incremental")
+    assert _rows(Habit) == 2 and _rows(JournalEntry) == 1
+
+
+def test_waits_for_idle_and_yields_to_writes():
+    clock = _Clock()
+    maintainer = Maintenance(MaintenancePolicy(batch_size=1, idle_seconds=60), clock=clock)
+    _tombstones(3, days_ago=40)
+    maintainer.record_write("default", frozenset({"habits"}))
+
+    with rx.session() as session:
+        assert maintainer.run("default", session) is None
+        clock.now = 61
+        report = maintainer.run("default", session)
+        assert report["purged"]["habit"] == 3  # its own deletes do not count as activity
+
+        _tombstones(3, days_ago=40)
+        clock.now = 200
+
+        def _user_write(session) -> None:
+            writer = threading.Thread(target=maintainer.record_write, args=("default", frozenset({"habits"})))
+            writer.start()
+            writer.join()
+
+        event.listen(session, "after_commit", _user_write)
+        report = maintainer.run("default", session)
+
+    assert report["interrupted"] and report["purged"]["habit"] == 1 and "vacuum" not in report
+    stats = maintainer.stats()
+    assert stats["skipped_busy"] == 1 and stats["runs"] == 2 and stats["interrupted"] == 1
+    assert stats["purged"]["habit"] == 4
+
+
+def test_incremental_vacuum_returns_free_pages(tmp_path):
+    engine = db.get_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    db.enable_wal(engine)
+
+    with Session(engine) as session:
+        session.add_all(JournalEntry(title="t", reflection="x" * 2000) for _ in range(200))
+        session.commit()
+        session.exec(JournalEntry.__table__.delete())
+        session.commit()
+
+        report = Maintenance(MaintenancePolicy()).run("default", session, force=True)
+
+    assert report["vacuum"]["auto_vacuum"] == "incremental"
+    assert report["vacuum"]["pages_freed"] > 0 and report["vacuum"]["free_pages"] == 0
+    assert report["checkpoint"]["busy"] is False
+
+
+def test_metrics_endpoint_reports_runs():
+    _tombstones(1, days_ago=40)
+
+    report = client.post("/api/admin/maintenance").json()
+    stats = client.get("/api/admin/maintenance").json()
+
+    assert report["purged"]["habit"] == 1
+    assert stats["last"]["default"]["purged"]["habit"] == 1 and stats["purged"]["habit"] >= 1
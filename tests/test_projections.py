@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+
+import reflex as rx
+from reflex.utils.format import json_dumps
+
+from imasterytracker import projections
+from imasterytracker.models import Habit, JournalEntry, LearningStream
+
+
+def test_cards_are_newest_first_and_carry_only_rendered_fields():
+    earlier = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    with rx.session() as session:
+        session.add(LearningStream(name="Old", focus="f", created_at=earlier))
+        session.add(LearningStream(name="New", focus="f", milestones_total=3, milestones_completed=1))
+        session.add(Habit(name="Stretch", last_completed_on=dt.date(2024, 5, 1)))
+        session.commit()
+
+        streams = projections.stream_cards(session)
+        habits = projections.habit_cards(session)
+
+    assert [stream.name for stream in streams] == ["New", "Old"]
+    assert json.loads(json_dumps(streams[0])) == {
+        "id": 2,
+        "name": "New",
+        "focus": "f",
+        "milestones_total": 3,
+        "milestones_completed": 1,
+        "color": "#6366F1",
+    }
+    assert json.loads(json_dumps(habits[0]))["last_completed_on"] == "2024-05-01"
+    assert not hasattr(streams[0], "__dict__")
+
+
+def test_journal_cards_keep_the_timestamp_the_card_shows():
+    with rx.session() as session:
+        session.add(JournalEntry(title="Insight", reflection="Batch the writes.", mood="Focused"))
+        session.commit()
+        (entry,) = projections.journal_cards(session)
+
+    assert (entry.title, entry.reflection, entry.mood) == ("Insight", "Batch the writes.", "Focused")
+    assert isinstance(entry.created_at, dt.datetime)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import threading
+
+from imasterytracker import app, scheduler
+from imasterytracker.scheduler import Scheduler
+
+
+def test_a_run_is_skipped_while_another_worker_holds_the_lock(tmp_path):
+    runs = []
+    path = str(tmp_path / ".imastery-backup.lock")
+    first = Scheduler(lambda: runs.append("first"), 0, "backup", path)
+    second = Scheduler(lambda: runs.append("second"), 0, "backup", path)
+
+    with open(path, "a+") as held:
+        fcntl.flock(held, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert first.run_once() is False
+        fcntl.flock(held, fcntl.LOCK_UN)
+
+    assert first.run_once() and second.run_once()
+    assert runs == ["first", "second"]
+
+
+def test_a_tick_just_after_another_workers_run_is_skipped(tmp_path):
+    runs = []
+    path = str(tmp_path / ".imastery-archive.lock")
+    workers = [Scheduler(lambda: runs.append(1), 3600, "archive", path) for _ in range(3)]
+
+    assert [worker.run_once() for worker in workers] == [True, False, False]
+    assert runs == [1]
+
+
+def test_lock_files_sit_beside_the_database(tmp_path, monkeypatch):
+    assert scheduler.lock_path("backup", f"sqlite:///{tmp_path / 'app.db'}") == str(tmp_path / ".imastery-backup.lock")
+    assert scheduler.lock_path("backup", "sqlite://") is None
+    monkeypatch.setenv("IMASTERY_LOCK_DIR", str(tmp_path / "locks"))
+    assert scheduler.lock_path("backup", "sqlite://") == str(tmp_path / "locks" / ".imastery-backup.lock")
+
+
+def test_schedulers_stop_with_the_app(monkeypatch, tmp_path):
+    ran = threading.Event()
+    schedule = Scheduler(ran.set, 0.01, "maintenance", str(tmp_path / ".imastery-maintenance.lock"))
+    monkeypatch.setattr(app, "backup_scheduler", None)
+    monkeypatch.setattr(app, "archive_scheduler", None)
+    monkeypatch.setattr(app, "maintenance_scheduler", schedule)
+
+    async def _lifespan():
+        async with app.run_schedulers():
+            assert ran.wait(5)
+            thread = schedule._thread
+        return thread
+
+    thread = asyncio.run(_lifespan())
+    assert not thread.is_alive() and schedule._thread is None
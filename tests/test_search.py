@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import reflex as rx
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from starlette.testclient import TestClient
+
+from imasterytracker import archive, cli, search, shards, workspace
+from imasterytracker.app import app
+from imasterytracker.models import Habit, JournalEntry, LearningStream
+from imasterytracker.schemas import WorkspaceImport
+from imasterytracker.state import DashboardState
+
+client = TestClient(app._api)
+
+LONG_AGO = dt.datetime(2023, 1, 2, tzinfo=dt.timezone.utc)
+
+
+INDEXED = text("SELECT rowid, title, body FROM searchindex ORDER BY rowid")
+
+
+def _indexed() -> list:
+    with rx.session() as session:
+        return [tuple(row) for row in session.execute(INDEXED)]
+
+
+def _rebuilt() -> list:
+    with rx.session() as session:
+        search.rebuild(session)
+        rows = [tuple(row) for row in session.execute(INDEXED)]
+        session.rollback()
+    return rows
+
+
+def _found(**params) -> list:
+    response = client.get("/api/search", params=params)
+    assert response.status_code == 200
+    return [(hit["kind"], hit["title"]) for hit in response.json()["hits"]]
+
+
+def test_index_follows_every_write_path():
+    client.post("/api/streams", json={"name": "Compiler Design", "focus": "Write a register allocator."})
+    client.post("/api/habits", json={"name": "Code Kata", "context": "One parser exercise a day."})
+    client.post("/api/journals", json={"title": "Parsing", "reflection": "Pratt parsers clicked.", "mood": "Focused"})
+    state = DashboardState()
+    state.journal_title, state.journal_reflection, state.journal_mood = "Allocation", "Graph colouring.", "Curious"
+    state.add_journal_entry()
+    state.toggle_habit(1)
+    assert _indexed() == _rebuilt()
+    assert (search.STREAMS.rowid(1), "Compiler Design", "Write a register allocator.") in _indexed()
+
+    with rx.session() as session:
+        stream = session.get(LearningStream, 1)
+        stream.focus = "Write a garbage collector."
+        session.add(stream)
+        session.commit()
+    client.delete("/api/journals/1")
+    state.remove_habit(1)
+    assert _indexed() == _rebuilt()
+    assert [title for _, title, _ in _indexed()] == ["Compiler Design", "Allocation"]
+    assert _found(q="garbage") == [("stream", "Compiler Design")]
+    assert _found(q="register") == []
+
+
+def test_bulk_writes_reindex_and_archiving_keeps_entries_searchable():
+    with rx.session() as session:
+        session.add_all(
+            [
+                JournalEntry(title="Old notes", reflection="Spaced repetition works.", created_at=LONG_AGO),
+                Habit(name="Reading Sprint", context="Twenty pages."),
+            ]
+        )
+        session.commit()
+        before = _indexed()
+
+        assert archive.archive_entries(session, archive.ArchivePolicy(after_days=30)) == 1
+        assert _indexed() == before
+        assert _found(q="repetition") == [("journal", "Old notes")]
+
+        workspace.merge_workspace(session, WorkspaceImport(habits=[{"name": "Weekly Review", "cadence": "Weekly"}]))
+        assert _indexed() == _rebuilt()
+        assert _found(q="weekly") == [("habit", "Weekly Review")]
+
+        workspace.replace_workspace(session, WorkspaceImport(streams=[{"name": "Statistics"}]))
+    assert _indexed() == _rebuilt()
+    assert [title for _, title, _ in _indexed()] == ["Statistics"]
+
+
+def test_search_ranks_prefix_and_misspelt_matches(monkeypatch):
+    with rx.session() as session:
+        session.add_all(
+            [
+                LearningStream(name="Product Strategy", focus="Run weekly experiments."),
+                Habit(name="Deep Work Block", context="Strategy notes before meetings."),
+                JournalEntry(title="Café retro", reflection="Our strategy needs sharper experiments."),
+            ]
+        )
+        session.commit()
+
+    # Titles outrank bodies; words match as prefixes, accents aside.
+    assert _found(q="strat") == [
+        ("stream", "Product Strategy"),
+        ("habit", "Deep Work Block"),
+        ("journal", "Café retro"),
+    ]
+    assert _found(q="cafe", kinds="journal") == [("journal", "Café retro")]
+    assert _found(q="stratgey experimnts") == [("stream", "Product Strategy"), ("journal", "Café retro")]
+    assert _found(q="strat", kinds="habit,journal", limit="1") == [("habit", "Deep Work Block")]
+    assert _found(q="zebra") == []
+
+    hit = client.get("/api/search", params={"q": "sharper"}).json()["hits"][0]
+    assert hit["id"] == 1 and hit["score"] > 0 and "sharper experiments" in hit["snippet"]
+
+    # Broad queries rank only each kind's newest matches.
+    with rx.session() as session:
+        session.add(JournalEntry(title="Later", reflection="More strategy."))
+        session.commit()
+    monkeypatch.setattr(search, "RANK_WINDOW", 1)
+    assert _found(q="strategy", kinds="journal") == [("journal", "Later")]
+
+    for params in ({}, {"q": "  "}, {"q": "x", "kinds": "notes"}, {"q": "x", "limit": "0"}, {"q": "x", "page": "2"}):
+        assert client.get("/api/search", params=params).status_code == 400
+
+
+def test_dashboard_search_box_and_cli_rebuild(capsys):
+    with rx.session() as session:
+        session.add(LearningStream(name="Distributed Systems", focus="Consensus protocols."))
+        session.commit()
+        session.execute(text("DELETE FROM searchindex"))
+        session.commit()
+
+    state = DashboardState()
+    state.search_query = "consensus"
+    assert state.search_hits == []
+
+    assert cli.main(["search", "--rebuild", "consensus"]) == 0
+    assert '"title": "Distributed Systems"' in capsys.readouterr().out
+    state.search_query = "consensus protocols"
+    assert [hit.title for hit in state.search_hits] == ["Distributed Systems"]
+    assert cli.main(["search"]) == 1
+
+
+def test_autogenerate_leaves_the_search_index_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'head.db'}")
+    shards.migrate(engine)
+    config = Config()
+    config.set_main_option("script_location", shards.MIGRATIONS_DIR)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.check(config)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+import reflex as rx
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import OperationalError
+from sqlmodel import select
+from starlette.testclient import TestClient
+
+from imasterytracker import cli, db, shards, tenancy
+from imasterytracker.api import job_manager
+from imasterytracker.app import app
+from imasterytracker.models import Habit
+from imasterytracker.shards import DEFAULT_WORKSPACE, ShardPool
+
+client = TestClient(app._api)
+
+
+def test_workspaces_do_not_see_each_others_data():
+    team = {"X-Workspace": "team-a"}
+    created = client.post("/api/streams", json={"name": "Shared nothing"}, headers=team)
+    assert created.status_code == 201
+
+    assert [stream["name"] for stream in client.get("/api/streams", headers=team).json()] == ["Shared nothing"]
+    assert client.get("/api/streams").json() == []
+    assert client.get("/api/streams", headers={"X-Workspace": "team-b"}).json() == []
+    assert client.get("/api/streams?workspace=team-a").json()[0]["id"] == created.json()["id"]
+    assert os.path.exists(shards.shard_url("team-a", db.database_url())[len("sqlite:///") :])
+
+    stats = client.get("/api/admin/cache", headers=team).json()["changes"]
+    assert stats["workspace"] == "team-a" and stats["versions"]["streams"] >= 1
+    assert client.get("/api/admin/cache").json()["changes"]["workspace"] == DEFAULT_WORKSPACE
+
+
+def test_exports_and_jobs_stay_in_their_workspace():
+    team = {"X-Workspace": "team-export"}
+    client.post("/api/habits", json={"name": "Stretch"}, headers=team)
+
+    assert [habit["name"] for habit in client.get("/api/export", headers=team).json()["habits"]] == ["Stretch"]
+    assert client.get("/api/export").json()["habits"] == []
+
+    job = client.post("/api/exports", headers=team).json()
+    job_manager.wait(job["job_id"], timeout=10)
+    assert client.get(f"/api/jobs/{job['job_id']}", headers=team).json()["status"] == "succeeded"
+    assert client.get(f"/api/jobs/{job['job_id']}").status_code == 404
+
+
+def test_invalid_workspace_ids_are_rejected():
+    response = client.get("/api/streams", headers={"X-Workspace": "../escape"})
+
+    assert response.status_code == 400
+    assert "Workspace id" in response.json()["detail"]
+
+
+def test_pool_keeps_only_the_most_recently_used_engines(tmp_path):
+    closed = []
+    pool = ShardPool(max_engines=2, on_close=lambda workspace_id, engine: closed.append(workspace_id))
+    url = lambda name: f"sqlite:///{tmp_path / name}.db"  # noqa: E731
+
+    first = pool.engine("a", url("a"))
+    pool.engine("b", url("b"))
+    assert pool.engine("a", url("a")) is first
+    pool.engine("c", url("c"))
+
+    assert closed == ["b"]
+    assert pool.stats() == {"open": 2, "max": 2, "opens": 3, "evictions": 1}
+    assert "journalentry" in inspect(first).get_table_names()
+    pool.close()
+
+
+def test_cli_creates_and_lists_migrated_shards(capsys):
+    assert cli.main(["--workspace", "cli-team", "stats"]) == 0
+    assert cli.main(["workspaces", "--migrate"]) == 0
+
+    assert capsys.readouterr().out.splitlines()[-1] == "cli-team"
+    assert tenancy.pool.stats()["open"] == 0
+
+
+def test_reads_go_through_the_read_only_pool():
+    client.post("/api/habits", json={"name": "Stretch"})
+    statements = []
+    event.listen(tenancy.reader(DEFAULT_WORKSPACE), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert [habit["name"] for habit in client.get("/api/habits").json()] == ["Stretch"]
+    assert len(statements) == 1
+
+    with rx.session() as session, tenancy.read_session() as read_only:
+        assert read_only.get(Habit, 1).name == "Stretch"
+        read_only.add(Habit(name="Sneaky"))
+        with pytest.raises(OperationalError, match="readonly"):
+            read_only.commit()
+        assert len(session.exec(select(Habit)).all()) == 1
+
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import datetime as dt
+import io
+import json
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from imasterytracker import ingest, snapshot, tombstones, workspace
+from imasterytracker.models import Habit, JournalEntry, LearningStream
+
+
+def _session() -> Session:
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+
+def _populate(session: Session) -> None:
+    session.add_all(
+        [
+            LearningStream(name="Rust", focus="Ownership", milestones_total=4, milestones_completed=1, color="#123456"),
+            LearningStream(name="Gö — ünïcode", milestones_total=2, color="#abcdef"),
+            Habit(name="Read docs", context="", last_completed_on=dt.date(2026, 3, 9)),
+            Habit(name="Kata", cadence="Weekly"),
+            JournalEntry(
+                title="Lifetimes",
+                reflection="Borrowing clicked.\n\"Quoted\" and 🦀",
+                created_at=dt.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt.timezone.utc),
+            ),
+            JournalEntry(title="Second", reflection="x", mood="Calm"),
+        ]
+    )
+    session.commit()
+
+
+def _snapshot_bytes(session: Session) -> bytes:
+    handle = io.BytesIO()
+    snapshot.write_snapshot(session, handle)
+    return handle.getvalue()
+
+
+def test_snapshot_round_trips_to_the_json_export():
+    with _session() as session:
+        _populate(session)
+        raw = _snapshot_bytes(session)
+        expected = json.loads(workspace.export_workspace(session).model_dump_json())
+
+    decoded = snapshot.Snapshot(raw).to_export()
+
+    assert raw.startswith(snapshot.MAGIC)
+    assert json.loads(decoded.model_dump_json()) == expected
+
+
+def test_snapshot_import_matches_json_import():
+    with _session() as session:
+        _populate(session)
+        raw = _snapshot_bytes(session)
+        body = workspace.export_workspace(session).model_dump_json().encode()
+
+    assert snapshot.read_workspace(raw) == ingest.parse_workspace(body)
+
+
+def test_restore_reproduces_the_export_exactly():
+    with _session() as session:
+        _populate(session)
+        raw = _snapshot_bytes(session)
+        expected = workspace.export_workspace(session).model_dump_json()
+
+    written = []
+    with _session() as session:
+        session.add_all(LearningStream(name=name, milestones_total=1) for name in ("Stale", "Older", "Gone"))
+        session.commit()
+        counts = snapshot.restore_snapshot(session, snapshot.Snapshot(raw), on_progress=written.append)
+
+        assert counts == {"streams": 2, "habits": 2, "journal_entries": 2}
+        assert sum(written) == 6
+        assert workspace.export_workspace(session).model_dump_json() == expected
+
+        # Ids the snapshot reuses are overwritten; the rest are left as tombstones.
+        everything = select(LearningStream.id, LearningStream.name, LearningStream.deleted_at.is_not(None))
+        rows = session.exec(everything.execution_options(**{tombstones.INCLUDE_DELETED: True})).all()
+        assert [tuple(row) for row in rows] == [(1, "Rust", False), (2, "Gö — ünïcode", False), (3, "Gone", True)]
+
+
+def test_tables_can_be_read_from_a_mapped_file_without_the_rest(tmp_path):
+    path = tmp_path / "workspace.snap"
+    with _session() as session, open(path, "wb") as handle:
+        _populate(session)
+        snapshot.write_snapshot(session, handle)
+
+    with snapshot.Snapshot.open(str(path)) as opened:
+        assert opened.version == snapshot.VERSION
+        assert {name: table.rows for name, table in opened.tables.items()} == {
+            "streams": 2,
+            "habits": 2,
+            "journal_entries": 2,
+        }
+        assert opened.column("habits", "last_completed_on") == [dt.date(2026, 3, 9), None]
+        assert opened.column("streams", "name") == ["Rust", "Gö — ünïcode"]
+
+
+def test_rejects_foreign_truncated_and_newer_files():
+    with _session() as session:
+        _populate(session)
+        raw = _snapshot_bytes(session)
+
+    with pytest.raises(snapshot.SnapshotError, match="Not an iMastery snapshot"):
+        snapshot.Snapshot(b'{"streams": []}' + b" " * 32)
+    with pytest.raises(snapshot.SnapshotError, match="truncated"):
+        snapshot.Snapshot(raw[: len(raw) // 2])
+    newer = bytearray(raw)
+    newer[8:10] = (snapshot.VERSION + 1).to_bytes(2, "little")
+    with pytest.raises(snapshot.SnapshotError, match="newer"):
+        snapshot.Snapshot(bytes(newer))
+
+
+def test_invalid_rows_report_their_location():
+    with _session() as session:
+        session.add(JournalEntry(title="Fine", reflection="ok"))
+        session.add(JournalEntry(title="Bad", reflection=""))
+        session.commit()
+        raw = _snapshot_bytes(session)
+
+    with pytest.raises(snapshot.SnapshotError, match=r"journal_entries\.1\.reflection"):
+        snapshot.read_workspace(raw)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import time
+
+import reflex as rx
+from sqlalchemy import inspect
+from sqlmodel import create_engine
+
+from imasterytracker.app import on_startup
+from imasterytracker.startup import StartupProfiler
+from imasterytracker.state import DashboardState
+
+
+def test_profiler_accumulates_marks_and_phases():
+    profiler = StartupProfiler()
+    time.sleep(0.01)
+    profiler.mark("imports")
+
+    @profiler.timed("pages")
+    def build() -> str:
+        time.sleep(0.01)
+        return "page"
+
+    assert build() == "page"
+    build()
+    with profiler.phase("models"):
+        pass
+
+    report = profiler.report()
+    assert report["imports"] >= 10
+    assert report["pages"] >= 20
+    assert set(report) == {"imports", "pages", "models", "ready"}
+    assert report["ready"] >= report["imports"] + report["pages"]
+
+
+def test_db_backed_vars_compile_without_queries():
+    for name in ("streams", "journal_entries", "milestone_completion", "latest_journal_title"):
+        var = DashboardState.computed_vars[name]
+        assert isinstance(var._initial_value, (list, int, str))
+
+
+def test_on_startup_creates_tables_and_reports(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    monkeypatch.setattr(rx.Model, "get_db_engine", staticmethod(lambda: engine))
+
+    timings = on_startup()
+
+    assert {"learningstream", "habit", "journalentry"} <= set(inspect(engine).get_table_names())
+    assert timings["ready"] >= timings["models"]
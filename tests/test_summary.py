@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import reflex as rx
+from sqlalchemy import event
+from starlette.testclient import TestClient
+
+from imasterytracker import summary, tenancy
+from imasterytracker.app import app
+from imasterytracker.models import Habit, JournalEntry, LearningStream
+from imasterytracker.shards import DEFAULT_WORKSPACE
+from imasterytracker.state import DashboardState
+
+client = TestClient(app._api)
+
+FIELDS = (
+    "milestone_completion",
+    "milestone_copy",
+    "habits_completed_today",
+    "reflections_this_week",
+    "next_stream_message",
+    "latest_journal_title",
+)
+
+
+def _dashboard() -> dict:
+    state = DashboardState()
+    state._refresh()
+    return {name: getattr(state, name) for name in FIELDS}
+
+
+def test_summary_matches_the_dashboard_and_takes_one_query():
+    empty = client.get("/api/summary").json()
+    assert empty == _dashboard() == {
+        "milestone_completion": 0,
+        "milestone_copy": "00/00",
+        "habits_completed_today": 0,
+        "reflections_this_week": 0,
+        "next_stream_message": summary.NO_STREAMS_LEFT,
+        "latest_journal_title": summary.NO_REFLECTIONS,
+    }
+
+    old = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=30)
+    with rx.session() as session:
+        session.add_all(
+            [
+                LearningStream(name="Done", milestones_total=2, milestones_completed=2, created_at=old),
+                LearningStream(name="Rust", milestones_total=4, milestones_completed=3),
+                LearningStream(name="Gone", milestones_total=9, created_at=old, deleted_at=old),
+                Habit(name="Stretch", last_completed_on=dt.date.today()),
+                Habit(name="Read"),
+                JournalEntry(title="Last month", reflection="r", created_at=old),
+                JournalEntry(title="Today", reflection="r"),
+            ]
+        )
+        session.commit()
+
+    statements = []
+    event.listen(tenancy.reader(DEFAULT_WORKSPACE), "before_cursor_execute", lambda *a: statements.append(a[2]))
+    body = client.get("/api/summary").json()
+
+    assert len(statements) == 1
+    assert body == _dashboard()
+    assert body["milestone_copy"] == "05/06" and body["next_stream_message"] == "Rust: 1 milestone to go"
+    assert (body["habits_completed_today"], body["reflections_this_week"]) == (1, 1)
+
+
+def test_pollers_get_304_until_something_changes():
+    first = client.get("/api/summary")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/summary", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b"" and again.headers["ETag"] == etag
+
+    client.post("/api/journals", json={"title": "New", "reflection": "r"})
+    changed = client.get("/api/summary", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.json()["latest_journal_title"] == "New"
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import reflex as rx
+from sqlmodel import select
+from starlette.testclient import TestClient
+
+from imasterytracker import workspace
+from imasterytracker.app import app
+from imasterytracker.models import Habit, LearningStream
+from imasterytracker.schemas import WorkspaceImport
+from imasterytracker.tombstones import INCLUDE_DELETED
+
+client = TestClient(app._api)
+
+
+def _all(model) -> list:
+    with rx.session() as session:
+        return session.exec(select(model).order_by(model.id).execution_options(**{INCLUDE_DELETED: True})).all()
+
+
+def test_deletes_leave_tombstones_that_reads_skip():
+    created = client.post("/api/streams", json={"name": "Rust"}).json()
+    client.post("/api/streams", json={"name": "Go"})
+
+    assert client.delete(f"/api/streams/{created['id']}").status_code == 204
+    assert client.delete(f"/api/streams/{created['id']}").status_code == 404
+
+    assert [stream["name"] for stream in client.get("/api/streams").json()] == ["Go"]
+    assert [stream["name"] for stream in client.get("/api/export").json()["streams"]] == ["Go"]
+    (tombstone, live) = _all(LearningStream)
+    assert tombstone.deleted_at is not None and live.deleted_at is None
+
+
+def test_batch_cannot_touch_a_row_it_deleted():
+    stream = client.post("/api/streams", json={"name": "Rust", "milestones_total": 3}).json()
+
+    response = client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {"op": "delete", "type": "stream", "id": stream["id"]},
+                {"op": "progress", "type": "stream", "id": stream["id"], "delta": 1},
+            ]
+        },
+    )
+
+    assert response.status_code == 404
+    assert _all(LearningStream)[0].deleted_at is None
+
+
+def test_replace_and_merge_tombstone_instead_of_deleting():
+    with rx.session() as session:
+        session.add_all([Habit(name="Stretch"), Habit(name="Read")])
+        session.commit()
+        workspace.merge_workspace(session, WorkspaceImport(habits=[{"name": "Read"}]))
+        assert [habit.name for habit in session.exec(select(Habit))] == ["Read"]
+
+        workspace.replace_workspace(session, WorkspaceImport(habits=[{"name": "Write"}]))
+        assert [habit.name for habit in session.exec(select(Habit))] == ["Write"]
+        assert workspace.workspace_counts(session)["habits"] == 1
+
+    assert [(habit.name, habit.deleted_at is not None) for habit in _all(Habit)] == [
+        ("Stretch", True),
+        ("Read", True),
+        ("Write", False),
+    ]
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import reflex as rx
+from sqlalchemy import event
+from starlette.testclient import TestClient
+
+from imasterytracker import tenancy
+from imasterytracker.app import app
+from imasterytracker.changes import ChangeTracker
+from imasterytracker.models import Habit, LearningStream
+from imasterytracker.shards import DEFAULT_WORKSPACE
+from imasterytracker.state import DashboardState
+from imasterytracker.var_cache import TableMemo, memo
+
+
+def _hydrate(state: DashboardState) -> dict:
+    state._refresh()
+    delta = state.get_delta()
+    state._clean()
+    return delta[state.get_full_name()]
+
+
+def _count_queries(writer) -> list:
+    statements = []
+    for engine in (writer, tenancy.reader(DEFAULT_WORKSPACE)):
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_ui_only_events_run_no_queries():
+    with rx.session() as session:
+        session.add(LearningStream(name="Deep Practice"))
+        session.commit()
+        engine = session.get_bind()
+    state = DashboardState()
+    _hydrate(state)
+    statements = _count_queries(engine)
+
+    state.open_stream_modal()
+    state.stream_name = "Draft"
+    state.close_stream_modal()
+    state.clear_toast()
+    state.get_delta()
+
+    assert statements == []
+
+
+def test_sessions_share_values_until_their_tables_change():
+    with rx.session() as session:
+        session.add(LearningStream(name="Deep Practice"))
+        session.commit()
+        engine = session.get_bind()
+    first = _hydrate(DashboardState())
+    statements = _count_queries(engine)
+    before = memo.stats()
+
+    second = _hydrate(DashboardState())
+    assert statements == [] and second == first
+    assert memo.stats()["misses"] == before["misses"] and memo.stats()["hits"] > before["hits"]
+
+    with rx.session() as session:
+        session.add(Habit(name="Stretch"))
+        session.commit()
+    statements.clear()
+    state = DashboardState()
+    _hydrate(state)
+
+    assert state.total_habits == 1 and state.total_streams == 1
+    assert len([sql for sql in statements if sql.startswith("SELECT")]) == 1
+
+
+def test_a_write_during_compute_is_not_kept():
+    local = ChangeTracker()
+    cache = TableMemo(lambda workspace_id: local)
+
+    def _compute():
+        local.bump({"habits"})
+        return "stale"
+
+    assert cache.get("habits", ("habits",), _compute) == "stale"
+    assert cache.get("habits", ("habits",), lambda: "fresh") == "fresh"
+    assert cache.get("habits", ("habits",), lambda: "again") == "fresh"
+    assert cache.get("streams", ("streams",), lambda: 1) == 1
+    assert cache.stats() == {"hits": 1, "misses": 3, "hit_rate": 0.25, "entries": 2}
+
+
+def test_hit_rate_is_reported_with_the_cache_metrics():
+    before = TestClient(app._api).get("/api/admin/cache").json()["vars"]
+    _hydrate(DashboardState())
+    _hydrate(DashboardState())
+
+    stats = TestClient(app._api).get("/api/admin/cache").json()["vars"]
+
+    misses, hits = stats["misses"] - before["misses"], stats["hits"] - before["hits"]
+    assert misses >= 1 and hits >= misses
+
+
+def test_daily_vars_roll_over_with_the_date(monkeypatch):
+    today = dt.date.today()
+    with rx.session() as session:
+        session.add(Habit(name="Stretch", last_completed_on=today))
+        session.commit()
+    state = DashboardState()
+    assert _hydrate(state)["habits_completed_today_rx_state_"] == 1
+
+    state._advance_day()
+    assert "habits_completed_today_rx_state_" not in state.get_delta().get(state.get_full_name(), {})
+    state._clean()
+
+    monkeypatch.setattr(DashboardState, "_current_date", staticmethod(lambda: today + dt.timedelta(days=1)))
+    state._advance_day()
+    delta = state.get_delta()[state.get_full_name()]
+    assert delta["habits_completed_today_rx_state_"] == 0
+    assert delta["habit_consistency_copy_rx_state_"] == "0 of 1 rituals logged today"
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from imasterytracker import workspace
+from imasterytracker.models import Habit, JournalEntry, LearningStream
+from imasterytracker.schemas import WorkspaceImport
+
+
+def _session() -> Session:
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+
+def _payload(**overrides) -> WorkspaceImport:
+    data = {
+        "streams": [
+            {"name": "Rust", "milestones_total": 4, "milestones_completed": 1, "color": "#123456"},
+            {"name": "Go", "milestones_total": 2},
+        ],
+        "habits": [{"name": "Read docs"}, {"name": "Kata", "cadence": "Weekly"}],
+        "journal_entries": [
+            {"title": "Lifetimes", "reflection": "Borrowing clicked."},
+            {"title": "Channels", "reflection": "Select is neat."},
+        ],
+    }
+    data.update(overrides)
+    return WorkspaceImport.model_validate(data)
+
+
+def test_merge_into_empty_workspace_inserts_everything():
+    with _session() as session:
+        changes = workspace.merge_workspace(session, _payload())
+
+        assert changes["streams"] == {"inserted": 2, "updated": 0, "deleted": 0, "unchanged": 0}
+        assert workspace.workspace_counts(session) == {"streams": 2, "habits": 2, "journal_entries": 2}
+
+
+def test_merge_touches_only_changed_rows_and_keeps_identity():
+    with _session() as session:
+        workspace.merge_workspace(session, _payload())
+        habit = session.exec(select(Habit).where(Habit.name == "Read docs")).one()
+        habit.last_completed_on = dt.date(2026, 1, 2)
+        session.add(habit)
+        session.commit()
+        before = {stream.name: (stream.id, stream.created_at) for stream in session.exec(select(LearningStream))}
+
+        changes = workspace.merge_workspace(
+            session,
+            _payload(
+                streams=[
+                    {"name": "Rust", "milestones_total": 4, "milestones_completed": 3, "color": "#123456"},
+                    {"name": "Go", "milestones_total": 2},
+                ],
+                habits=[{"name": "Read docs"}, {"name": "Sketch"}],
+            ),
+        )
+
+        assert changes["streams"] == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 1}
+        assert changes["habits"] == {"inserted": 1, "updated": 0, "deleted": 1, "unchanged": 1}
+        assert changes["journal_entries"]["unchanged"] == 2
+        session.expire_all()
+        rust = session.exec(select(LearningStream).where(LearningStream.name == "Rust")).one()
+        assert (rust.id, rust.created_at) == before["Rust"]
+        assert rust.milestones_completed == 3
+        kept = session.exec(select(Habit).where(Habit.name == "Read docs")).one()
+        assert kept.last_completed_on == dt.date(2026, 1, 2)
+
+
+def test_merge_matches_exported_journals_by_created_at():
+    with _session() as session:
+        workspace.merge_workspace(session, _payload())
+        exported = workspace.export_workspace(session).model_dump(mode="json")
+        exported["journal_entries"][0]["reflection"] = "Borrowing finally clicked."
+        ids = sorted(entry.id for entry in session.exec(select(JournalEntry)))
+
+        changes = workspace.merge_workspace(session, WorkspaceImport.model_validate(exported))
+
+        assert changes["journal_entries"] == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 1}
+        session.expire_all()
+        assert sorted(entry.id for entry in session.exec(select(JournalEntry))) == ids
+
+
+def test_streamed_export_matches_model_dump():
+    with _session() as session:
+        workspace.merge_workspace(session, _payload())
+
+        streamed = b"".join(workspace.iter_export_json(session, batch_size=1))
+
+        assert streamed.decode() == workspace.export_workspace(session).model_dump_json()